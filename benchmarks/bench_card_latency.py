@@ -0,0 +1,101 @@
+"""
+快捷键贴卡延迟基准测试
+按快捷键的处理流程（读取最新历史、取出或创建贴卡、显示）测量到首次绘制的延迟，
+比较使用预创建池与不使用的情况
+
+每种情况在独立进程中执行（使用临时配置目录和数据库）。
+
+用法: python benchmarks/bench_card_latency.py [--runs 20] [--pool 0 2]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def wait(app, seconds, until=None):
+    """处理事件 seconds 秒（until 返回 True 时提前结束）"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        app.processEvents()
+        if until and until():
+            return True
+    return False
+
+
+def run_case(pool_size, runs):
+    """在当前进程中测量 runs 次快捷键到首次绘制的延迟"""
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication([])
+    from utils import get_config
+    from ui.card_window import CardWindow
+    
+    get_config().set('card.pool_size', pool_size)
+    
+    latencies = []
+    track = CardWindow.track_paint_latency
+    
+    def track_and_record(card, requested_at):
+        card.first_painted.connect(latencies.append)
+        track(card, requested_at)
+    CardWindow.track_paint_latency = track_and_record
+    
+    from core import AppManager
+    os.chdir(tempfile.mkdtemp())  # 数据库创建在临时目录中
+    manager = AppManager()
+    manager.storage.add_history('benchmark content\n' * 20).result()
+    wait(app, 1.5)  # 等待预创建池填满
+    
+    for _ in range(runs):
+        count = len(latencies)
+        manager._on_hotkey_pressed('create_card')
+        if not wait(app, 5, lambda: len(latencies) > count):
+            print("✗ 贴卡未显示")
+            break
+        for card in manager.card_windows[:]:
+            card.close()
+        wait(app, 1.0)  # 等待池补充
+    
+    manager.cleanup()
+    
+    if latencies:
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(f"预创建池 {pool_size}: {len(latencies)} 次  中位数 {statistics.median(latencies):.1f}ms  "
+              f"P95 {p95:.1f}ms  最小 {ordered[0]:.1f}ms  最大 {ordered[-1]:.1f}ms", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='每种情况的测量次数')
+    parser.add_argument('--pool', type=int, nargs='+', default=[0, 2], help='预创建池大小')
+    parser.add_argument('--case', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.case is not None:
+        run_case(args.case, args.runs)
+        return
+    
+    env = dict(os.environ)
+    if sys.platform.startswith('linux') and not env.get('DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    for pool_size in args.pool:
+        with tempfile.TemporaryDirectory() as home:
+            env['HOME'] = env['USERPROFILE'] = env['APPDATA'] = home
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--case', str(pool_size),
+                 '--runs', str(args.runs)],
+                env=env, cwd=ROOT, capture_output=True, text=True
+            )
+            lines = [line for line in result.stdout.splitlines() if line.startswith(('预创建池', '✗'))]
+            print('\n'.join(lines) or result.stdout + result.stderr)
+
+
+if __name__ == '__main__':
+    main()
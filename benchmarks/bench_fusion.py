@@ -0,0 +1,80 @@
+"""
+逐行步骤融合基准测试
+比较融合执行（一次拆分、拼接）与逐个步骤执行的耗时和内存分配峰值，并检查结果一致
+
+用法: python benchmarks/bench_fusion.py [--mb 50] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.text_processor import TextProcessor
+
+
+# 5 个连续的逐行步骤
+STEPS = [
+    {'type': 'strip_lines', 'params': {'mode': 'right'}},
+    {'type': 'remove_empty_lines', 'params': {}},
+    {'type': 'strip_lines', 'params': {'mode': 'left'}},
+    {'type': 'add_prefix', 'params': {'prefix': '[log] '}},
+    {'type': 'add_suffix', 'params': {'suffix': ' ;'}},
+]
+
+
+def make_log(mb):
+    """生成约 mb MB 的日志文本"""
+    line = '   2024-01-01 12:00:00 INFO  request handled in 12ms path=/api/items   \n\n'
+    return line * (mb * 1024 * 1024 // len(line))
+
+
+def measure(func, text, repeat):
+    """返回 (最短耗时秒, 内存分配峰值字节, 结果)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    
+    tracemalloc.start()
+    func(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mb', type=int, default=50, help='输入文本大小（MB）')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（耗时取最短）')
+    args = parser.parse_args()
+    
+    text = make_log(args.mb)
+    processor = TextProcessor(max_workers=1, regex_timeout=0)
+    
+    compiled = processor.compile({'steps': STEPS})
+    step_funcs = [processor._compile_step(step).func for step in STEPS]
+    
+    def unfused(text):
+        for func in step_funcs:
+            text = func(text)
+        return text
+    
+    def fused(text):
+        return processor.run(text, compiled)
+    
+    print(f"输入: {len(text) / 1e6:.1f}M 字符, {text.count(chr(10))} 行, "
+          f"{len(STEPS)} 个步骤融合为 {len(compiled.steps)} 个")
+    results = {}
+    for name, func in (('逐步执行', unfused), ('融合执行', fused)):
+        elapsed, peak, results[name] = measure(func, text, args.repeat)
+        print(f"{name}: {elapsed:.3f}s  分配峰值 {peak / 1e6:.0f}MB")
+    print("结果一致" if results['逐步执行'] == results['融合执行'] else "结果不一致!")
+
+
+if __name__ == '__main__':
+    main()
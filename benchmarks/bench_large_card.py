@@ -0,0 +1,102 @@
+"""
+大文本贴卡基准测试
+测量打开贴卡的耗时和内存占用（RSS 增量），比较大文本模式与普通模式（QTextEdit）
+
+每项测量在独立进程中执行（使用临时配置目录），结果互不影响。
+
+用法: python benchmarks/bench_large_card.py [--mb 10 100] [--idle 8]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LOG_LINE = '2024-01-01 12:00:00 INFO [worker-3] processed request id=%d status=200 in 12ms\n'
+
+
+def rss_mb():
+    """当前进程的常驻内存（MB）"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss // (1024 * 1024)
+    except ImportError:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS'):
+                    return int(line.split()[1]) // 1024
+    return 0
+
+
+def run_case(mb, mode, idle):
+    """在当前进程中测量一项：打开贴卡、空闲 idle 秒后、滚动到末尾"""
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication([])
+    from utils import get_config
+    from ui.card_window import CardWindow
+    
+    if mode == 'normal':
+        # 提高阈值，强制使用普通编辑器
+        get_config().set('card.large_document_chars', 1 << 40)
+    
+    content = ''.join(LOG_LINE % i for i in range(mb * 1024 * 1024 // len(LOG_LINE)))
+    app.processEvents()
+    base = rss_mb()
+    
+    start = time.perf_counter()
+    card = CardWindow(content)
+    card.resize(300, 300)
+    card.show()
+    app.processEvents()
+    opened = time.perf_counter() - start
+    opened_rss = rss_mb() - base
+    
+    # QTextEdit 在空闲时继续后台排版，内存随之增长
+    end = time.perf_counter() + idle
+    while time.perf_counter() < end:
+        app.processEvents()
+    idle_rss = rss_mb() - base
+    
+    scroll_bar = card.text_edit.verticalScrollBar()
+    start = time.perf_counter()
+    scroll_bar.setValue(scroll_bar.maximum())
+    app.processEvents()
+    scrolled = time.perf_counter() - start
+    
+    print(f"{mb:>5} MB  {mode:<6}  {type(card.text_edit).__name__:<15}  打开 {opened:6.2f}s  "
+          f"RSS +{opened_rss:5d}MB  空闲{idle:g}s后 +{idle_rss:5d}MB  "
+          f"滚动到末尾 {scrolled:5.2f}s  RSS +{rss_mb() - base:5d}MB", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mb', type=int, nargs='+', default=[10, 100], help='文本大小（MB）')
+    parser.add_argument('--idle', type=float, default=8, help='打开后空闲等待的秒数')
+    parser.add_argument('--modes', nargs='+', default=['large', 'normal'], choices=['large', 'normal'])
+    parser.add_argument('--case', nargs=2, metavar=('MB', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.case:
+        run_case(int(args.case[0]), args.case[1], args.idle)
+        return
+    
+    env = dict(os.environ)
+    if sys.platform.startswith('linux') and not env.get('DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    for mb in args.mb:
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory() as home:
+                env['HOME'] = env['USERPROFILE'] = env['APPDATA'] = home
+                subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--case', str(mb), mode,
+                     '--idle', str(args.idle)],
+                    env=env, cwd=ROOT, check=False
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+多进程规则执行基准测试
+比较单进程执行与不同进程数的并行执行（进程启动时间不计入），并检查结果一致
+
+用法: python benchmarks/bench_parallel.py [--mb 64] [--workers 1 2 4 8] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.text_processor import TextProcessor
+
+
+# 逐行步骤组成的规则（可分块并行）
+RULE = {
+    'id': 'bench-parallel',
+    'name': '基准测试',
+    'steps': [
+        {'type': 'strip_lines', 'params': {'mode': 'both'}},
+        {'type': 'remove_empty_lines', 'params': {}},
+        {'type': 'find_replace', 'params': {'find': 'foo', 'replace': 'bar'}},
+        {'type': 'case_transform', 'params': {'mode': 'upper'}},
+        {'type': 'add_prefix', 'params': {'prefix': '> ', 'per_line': True}},
+    ],
+}
+
+
+def make_text(mb):
+    """生成约 mb MB 的多行文本"""
+    line = '  foo quick brown fox jumps over the lazy dog 0123456789  \n\n'
+    return line * (mb * 1024 * 1024 // len(line))
+
+
+def best_of(repeat, func):
+    """多次执行取最短时间，返回 (秒, 结果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mb', type=int, default=64, help='输入文本大小（MB）')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8], help='并行进程数')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（取最短）')
+    args = parser.parse_args()
+    
+    text = make_text(args.mb)
+    print(f"输入: {len(text) / 1e6:.1f}M 字符, CPU: {os.cpu_count()}")
+    
+    processor = TextProcessor(max_workers=1)
+    compiled = processor.compile(RULE)
+    sequential, expected = best_of(args.repeat, lambda: processor.run(text, compiled))
+    print(f"{'单进程':>8}: {sequential:.3f}s")
+    
+    for workers in args.workers:
+        processor = TextProcessor(max_workers=workers)
+        processor.warm_up()
+        processor.process_parallel(text[:1024 * 1024], RULE)  # 等待进程启动完成
+        try:
+            elapsed, result = best_of(args.repeat, lambda: processor.process_parallel(text, RULE))
+        finally:
+            processor.shutdown()
+        status = '一致' if result == expected else '不一致!'
+        print(f"{workers:>6} 进程: {elapsed:.3f}s  加速 {sequential / elapsed:.2f}x"
+              f"（理想 {min(workers, os.cpu_count() or 1)}x）  结果{status}")
+
+
+if __name__ == '__main__':
+    main()
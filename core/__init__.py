@@ -1,8 +1,14 @@
 """核心模块"""
 from .clipboard_monitor import ClipboardMonitor
+from .clipboard_ingest import ClipboardIngest
 from .storage import StorageManager
+from .async_storage import AsyncStorageManager
 from .hotkey_manager import HotkeyManager
 from .app_manager import AppManager
-from .text_processor import TextProcessor
+from .text_processor import TextProcessor, ProcessCancelled, StepCache, get_text_processor
+from .transform_runner import TransformRunner
+from .regex_guard import RegexGuard, RegexTimeout
 
-__all__ = ['ClipboardMonitor', 'StorageManager', 'HotkeyManager', 'AppManager', 'TextProcessor']
+__all__ = ['ClipboardMonitor', 'ClipboardIngest', 'StorageManager', 'AsyncStorageManager', 'HotkeyManager', 'AppManager', 
+           'TextProcessor', 'ProcessCancelled', 'StepCache', 'get_text_processor', 'TransformRunner',
+           'RegexGuard', 'RegexTimeout']
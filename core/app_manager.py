@@ -1,12 +1,15 @@
 """
 应用管理器 - 统一管理所有窗口和功能
 """
+import time
 from PyQt6.QtCore import QObject, pyqtSignal
 from PyQt6.QtWidgets import QApplication
 from .clipboard_monitor import ClipboardMonitor
-from .storage import StorageManager
+from .clipboard_ingest import ClipboardIngest
+from .async_storage import AsyncStorageManager
 from .hotkey_manager import HotkeyManager
-from utils import ConfigManager
+from .text_processor import get_text_processor
+from utils import get_config, get_path_manager
 
 
 class AppManager(QObject):
@@ -16,28 +19,77 @@ class AppManager(QObject):
         super().__init__()
         
         # 管理器
-        self.config = ConfigManager()
-        self.storage = StorageManager()
+        self.config = get_config()
+        self.storage = AsyncStorageManager(
+            fts_tokenizer=self.config.get('storage.fts_tokenizer', 'unicode61'),
+            write_behind=self.config.get('storage.write_behind', True),
+            batch_size=self.config.get('storage.batch_size', 32),
+            flush_interval=self.config.get('storage.flush_interval_ms', 1000) / 1000,
+            **self._get_retention_options(),
+            profile=self.config.get('storage.profile', 'balanced'),
+            pragmas=self.config.get('storage.pragmas', None),
+            spill_threshold=self.config.get('storage.spill_threshold_mb', 8) * 1024 * 1024,
+        )
         self.clipboard_monitor = ClipboardMonitor()
+        # 超大剪贴板文本在获取后立即截断或忽略（0 表示不限制）
+        self.clipboard_monitor.set_capture_limit(
+            self.config.get('clipboard.capture_max_chars', ClipboardMonitor.CAPTURE_MAX_CHARS),
+            self.config.get('clipboard.capture_oversize', 'truncate'),
+        )
+        # 随文本一起保存的其他剪贴板格式（HTML、RTF 等）
+        self.clipboard_monitor.set_capture_formats(
+            self.config.get('clipboard.capture_formats', list(ClipboardMonitor.CAPTURE_FORMATS)),
+            self.config.get('clipboard.capture_format_max_mb', 16) * 1024 * 1024,
+        )
+        # 合并短时间内的剪贴板变化后按批保存
+        self.clipboard_ingest = ClipboardIngest(
+            window=self.config.get('clipboard.ingest_window_ms', 300),
+            supersede=self.config.get('clipboard.ingest_supersede_ms', 100),
+            max_delay=self.config.get('clipboard.ingest_max_delay_ms', 2000),
+        )
         self.hotkey_manager = HotkeyManager()
         
+        # 自定义规则中正则步骤的执行时间预算，0 表示不限制
+        get_text_processor().regex_timeout = self.config.get('rules.regex_timeout_ms', 5000) / 1000
+        
         # 窗口
         self.settings_window = None
         self.card_windows = []  # 所有贴卡窗口
         
+        # 预创建的隐藏贴卡（按下快捷键时直接取用）
+        from ui import CardPool
+        self.card_pool = CardPool(self.clipboard_monitor, size=self.config.get('card.pool_size', 2))
+        
+        # 在路径信息中报告数据库连接参数
+        get_path_manager().set_database_info(self.storage.connection_info)
+        
         # 连接信号
         self._connect_signals()
         
         # 初始化
         self._init_settings()
     
+    def _get_retention_options(self):
+        """从配置读取历史记录保留策略"""
+        return {
+            'max_count': self.config.get('clipboard.max_history', 50),
+            'max_bytes': self.config.get('clipboard.max_history_mb', 0) * 1024 * 1024,
+            'max_age_days': self.config.get('clipboard.max_history_days', 0),
+        }
+    
     def _connect_signals(self):
         """连接信号"""
-        # 剪贴板变化
-        self.clipboard_monitor.clipboard_changed.connect(self._on_clipboard_changed)
+        # 剪贴板变化（经采集队列合并后按批处理）
+        self.clipboard_monitor.clipboard_changed.connect(self.clipboard_ingest.push)
+        self.clipboard_ingest.batch_ready.connect(self._on_clipboard_batch)
         
         # 快捷键
         self.hotkey_manager.hotkey_pressed.connect(self._on_hotkey_pressed)
+        
+        # 保留策略删除记录（包括每次写入后的自动清理）
+        self.storage.history_pruned.connect(self._on_history_rows_pruned)
+        # 历史记录实际写入数据库（写入缓冲合并后）
+        self.storage.history_written.connect(self._on_history_written)
     
     def _init_settings(self):
         """初始化设置"""
@@ -87,45 +139,44 @@ class AppManager(QObject):
             self.settings_window.card_style_changed.connect(
                 self._on_card_style_changed
             )
-            self.settings_window.card_appearance_changed.connect(
-                self._on_card_appearance_changed
-            )
             self.settings_window.load_to_card_requested.connect(
-                self.create_card
+                lambda content, history_id: self.create_card(content, history_id=history_id)
             )
-            self.settings_window.menu_config_changed.connect(
-                self._on_menu_config_changed
+            self.settings_window.history_retention_changed.connect(
+                self._on_history_retention_changed
             )
         
         self.settings_window.show()
         self.settings_window.raise_()
         self.settings_window.activateWindow()
     
-    def create_card(self, content=None):
+    def create_card(self, content=None, requested_at=None, history_id=None):
         """
         创建新贴卡
         
         Args:
             content: 贴卡内容，如果为 None 则从历史记录读取最新内容
+            requested_at: 请求时间（time.perf_counter()），用于统计到首次绘制的延迟；默认为调用时
+            history_id: 内容对应的历史记录ID，贴卡可按需读取复制时的其他格式
         """
-        from ui import CardWindow
+        if requested_at is None:
+            requested_at = time.perf_counter()
         
         if content is None:
-            # 始终从历史记录读取最新内容
-            history = self.storage.get_history(1)
-            if history:
-                content = history[0]['content']
-                print(f"从历史记录读取内容: {content[:30]}...")
-            else:
-                print("历史记录为空，无法创建贴卡")
-                return
+            # 始终从历史记录读取最新内容（在存储线程中查询，逐块读取内容后再创建）
+            self.storage.get_history(
+                1, callback=lambda history: self._on_latest_history_loaded(history, requested_at)
+            )
+            return
         
         if not content:
             print("内容为空，无法创建贴卡")
             return
         
-        # 创建贴卡窗口（传递剪贴板监听器）
-        card = CardWindow(content, clipboard_monitor=self.clipboard_monitor)
+        # 从预创建池中取出贴卡（池为空时新建）
+        card = self.card_pool.take(content)
+        if history_id is not None:
+            card.set_format_source(self._make_format_loader(history_id))
         
         # 应用配置
         default_width = self.config.get('card.default_width', 300)
@@ -163,6 +214,7 @@ class AppManager(QObject):
         
         # 保存引用并显示
         self.card_windows.append(card)
+        card.track_paint_latency(requested_at)
         card.show()
         
         # 设置焦点到新创建的卡片
@@ -172,15 +224,47 @@ class AppManager(QObject):
         
         print(f"已创建贴卡，当前贴卡数量: {len(self.card_windows)}")
     
-    def _on_clipboard_changed(self, text):
-        """剪贴板内容改变 - 保存到历史"""
-        print(f"检测到剪贴板变化: {text[:50]}...")
+    def _on_latest_history_loaded(self, history, requested_at=None):
+        """最新历史记录摘要读取完成 - 读取完整内容"""
+        if not history:
+            print("历史记录为空，无法创建贴卡")
+            return
         
-        # 保存到历史记录
-        self.storage.add_history(text)
-        print("→ 已保存到历史记录")
+        history_id = history[0]['id']
+        self.storage.read_history_text(
+            history_id, lambda content: self._on_latest_text_loaded(content, history_id, requested_at)
+        )
+    
+    def _on_latest_text_loaded(self, content, history_id, requested_at=None):
+        """最新历史记录内容读取完成 - 创建贴卡"""
+        if content is None:
+            print("✗ 读取历史记录内容失败，无法创建贴卡")
+            return
+        print(f"从历史记录读取内容: {content[:30]}...")
+        self.create_card(content, requested_at, history_id=history_id)
+    
+    def _make_format_loader(self, history_id):
+        """生成读取历史记录其他格式的函数（在存储线程中查询，调用方等待结果）"""
+        def load(mime):
+            return self.storage.get_history_format(history_id, mime).result()
+        return load
+    
+    def _on_clipboard_batch(self, texts, formats):
+        """一批剪贴板变化 - 保存到历史（同时保存其他格式）"""
+        print(f"检测到剪贴板变化: {texts[-1][:50]}...（本批 {len(texts)} 条）")
         
-        # 如果设置窗口已打开，实时刷新历史列表
+        # 保存到历史记录（在存储线程中按顺序写入）
+        self.storage.add_history_many(texts, formats, callback=self._on_history_saved)
+    
+    def _on_history_saved(self, history_ids):
+        """一批历史记录已提交（写入缓冲模式下稍后合并写入）"""
+        print(f"→ 已提交 {len(history_ids)} 条到历史记录")
+    
+    def _on_history_written(self, history_ids):
+        """历史记录已写入数据库 - 刷新历史列表
+        
+        只在实际写入后刷新：列表查询会先写入缓冲中的记录，每次提交后都刷新会抵消写入缓冲的合并。
+        """
         if self.settings_window and self.settings_window.isVisible():
             self.settings_window.refresh_history()
     
@@ -189,7 +273,7 @@ class AppManager(QObject):
         print(f"快捷键触发: {hotkey_name}")
         
         if hotkey_name == "create_card":
-            self.create_card()
+            self.create_card(requested_at=time.perf_counter())
     
     def _on_card_closed(self, card):
         """贴卡窗口关闭"""
@@ -240,27 +324,20 @@ class AppManager(QObject):
         if self.card_windows:
             print(f"✓ 已更新 {len(self.card_windows)} 个贴卡的样式")
     
-    def _on_card_appearance_changed(self, font_size, font_color, bg_color):
-        """贴卡外观改变 - 立即应用到所有现有贴卡"""
-        print(f"贴卡外观改变: 字号={font_size}, 字色={font_color}, 背景色={bg_color}")
-        
-        # 应用到所有现有贴卡
-        for card in self.card_windows:
-            card.apply_appearance(font_size, font_color, bg_color)
-        
-        if self.card_windows:
-            print(f"✓ 已更新 {len(self.card_windows)} 个贴卡的外观")
+    def _on_history_retention_changed(self):
+        """历史记录保留策略改变 - 立即清理超出部分"""
+        options = self._get_retention_options()
+        print(f"历史记录保留策略改变: {options}")
+        self.storage.set_retention(callback=self._on_history_pruned, **options)
     
-    def _on_menu_config_changed(self):
-        """菜单配置改变 - 立即应用到所有现有贴卡"""
-        print("菜单配置改变，刷新所有贴卡")
-        
-        # 通知所有现有贴卡重新加载菜单配置
-        for card in self.card_windows:
-            card.reload_menu_config()
-        
-        if self.card_windows:
-            print(f"✓ 已刷新 {len(self.card_windows)} 个贴卡的菜单配置")
+    def _on_history_pruned(self, deleted):
+        """按保留策略清理完成（列表通过 history_pruned 信号更新）"""
+        print(f"✓ 保留策略已生效，清理 {deleted} 条记录")
+    
+    def _on_history_rows_pruned(self, history_ids):
+        """记录被保留策略删除 - 从历史列表中移除（窗口隐藏时也更新，再次显示时只查询新记录）"""
+        if self.settings_window:
+            self.settings_window.remove_pruned_history(history_ids)
     
     def cleanup(self):
         """清理资源"""
@@ -269,13 +346,20 @@ class AppManager(QObject):
         # 关闭所有贴卡
         for card in self.card_windows[:]:
             card.close()
+        self.card_pool.clear()
         
         # 关闭设置窗口
         if self.settings_window:
             self.settings_window.close()
         
+        # 保存尚未发出的剪贴板变化
+        self.clipboard_ingest.flush()
+        print(f"剪贴板采集统计: {self.clipboard_ingest.stats()}")
+        
         # 清理管理器
         self.hotkey_manager.cleanup()
         self.storage.close()
+        get_text_processor().shutdown()
+        self.config.flush()
         
         print("资源清理完成")
@@ -0,0 +1,251 @@
+"""
+异步存储模块
+在独立的工作线程中执行所有数据库操作，避免阻塞界面线程
+"""
+import zlib
+import queue
+import threading
+from concurrent.futures import Future
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from .storage import StorageManager
+
+
+class AsyncStorageManager(QObject):
+    """
+    异步存储管理器
+    
+    工作线程独占 StorageManager 的数据库连接，界面线程提交的操作按顺序执行。
+    每个操作返回 Future；如果提供 callback，结果会通过 Qt 信号回到界面线程再调用。
+    需要同步访问时（如测试）可直接使用 StorageManager。
+    """
+    
+    # 内部信号：将结果投递回界面线程 (callback, result)
+    _result_ready = pyqtSignal(object, object)
+    
+    # 内部信号：存储请求延迟写入缓冲中的记录 (秒)
+    _flush_requested = pyqtSignal(float)
+    
+    # 按保留策略删除了记录（包括写入时的自动清理），参数为被删除的ID列表
+    history_pruned = pyqtSignal(object)
+    # 历史记录已写入数据库（写入缓冲模式下为实际写入时），参数为记录ID列表
+    history_written = pyqtSignal(object)
+    
+    def __init__(self, db_file='textpin.db', **storage_options):
+        """
+        Args:
+            db_file: 数据库文件路径
+            storage_options: 传递给 StorageManager 的其他参数
+        """
+        super().__init__()
+        self._tasks = queue.Queue()
+        self._ready = threading.Event()
+        self._init_error = None
+        self._storage = None
+        self._closed = False
+        
+        self._result_ready.connect(self._deliver)
+        
+        # 写入缓冲的延迟写入也作为任务提交，数据库连接始终只在工作线程中使用
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(lambda: self.submit('flush'))
+        self._flush_requested.connect(self._start_flush_timer)
+        
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(db_file, storage_options),
+            name='StorageWorker',
+            daemon=True
+        )
+        self._thread.start()
+        
+        # 等待数据库初始化完成（建表、迁移）
+        self._ready.wait()
+        if self._init_error:
+            raise self._init_error
+    
+    def _run(self, db_file, storage_options):
+        """工作线程主循环"""
+        try:
+            self._storage = StorageManager(
+                db_file, schedule_flush=self._flush_requested.emit, **storage_options
+            )
+            self._storage.on_pruned = self.history_pruned.emit
+            self._storage.on_written = self.history_written.emit
+        except Exception as e:
+            self._init_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            
+            future, method_name, args, kwargs, callback = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            
+            try:
+                result = getattr(self._storage, method_name)(*args, **kwargs)
+            except Exception as e:
+                print(f"✗ 数据库操作失败: {method_name} - {e}")
+                future.set_exception(e)
+                continue
+            
+            future.set_result(result)
+            if callback:
+                self._result_ready.emit(callback, result)
+        
+        self._storage.close()
+    
+    @property
+    def connection_info(self):
+        """实际生效的数据库连接参数"""
+        return dict(self._storage.connection_info) if self._storage else {}
+    
+    def _start_flush_timer(self, delay):
+        """在界面线程中安排延迟写入（已安排时不重复）"""
+        if not self._flush_timer.isActive() and not self._closed:
+            self._flush_timer.start(int(delay * 1000))
+    
+    def _deliver(self, callback, result):
+        """在界面线程中调用回调"""
+        callback(result)
+    
+    def submit(self, method_name, *args, callback=None, **kwargs):
+        """
+        提交数据库操作
+        
+        Args:
+            method_name: StorageManager 的方法名
+            callback: 完成后在界面线程中调用的函数，参数为返回值
+        
+        Returns:
+            concurrent.futures.Future
+        """
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("存储已关闭"))
+            return future
+        
+        self._tasks.put((future, method_name, args, kwargs, callback))
+        return future
+    
+    def call(self, method_name, *args, **kwargs):
+        """同步执行数据库操作（阻塞直到完成）"""
+        return self.submit(method_name, *args, **kwargs).result()
+    
+    # ==================== StorageManager 对应接口 ====================
+    
+    def add_history(self, content, callback=None):
+        """添加历史记录"""
+        return self.submit('add_history', content, callback=callback)
+    
+    def add_history_many(self, contents, formats=None, callback=None):
+        """按顺序添加多条历史记录（formats 为对应的其他剪贴板格式）"""
+        return self.submit('add_history_many', contents, formats, callback=callback)
+    
+    def get_history(self, limit=50, favorites_only=False, include_content=False, callback=None):
+        """获取历史记录列表"""
+        return self.submit('get_history', limit, favorites_only, include_content, callback=callback)
+    
+    def get_history_page(self, limit=50, before=None, favorites_only=False, after=None, callback=None):
+        """分页获取历史记录摘要"""
+        return self.submit('get_history_page', limit, before, favorites_only, after, callback=callback)
+    
+    def get_history_by_id(self, history_id, callback=None):
+        """根据ID获取历史记录"""
+        return self.submit('get_history_by_id', history_id, callback=callback)
+    
+    def iter_history_text(self, history_id, callback=None):
+        """逐块读取记录的完整文本（返回的迭代器可在界面线程中使用）"""
+        return self.submit('iter_history_text', history_id, callback=callback)
+    
+    def read_history_text(self, history_id, callback):
+        """
+        读取记录的完整文本，完成后在界面线程中调用 callback(text)
+        
+        在存储线程中查询记录，再在界面线程中每次事件循环读取一块，解压超大内容时
+        不会长时间占用界面线程和存储线程。记录不存在或读取失败时 text 为 None。
+        """
+        self.iter_history_text(
+            history_id, callback=lambda chunks: self._read_chunks(chunks, [], callback)
+        )
+    
+    def _read_chunks(self, chunks, parts, callback):
+        """读取一块文本，未读完时在下一次事件循环中继续"""
+        if chunks is None:
+            callback(None)
+            return
+        
+        try:
+            chunk = next(chunks, None)
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            print(f"✗ 读取历史记录内容失败: {e}")
+            callback(None)
+            return
+        
+        if chunk is None:
+            callback(''.join(parts))
+            return
+        parts.append(chunk)
+        QTimer.singleShot(0, lambda: self._read_chunks(chunks, parts, callback))
+    
+    def get_history_formats(self, history_id, callback=None):
+        """获取记录保存的其他剪贴板格式（不读取数据）"""
+        return self.submit('get_history_formats', history_id, callback=callback)
+    
+    def get_history_format(self, history_id, mime, callback=None):
+        """读取记录保存的某种剪贴板格式"""
+        return self.submit('get_history_format', history_id, mime, callback=callback)
+    
+    def search_history(self, keyword, limit=50, ranked=True, include_content=False, callback=None):
+        """搜索历史记录"""
+        return self.submit('search_history', keyword, limit, ranked, include_content, callback=callback)
+    
+    def toggle_favorite(self, history_id, callback=None):
+        """切换收藏状态"""
+        return self.submit('toggle_favorite', history_id, callback=callback)
+    
+    def delete_history(self, history_id, callback=None):
+        """删除历史记录"""
+        return self.submit('delete_history', history_id, callback=callback)
+    
+    def clear_history(self, keep_favorites=True, callback=None):
+        """清空历史记录"""
+        return self.submit('clear_history', keep_favorites, callback=callback)
+    
+    def set_retention(self, max_count=None, max_bytes=None, max_age_days=None, callback=None):
+        """设置保留策略并清理超出部分"""
+        return self.submit('set_retention', max_count, max_bytes, max_age_days, callback=callback)
+    
+    def prune_history(self, max_batches=None, callback=None):
+        """按保留策略删除超出的记录"""
+        return self.submit('prune_history', max_batches, callback=callback)
+    
+    def get_stats(self, callback=None):
+        """获取记录总数和内容总字节数"""
+        return self.submit('get_stats', callback=callback)
+    
+    def get_setting(self, key, default=None, callback=None):
+        """获取设置"""
+        return self.submit('get_setting', key, default, callback=callback)
+    
+    def set_setting(self, key, value, callback=None):
+        """设置配置"""
+        return self.submit('set_setting', key, value, callback=callback)
+    
+    def flush(self, callback=None):
+        """立即写入缓冲中的历史记录"""
+        return self.submit('flush', callback=callback)
+    
+    def close(self):
+        """关闭存储：执行完已提交的操作后关闭数据库连接"""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_timer.stop()
+        self._tasks.put(None)
+        self._thread.join()
@@ -0,0 +1,97 @@
+"""
+剪贴板采集队列
+合并短时间内的剪贴板变化，按批交给存储和界面
+"""
+import time
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+class ClipboardIngest(QObject):
+    """
+    剪贴板采集队列
+    
+    收到变化后等待 window 毫秒再发出（期间有新的变化则重新计时，但从第一条起
+    最多等待 max_delay 毫秒），同一批的文本及其他剪贴板格式按时间顺序一起发出：
+    - 与上一条相同的文本（信号和轮询重复触发）合并为一条；
+    - 上一条在 supersede 毫秒内就被新文本替代时丢弃（程序连续写入剪贴板的中间值）。
+    """
+    
+    # 一批剪贴板文本（按时间顺序）及对应的其他格式 [{mime: bytes}, ...]
+    # （参数为 list；声明为 object 以传递同一个对象，声明为 list 时每次发出都会
+    # 转换为 QVariantList 再转换回来，其中的超大文本会被逐个复制）
+    batch_ready = pyqtSignal(object, object)
+    
+    def __init__(self, window=300, supersede=100, max_delay=2000, parent=None):
+        """
+        Args:
+            window: 合并等待时间（毫秒）
+            supersede: 在该时间（毫秒）内被替代的文本视为中间值丢弃，0 表示不丢弃
+            max_delay: 一批的最长等待时间（毫秒）
+        """
+        super().__init__(parent)
+        self.window = window
+        self.supersede = supersede
+        self.max_delay = max_delay
+        
+        self._pending = []  # 当前批次 [(文本, 其他格式, 收到时间)]
+        self._first_at = None  # 当前批次第一条的收到时间
+        self._last_text = None  # 最后接收的文本（包括已发出的）
+        
+        # 统计
+        self.received = 0  # 收到的变化数
+        self.coalesced = 0  # 与上一条相同而合并的数量
+        self.dropped = 0  # 被很快替代而丢弃的数量
+        self.batches = 0  # 发出的批次数
+        self.delivered = 0  # 发出的文本数
+        
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+    
+    def push(self, text, formats=None):
+        """接收一次剪贴板变化（formats 为同时复制的其他格式 {mime: bytes}）"""
+        now = time.monotonic()
+        self.received += 1
+        
+        if text == self._last_text:
+            self.coalesced += 1
+            return
+        self._last_text = text
+        
+        if self._pending and (now - self._pending[-1][2]) * 1000 < self.supersede:
+            self._pending.pop()
+            self.dropped += 1
+        
+        if self._first_at is None:
+            self._first_at = now
+        self._pending.append((text, formats or {}, now))
+        
+        # 重新计时，但不超过从第一条起的最长等待时间
+        remaining = self.max_delay - (now - self._first_at) * 1000
+        self._timer.start(int(max(0, min(self.window, remaining))))
+    
+    def flush(self):
+        """立即发出当前批次"""
+        self._timer.stop()
+        if not self._pending:
+            self._first_at = None
+            return
+        
+        texts = [text for text, _, _ in self._pending]
+        formats = [text_formats for _, text_formats, _ in self._pending]
+        self._pending.clear()
+        self._first_at = None
+        self.batches += 1
+        self.delivered += len(texts)
+        self.batch_ready.emit(texts, formats)
+    
+    def stats(self):
+        """采集统计"""
+        return {
+            'received': self.received,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'delivered': self.delivered,
+            'pending': len(self._pending),
+        }
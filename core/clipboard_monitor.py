@@ -2,15 +2,61 @@
 剪贴板监听模块
 监听系统剪贴板变化并发出信号
 """
+import sys
 from PyQt6.QtCore import QObject, pyqtSignal, QTimer
 from PyQt6.QtWidgets import QApplication
 
 
+def _get_sequence_reader():
+    """
+    获取读取系统剪贴板序号的函数（剪贴板每次改变时序号递增，读取时不获取内容）
+    
+    目前只支持 Windows（GetClipboardSequenceNumber），其他平台返回 None。
+    """
+    if sys.platform != 'win32':
+        return None
+    try:
+        import ctypes
+        reader = ctypes.windll.user32.GetClipboardSequenceNumber
+        reader.restype = ctypes.c_uint32
+        return reader
+    except (AttributeError, OSError):
+        return None
+
+
 class ClipboardMonitor(QObject):
-    """剪贴板监听器"""
+    """
+    剪贴板监听器
+    
+    以剪贴板的 dataChanged 信号为主，定时轮询为备用。检查时先比较廉价的特征
+    （系统剪贴板序号；平台不提供序号时比较格式列表和文本数据大小），有变化时
+    才获取完整文本；轮询在空闲时逐步延长间隔，检测到变化后恢复为最短间隔。超过采集上限的文本按策略截断或忽略。
+    检测到新文本时同时读取 capture_formats 中存在的其他格式（如 HTML、RTF）。
+    """
+    
+    # 信号：当剪贴板内容改变时发出，参数为 (文本, 其他格式 {mime: bytes})
+    # （文本声明为 object 以传递同一个对象，声明为 str 时每次发出都会经 QString
+    # 复制一份，超大文本的复制耗时可达秒级）
+    clipboard_changed = pyqtSignal(object, object)
     
-    # 信号：当剪贴板内容改变时发出
-    clipboard_changed = pyqtSignal(str)
+    # 默认随文本一起保存的剪贴板格式（存在时读取）
+    CAPTURE_FORMATS = (
+        'text/html',
+        'text/rtf',
+        'application/rtf',
+        'application/x-qt-windows-mime;value="Rich Text Format"',
+        'text/uri-list',
+        'image/png',
+    )
+    # 默认的文本采集上限（字符数），超过时按策略截断或忽略
+    CAPTURE_MAX_CHARS = 32 * 1024 * 1024
+    # 单个格式超过该字节数时不保存
+    CAPTURE_FORMAT_MAX_BYTES = 16 * 1024 * 1024
+    
+    # 轮询间隔范围（毫秒）及空闲时每次延长的倍数
+    POLL_MIN_INTERVAL = 500
+    POLL_MAX_INTERVAL = 5000
+    POLL_BACKOFF = 1.5
     
     def __init__(self):
         super().__init__()
@@ -20,23 +66,35 @@ class ClipboardMonitor(QObject):
         self.ignore_self = True  # 是否忽略自身复制操作
         self.card_windows = []  # 保存所有贴卡窗口的引用
         self.internal_copy_flag = False  # 内部复制标记
+        self.capture_max_chars = self.CAPTURE_MAX_CHARS  # 采集的最大字符数，0 表示不限制
+        self.capture_oversize = 'truncate'  # 超过上限时的处理：truncate 截断 / ignore 忽略
+        self.capture_formats = self.CAPTURE_FORMATS  # 随文本一起保存的其他格式
+        self.capture_format_max_bytes = self.CAPTURE_FORMAT_MAX_BYTES
         
         # 连接剪贴板信号（主要机制）
         self.clipboard.dataChanged.connect(self._on_clipboard_changed)
         
+        # 系统剪贴板序号（平台不支持时为 None）
+        self._read_sequence = _get_sequence_reader()
+        self.last_sequence = 0
+        self.last_signature = None  # 上次检查时的剪贴板特征（格式列表和数据大小）
+        
         # 轮询定时器（备用机制，解决信号不触发的问题）
         self.poll_timer = QTimer()
         self.poll_timer.timeout.connect(self._poll_clipboard)
-        self.poll_interval = 500  # 轮询间隔（毫秒）
+        self.poll_interval = self.POLL_MIN_INTERVAL  # 当前轮询间隔（毫秒）
     
     def start_monitoring(self):
         """开始监听剪贴板"""
         self.monitoring = True
         # 获取当前剪贴板内容作为初始值
+        self.last_sequence = self._get_sequence()
+        self.last_signature = self._get_signature(self.clipboard.mimeData())
         self.last_text = self.clipboard.text()
         # 启动轮询定时器（备用机制）
+        self.poll_interval = self.POLL_MIN_INTERVAL
         self.poll_timer.start(self.poll_interval)
-        print(f"✓ 剪贴板监听已启动（信号 + {self.poll_interval}ms轮询）")
+        print(f"✓ 剪贴板监听已启动（信号 + {self.POLL_MIN_INTERVAL}~{self.POLL_MAX_INTERVAL}ms轮询）")
     
     def stop_monitoring(self):
         """停止监听剪贴板"""
@@ -54,39 +112,118 @@ class ClipboardMonitor(QObject):
         if not self.monitoring:
             return
         
-        self._check_and_emit_change(source="信号")
+        # 信号已确认剪贴板改变，不比较特征（内容不同但格式和大小相同时特征不变）
+        self._check_and_emit_change(source="信号", check_signature=False)
+        # 剪贴板有活动，轮询恢复为最短间隔
+        self._set_poll_interval(self.POLL_MIN_INTERVAL)
     
     def _poll_clipboard(self):
         """轮询检查剪贴板（备用机制）"""
         if not self.monitoring:
             return
         
-        self._check_and_emit_change(source="轮询")
+        if self._check_and_emit_change(source="轮询"):
+            self._set_poll_interval(self.POLL_MIN_INTERVAL)
+        else:
+            # 空闲时逐步延长间隔
+            self._set_poll_interval(min(self.POLL_MAX_INTERVAL, int(self.poll_interval * self.POLL_BACKOFF)))
+    
+    def _set_poll_interval(self, interval):
+        """修改轮询间隔（监听中时立即生效）"""
+        if interval != self.poll_interval:
+            self.poll_interval = interval
+            if self.poll_timer.isActive():
+                self.poll_timer.setInterval(interval)
+    
+    def _get_sequence(self):
+        """系统剪贴板序号，不支持时返回 0"""
+        return self._read_sequence() if self._read_sequence else 0
+    
+    def _get_signature(self, mime_data):
+        """
+        剪贴板特征：格式列表及各文本格式的数据大小，无内容时返回 None
+        
+        只读取原始字节的大小，不解码为文本、不在 Python 中复制和比较完整内容。
+        """
+        if mime_data is None:
+            return None
+        formats = tuple(mime_data.formats())
+        sizes = tuple(mime_data.data(mime).size() for mime in formats if mime.startswith('text/'))
+        return formats, sizes
     
-    def _check_and_emit_change(self, source="未知"):
+    def _check_and_emit_change(self, source="未知", check_signature=True):
         """检查剪贴板变化并发射信号
         
         Args:
             source: 触发源（信号/轮询），用于调试
+            check_signature: 平台不提供剪贴板序号时，是否在特征未变时跳过获取文本
+        
+        Returns:
+            是否检测到新的文本并发出了信号
         """
+        # 系统序号未变时剪贴板没有改变，无需获取内容
+        sequence = self._get_sequence()
+        if sequence and sequence == self.last_sequence:
+            return False
+        self.last_sequence = sequence
+        
         # 检查标记位（优先级最高）
         if self.ignore_self and self.internal_copy_flag:
             # print(f"✓ [{source}] 检测到内部复制标记，已忽略")
-            return
+            return False
         
         # 检查焦点（双重保险）
         if self.ignore_self and self._is_internal_copy():
             # print(f"✓ [{source}] 检测到焦点在贴卡内，已忽略")
-            return
+            return False
+        
+        # 不包含文本时（如图片）只检查格式，不获取内容
+        mime_data = self.clipboard.mimeData()
+        if mime_data is None or not mime_data.hasText():
+            self.last_signature = None
+            return False
+        
+        # 没有系统序号时比较格式列表和数据大小，未变时无需获取文本
+        if not sequence:
+            signature = self._get_signature(mime_data)
+            if check_signature and signature == self.last_signature:
+                return False
+            self.last_signature = signature
         
         # 获取剪贴板文本
         text = self.clipboard.text()
         
         # 检查是否为文本内容且与上次不同
         if text and text != self.last_text:
-            self.last_text = text
+            self.last_text = text  # 保存原始文本，用于判断后续是否改变
+            if self.capture_max_chars and len(text) > self.capture_max_chars:
+                if self.capture_oversize == 'ignore':
+                    print(f"[{source}] 剪贴板文本过大（{len(text)} 字符），已忽略")
+                    return False
+                print(f"[{source}] 剪贴板文本过大（{len(text)} 字符），截断为 {self.capture_max_chars} 字符")
+                text = text[:self.capture_max_chars]
+                formats = {}  # 其他格式与截断后的文本不再对应
+            else:
+                formats = self._read_formats(mime_data)
             print(f"[{source}] 检测到剪贴板变化: {text[:50]}...")
-            self.clipboard_changed.emit(text)
+            self.clipboard_changed.emit(text, formats)
+            return True
+        return False
+    
+    def _read_formats(self, mime_data):
+        """读取剪贴板中存在的其他格式，返回 {mime: bytes}（跳过过大的格式）"""
+        if not self.capture_formats:
+            return {}
+        
+        available = set(mime_data.formats())
+        formats = {}
+        for mime in self.capture_formats:
+            if mime not in available:
+                continue
+            data = mime_data.data(mime)
+            if 0 < data.size() <= self.capture_format_max_bytes:
+                formats[mime] = data.data()
+        return formats
     
     def _is_internal_copy(self):
         """检查当前焦点是否在贴卡窗口中"""
@@ -136,6 +273,29 @@ class ClipboardMonitor(QObject):
         if card in self.card_windows:
             self.card_windows.remove(card)
     
+    def set_capture_limit(self, max_chars, oversize='truncate'):
+        """设置采集上限
+        
+        系统剪贴板无法在获取内容前得知文本大小，上限在获取后立即应用，
+        超大文本不会继续传给采集队列、存储和界面。
+        
+        Args:
+            max_chars: 最大字符数，0 表示不限制
+            oversize: 超过上限时的处理，'truncate' 截断 / 'ignore' 忽略
+        """
+        self.capture_max_chars = max_chars
+        self.capture_oversize = oversize
+    
+    def set_capture_formats(self, formats, max_bytes=CAPTURE_FORMAT_MAX_BYTES):
+        """设置随文本一起保存的其他格式
+        
+        Args:
+            formats: mime 类型列表，空列表表示只保存文本
+            max_bytes: 单个格式的最大字节数
+        """
+        self.capture_formats = tuple(formats)
+        self.capture_format_max_bytes = max_bytes
+    
     def set_ignore_self(self, ignore):
         """设置是否忽略自身复制操作"""
         self.ignore_self = ignore
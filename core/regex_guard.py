@@ -0,0 +1,210 @@
+"""
+正则执行保护
+在独立进程中执行用户正则，超过时间预算时终止进程，避免灾难性回溯卡死程序
+"""
+import re
+import time
+import threading
+import multiprocessing
+from typing import Any, Callable, Optional
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants  # Python 3.11+
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+class RegexTimeout(Exception):
+    """正则执行超过时间预算"""
+    
+    def __init__(self, pattern: str, timeout: float):
+        super().__init__(f"正则 {pattern} 执行超过 {timeout:g} 秒")
+        self.pattern = pattern
+        self.timeout = timeout
+
+
+class RegexGuard:
+    """
+    正则执行保护
+    
+    正则操作发送到常驻的工作进程中执行（首次使用时启动）。等待结果期间定期调用
+    check 回调（可抛出异常以取消）；超时或取消时终止工作进程，下次使用时重新启动。
+    同一时间只执行一个操作。
+    """
+    
+    # 等待结果时检查超时和取消的间隔（秒）
+    POLL_INTERVAL = 0.1
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+    
+    def sub(self, pattern: str, flags: int, replacement: str, text: str,
+            timeout: float, check: Optional[Callable[[], None]] = None) -> str:
+        """替换所有匹配"""
+        return self.run('sub', pattern, flags, (replacement, text), timeout, check)
+    
+    def subn(self, pattern: str, flags: int, replacement: str, text: str,
+             timeout: float, check: Optional[Callable[[], None]] = None):
+        """替换所有匹配，返回 (结果, 替换次数)"""
+        return self.run('subn', pattern, flags, (replacement, text), timeout, check)
+    
+    def search(self, pattern: str, flags: int, text: str, pos: int,
+               timeout: float, check: Optional[Callable[[], None]] = None):
+        """从 pos 开始查找，返回匹配范围 (start, end)，未找到返回 None"""
+        return self.run('search', pattern, flags, (text, pos), timeout, check)
+    
+    def count(self, pattern: str, flags: int, text: str,
+              timeout: float, check: Optional[Callable[[], None]] = None) -> int:
+        """统计匹配数量"""
+        return self.run('count', pattern, flags, (text,), timeout, check)
+    
+    def run(self, op: str, pattern: str, flags: int, args: tuple,
+            timeout: float, check: Optional[Callable[[], None]] = None) -> Any:
+        """
+        在工作进程中执行正则操作（timeout 为 0 或 None 时在当前线程中直接执行）
+        
+        Raises:
+            RegexTimeout: 超过时间预算
+            re.error: 正则或替换模板无效
+            check 抛出的异常（如 ProcessCancelled）
+        """
+        if not timeout:
+            return _execute(op, pattern, flags, args)
+        
+        with self._lock:
+            conn = self._ensure_worker()
+            deadline = time.monotonic() + timeout
+            try:
+                conn.send((op, pattern, flags, args))
+                while not conn.poll(self.POLL_INTERVAL):
+                    if check:
+                        check()
+                    if time.monotonic() >= deadline:
+                        raise RegexTimeout(pattern, timeout)
+                    if not self._process.is_alive():
+                        raise RuntimeError("正则工作进程意外退出")
+                ok, value = conn.recv()
+            except BaseException:
+                # 工作进程可能仍在回溯中，直接终止
+                self._stop_worker()
+                raise
+        
+        if not ok:
+            raise value
+        return value
+    
+    def stop(self):
+        """终止工作进程"""
+        with self._lock:
+            self._stop_worker()
+    
+    def _ensure_worker(self):
+        """获取工作进程的连接（不存在时启动）"""
+        if self._process is None or not self._process.is_alive():
+            self._stop_worker()
+            # 使用 spawn：界面进程中有其他线程，fork 不安全
+            context = multiprocessing.get_context('spawn')
+            self._conn, child_conn = context.Pipe()
+            self._process = context.Process(
+                target=_guard_worker, args=(child_conn,),
+                name='RegexGuard', daemon=True
+            )
+            self._process.start()
+            child_conn.close()
+        return self._conn
+    
+    def _stop_worker(self):
+        """终止工作进程并关闭连接"""
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join(1)
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _guard_worker(conn):
+    """工作进程主循环：执行正则操作并返回 (是否成功, 结果或异常)"""
+    while True:
+        try:
+            op, pattern, flags, args = conn.recv()
+        except (EOFError, OSError):
+            break
+        
+        try:
+            result = _execute(op, pattern, flags, args)
+        except Exception as e:
+            conn.send((False, e))
+            continue
+        conn.send((True, result))
+
+
+def _execute(op: str, pattern: str, flags: int, args: tuple) -> Any:
+    """执行一个正则操作"""
+    regex = re.compile(pattern, flags)
+    if op == 'sub':
+        return regex.sub(*args)
+    if op == 'subn':
+        return regex.subn(*args)
+    if op == 'search':
+        match = regex.search(*args)
+        return match.span() if match else None
+    if op == 'count':
+        return sum(1 for _ in regex.finditer(*args))
+    raise ValueError(f"未知的正则操作: {op}")
+
+
+# ==================== 静态检查 ====================
+
+def has_nested_quantifier(pattern: str, flags: int = 0) -> bool:
+    """
+    正则是否包含嵌套量词（如 (a+)+、(\\w*\\s?)*），这类写法可能导致灾难性回溯
+    
+    正则无效时抛出 re.error。
+    """
+    return _walk_repeats(sre_parse.parse(pattern, flags))[1]
+
+
+def _walk_repeats(items):
+    """
+    递归遍历解析后的正则节点
+    
+    Returns:
+        (是否包含变长量词, 是否在可重复的量词内包含变长量词)
+    """
+    c = sre_constants
+    variable_found = False
+    nested = False
+    
+    for op, av in items:
+        children = ()
+        if op in (c.MAX_REPEAT, c.MIN_REPEAT):
+            # 变长且可重复多次的量词内，再出现变长量词会产生指数级的匹配方式
+            variable = av[0] != av[1]
+            inner_variable, inner_nested = _walk_repeats(av[2])
+            if variable and av[1] > 1 and inner_variable:
+                nested = True
+            variable_found = variable_found or variable or inner_variable
+            nested = nested or inner_nested
+            continue
+        if op is c.SUBPATTERN:
+            children = (av[3],)
+        elif op is c.BRANCH:
+            children = av[1]
+        elif op in (c.ASSERT, c.ASSERT_NOT):
+            children = (av[1],)
+        elif op is c.GROUPREF_EXISTS:
+            children = tuple(sub for sub in av[1:] if sub is not None)
+        # 占有量词和原子组内部不回溯，不检查
+        
+        for sub in children:
+            inner_variable, inner_nested = _walk_repeats(sub)
+            variable_found = variable_found or inner_variable
+            nested = nested or inner_nested
+    
+    return variable_found, nested
@@ -2,26 +2,177 @@
 数据存储模块
 使用SQLite存储剪贴板历史记录
 """
+import os
+import re
+import zlib
+import codecs
 import sqlite3
 import hashlib
-from datetime import datetime
+import functools
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 
+# 数据库结构版本（保存在 PRAGMA user_version 中）
+SCHEMA_VERSION = 6
+
+# 全文索引支持的分词器
+FTS_TOKENIZERS = ('unicode61', 'trigram')
+
+# 连接性能配置（连接时通过 PRAGMA 应用）
+PERFORMANCE_PROFILES = {
+    # 默认：WAL + NORMAL，提交时不再等待回滚日志 fsync，断电最多丢失最近的事务
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 64 * 1024 * 1024,
+        'cache_size': -16000,  # 负数表示 KiB，约 16MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # 安全：WAL + FULL，每次提交都落盘
+    'safe': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -4000,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    # 兼容：SQLite 默认的回滚日志模式（数据目录在网络盘等不支持 WAL 的位置时使用）
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -2000,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+}
+
+# 按顺序应用的 PRAGMA（journal_mode 需最先设置）
+PRAGMA_ORDER = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store', 'busy_timeout')
+
+# 超过该字节数的内容移到 clipboard_blobs 表并压缩存储
+BLOB_THRESHOLD = 4096
+
+# 超过该字节数的内容压缩后保存为单独的文件（流式写入和读取，全文索引只包含预览）
+SPILL_THRESHOLD = 8 * 1024 * 1024
+
+# 流式处理大内容时每块的大小（字符数 / 字节数）
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 列表预览保存的字符数
+PREVIEW_LENGTH = 100
+
+# 历史记录列表默认返回的轻量字段（不含内容）
+SUMMARY_COLUMNS = (
+    'id', 'content_hash', 'timestamp', 'is_favorite',
+    'char_count', 'word_count', 'byte_size', 'blob_hash', 'preview',
+)
+
+SYNCHRONOUS_NAMES = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+TEMP_STORE_NAMES = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+
+
+def _flush_pending_first(method):
+    """装饰器：加锁并先写入缓冲中的历史记录，保证读写看到最新数据"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self._flush_pending()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class StorageManager:
     """数据存储管理器"""
     
-    def __init__(self, db_file='textpin.db'):
+    def __init__(self, db_file='textpin.db', fts_tokenizer='unicode61',
+                 write_behind=False, batch_size=32, flush_interval=1.0,
+                 max_count=None, max_bytes=None, max_age_days=None,
+                 profile='balanced', pragmas=None, blob_threshold=BLOB_THRESHOLD,
+                 spill_threshold=SPILL_THRESHOLD, blob_dir=None, schedule_flush=None):
+        """
+        Args:
+            db_file: 数据库文件路径
+            fts_tokenizer: 全文索引分词器，unicode61（按词）或 trigram（按三字符，适合中日韩文本）
+            write_behind: 是否启用写入缓冲（历史记录先进入队列，再合并为一个事务写入）
+            batch_size: 缓冲记录达到该数量时立即写入
+            flush_interval: 缓冲中最早一条记录的最长等待时间（秒）
+            max_count: 最多保留的记录数（None 表示不限制）
+            max_bytes: 最多保留的内容总字节数（None 表示不限制）
+            max_age_days: 记录最长保留天数（None 表示不限制）
+            profile: 连接性能配置名称，见 PERFORMANCE_PROFILES
+            pragmas: 覆盖配置中的单项 PRAGMA，如 {'mmap_size': 0}
+            blob_threshold: 超过该字节数的内容按哈希单独压缩存储
+            spill_threshold: 超过该字节数的内容压缩保存为 blob_dir 中的文件（0 表示不使用）
+            blob_dir: 保存大内容文件的目录，默认为数据库文件旁的 "<数据库名>_blobs"
+            schedule_flush: 安排延迟写入的函数 schedule_flush(秒)，调用方到时后在持有连接的线程中
+                调用 flush()；None 表示使用 threading.Timer（单独使用 StorageManager 时）
+        
+        收藏的记录不受保留策略影响。
+        """
         self.db_file = db_file
         self.conn = None
+        self.fts_tokenizer = fts_tokenizer if fts_tokenizer in FTS_TOKENIZERS else 'unicode61'
+        self.fts_enabled = False  # 当前 SQLite 是否支持 FTS5
+        self._fts_rebuild_needed = False  # 迁移后需要重建全文索引
+        
+        # 大内容存储
+        self.blob_threshold = blob_threshold
+        self._blob_text_cache = {}  # 正在写入的大内容 {blob_hash: 文本}，避免触发器解压刚压缩的数据
+        if blob_dir is None and db_file != ':memory:':
+            blob_dir = Path(db_file).with_name(Path(db_file).stem + '_blobs')
+        self.blob_dir = Path(blob_dir) if blob_dir else None
+        self.spill_threshold = spill_threshold if self.blob_dir else 0
+        
+        # 写入缓冲
+        self.write_behind = write_behind
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending = {}  # {content_hash: 记录}，按加入顺序排列
+        self._last_timestamp_ms = 0  # 最近分配的记录时间（毫秒），保证按加入顺序严格递增
+        self._schedule_flush = schedule_flush
+        self._flush_scheduled = False  # 已安排延迟写入
+        self._flush_timer = None  # 未提供 schedule_flush 时使用的定时器
+        self._lock = threading.RLock()  # 连接可能被定时写入线程使用
+        
+        # 保留策略
+        self.max_count = max_count or None
+        self.max_bytes = max_bytes or None
+        self.max_age_days = max_age_days or None
+        self.prune_batch_size = 500  # 每个删除事务最多删除的记录数
+        self.prune_batches_per_write = 2  # 每次写入后最多执行的删除事务数
+        self.vacuum_pages = 1024  # 每次最多回收的空闲页数
+        self.on_pruned = None  # 按保留策略删除记录后调用 on_pruned(被删除的ID列表)
+        self.on_written = None  # 历史记录写入数据库后调用 on_written(记录ID列表)
+        
+        # 连接性能配置
+        self.profile = profile if profile in PERFORMANCE_PROFILES else 'balanced'
+        self.pragmas = dict(PERFORMANCE_PROFILES[self.profile])
+        self.pragmas.update(pragmas or {})
+        self.connection_info = {}  # 实际生效的连接参数
+        
         self._init_database()
     
     def _init_database(self):
         """初始化数据库"""
-        self.conn = sqlite3.connect(self.db_file)
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
+        # 触发器和查询通过该函数读取完整内容（内联或压缩存储）
+        self.conn.create_function('history_text', 2, self._history_text)
+        self.conn.create_function('history_index_text', 3, self._history_index_text)
         cursor = self.conn.cursor()
         
+        # 应用连接性能配置
+        self._apply_pragmas()
+        
+        # 新数据库启用增量自动清理（必须在建表前设置）
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
         # 创建剪贴板历史表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS clipboard_history (
@@ -43,106 +194,1060 @@ class StorageManager:
             )
         ''')
         
-        # 创建索引
+        # 创建索引（与分页排序键 (timestamp, id) 一致）
+        self._create_page_indexes()
+        
+        self.conn.commit()
+        
+        # 升级旧数据库结构
+        self._migrate()
+    
+    def _apply_pragmas(self):
+        """应用连接性能配置，并记录实际生效的值"""
+        cursor = self.conn.cursor()
+        
+        for name in PRAGMA_ORDER:
+            value = self.pragmas.get(name)
+            if value is None:
+                continue
+            try:
+                cursor.execute(f'PRAGMA {name} = {value}').fetchall()
+            except sqlite3.DatabaseError as e:
+                print(f"✗ 数据库参数 {name}={value} 设置失败: {e}")
+        
+        # 读回实际值（例如不支持 WAL 的文件系统会保持原日志模式）
+        info = {'profile': self.profile}
+        for name in PRAGMA_ORDER:
+            row = cursor.execute(f'PRAGMA {name}').fetchone()
+            info[name] = row[0] if row else None
+        info['journal_mode'] = str(info['journal_mode']).upper()
+        info['synchronous'] = SYNCHRONOUS_NAMES.get(info['synchronous'], info['synchronous'])
+        info['temp_store'] = TEMP_STORE_NAMES.get(info['temp_store'], info['temp_store'])
+        self.connection_info = info
+        
+        if info['journal_mode'] != str(self.pragmas.get('journal_mode', info['journal_mode'])).upper():
+            print(f"✗ 日志模式 {self.pragmas['journal_mode']} 不可用，当前为 {info['journal_mode']}")
+    
+    def _migrate(self):
+        """按版本号依次升级数据库结构"""
+        cursor = self.conn.cursor()
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        
+        if version < 1:
+            self._migrate_v1_fts()
+        if version < 2:
+            self._migrate_v2_retention()
+        if version < 3:
+            self._migrate_v3_blobs()
+        if version < 4:
+            self._migrate_v4_preview()
+        if version < 5:
+            self._migrate_v5_spill()
+        if version < 6:
+            self._migrate_v6_formats()
+        
+        if version < SCHEMA_VERSION:
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            self.conn.commit()
+            print(f"✓ 数据库结构已升级: v{version} → v{SCHEMA_VERSION}")
+        
+        # 分词器设置改变时重建全文索引
+        self._ensure_fts()
+    
+    def _migrate_v1_fts(self):
+        """v1: 创建全文索引并回填已有记录（在所有迁移完成后执行）"""
+        self._fts_rebuild_needed = True
+    
+    def _migrate_v2_retention(self):
+        """v2: 记录字节数、统计表（避免全表 COUNT/SUM）、增量自动清理"""
+        cursor = self.conn.cursor()
+        
+        columns = [row['name'] for row in cursor.execute('PRAGMA table_info(clipboard_history)')]
+        if 'byte_size' not in columns:
+            cursor.execute('ALTER TABLE clipboard_history ADD COLUMN byte_size INTEGER')
+        cursor.execute(
+            'UPDATE clipboard_history SET byte_size = length(CAST(content AS BLOB)) '
+            'WHERE byte_size IS NULL'
+        )
+        
+        # 统计表由触发器维护，保留策略据此判断是否超限
+        cursor.executescript('''
+            CREATE TABLE IF NOT EXISTS clipboard_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                row_count INTEGER NOT NULL,
+                total_bytes INTEGER NOT NULL
+            );
+            
+            DROP TRIGGER IF EXISTS clipboard_stats_ai;
+            DROP TRIGGER IF EXISTS clipboard_stats_ad;
+            DROP TRIGGER IF EXISTS clipboard_stats_au;
+            
+            CREATE TRIGGER clipboard_stats_ai AFTER INSERT ON clipboard_history BEGIN
+                UPDATE clipboard_stats
+                SET row_count = row_count + 1,
+                    total_bytes = total_bytes + COALESCE(new.byte_size, 0)
+                WHERE id = 1;
+            END;
+            
+            CREATE TRIGGER clipboard_stats_ad AFTER DELETE ON clipboard_history BEGIN
+                UPDATE clipboard_stats
+                SET row_count = row_count - 1,
+                    total_bytes = total_bytes - COALESCE(old.byte_size, 0)
+                WHERE id = 1;
+            END;
+            
+            CREATE TRIGGER clipboard_stats_au AFTER UPDATE OF byte_size ON clipboard_history BEGIN
+                UPDATE clipboard_stats
+                SET total_bytes = total_bytes - COALESCE(old.byte_size, 0) + COALESCE(new.byte_size, 0)
+                WHERE id = 1;
+            END;
+        ''')
+        cursor.execute('''
+            INSERT OR REPLACE INTO clipboard_stats (id, row_count, total_bytes)
+            SELECT 1, COUNT(*), COALESCE(SUM(byte_size), 0) FROM clipboard_history
+        ''')
+        self.conn.commit()
+        
+        # 旧数据库需要一次 VACUUM 才能切换到增量自动清理
+        if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            cursor.execute('VACUUM')
+            print("✓ 已启用增量自动清理")
+    
+    def _migrate_v3_blobs(self):
+        """v3: 内容哈希改为 BLAKE2，大内容移到按哈希寻址的压缩存储表"""
+        cursor = self.conn.cursor()
+        
+        # 旧的全文索引触发器引用内联内容，迁移期间先移除，稍后重建
+        cursor.executescript('''
+            DROP TRIGGER IF EXISTS clipboard_history_ai;
+            DROP TRIGGER IF EXISTS clipboard_history_ad;
+            DROP TRIGGER IF EXISTS clipboard_history_au;
+            DROP TABLE IF EXISTS clipboard_fts;
+            
+            CREATE TABLE IF NOT EXISTS clipboard_blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                raw_size INTEGER NOT NULL,
+                data BLOB NOT NULL
+            );
+        ''')
+        self._fts_rebuild_needed = True
+        
+        columns = [row['name'] for row in cursor.execute('PRAGMA table_info(clipboard_history)')]
+        if 'blob_hash' not in columns:
+            cursor.execute('ALTER TABLE clipboard_history ADD COLUMN blob_hash TEXT')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_blob_hash
+            ON clipboard_history(blob_hash) WHERE blob_hash IS NOT NULL
+        ''')
+        
+        # 分批重算哈希并移出大内容
+        last_id = 0
+        moved = 0
+        while True:
+            rows = cursor.execute('''
+                SELECT id, content FROM clipboard_history
+                WHERE id > ? AND blob_hash IS NULL
+                ORDER BY id LIMIT 500
+            ''', (last_id,)).fetchall()
+            if not rows:
+                break
+            
+            with self.conn:
+                for row in rows:
+                    data = row['content'].encode('utf-8')
+                    content_hash = self._get_content_hash(data)
+                    if len(data) > self.blob_threshold:
+                        self._store_blob(content_hash, data)
+                        self.conn.execute(
+                            "UPDATE clipboard_history SET content = '', content_hash = ?, blob_hash = ? WHERE id = ?",
+                            (content_hash, content_hash, row['id'])
+                        )
+                        moved += 1
+                    else:
+                        self.conn.execute(
+                            'UPDATE clipboard_history SET content_hash = ? WHERE id = ?',
+                            (content_hash, row['id'])
+                        )
+            last_id = rows[-1]['id']
+        
+        if moved:
+            print(f"✓ 已将 {moved} 条大内容移到压缩存储")
+            self._reclaim_space()
+    
+    def _migrate_v4_preview(self):
+        """v4: 保存列表预览文本，索引改为分页排序键 (timestamp, id)"""
+        cursor = self.conn.cursor()
+        
+        columns = [row['name'] for row in cursor.execute('PRAGMA table_info(clipboard_history)')]
+        if 'preview' not in columns:
+            cursor.execute('ALTER TABLE clipboard_history ADD COLUMN preview TEXT')
+        cursor.execute(
+            'UPDATE clipboard_history SET preview = substr(history_text(content, blob_hash), 1, ?) '
+            'WHERE preview IS NULL', (PREVIEW_LENGTH,)
+        )
+        
+        cursor.execute('DROP INDEX IF EXISTS idx_timestamp')
+        cursor.execute('DROP INDEX IF EXISTS idx_favorite')
+        self._create_page_indexes()
+        self.conn.commit()
+    
+    def _migrate_v5_spill(self):
+        """v5: 超大内容保存为单独文件，全文索引改为通过 history_index_text 获取文本"""
+        if self._fts_rebuild_needed:
+            return  # 稍后重建全文索引时创建新的触发器
+        
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clipboard_fts'"
+        ).fetchone()
+        if exists:
+            # 已有记录的索引文本不变，只需替换触发器
+            self._create_fts_triggers(self.conn.cursor())
+            self.conn.commit()
+    
+    def _migrate_v6_formats(self):
+        """v6: 保存复制时剪贴板中的其他格式（HTML、RTF 等），按记录压缩存储"""
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS clipboard_formats (
+                history_id INTEGER NOT NULL,
+                mime TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                raw_size INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (history_id, mime)
+            ) WITHOUT ROWID;
+            
+            DROP TRIGGER IF EXISTS clipboard_history_formats_ad;
+            CREATE TRIGGER clipboard_history_formats_ad AFTER DELETE ON clipboard_history BEGIN
+                DELETE FROM clipboard_formats WHERE history_id = old.id;
+            END;
+        ''')
+        self.conn.commit()
+    
+    def _create_page_indexes(self):
+        """创建按时间分页使用的索引"""
+        cursor = self.conn.cursor()
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_timestamp 
-            ON clipboard_history(timestamp DESC)
+            ON clipboard_history(timestamp, id)
         ''')
         
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_favorite 
-            ON clipboard_history(is_favorite, timestamp DESC)
+            ON clipboard_history(is_favorite, timestamp, id)
         ''')
+    
+    def _ensure_fts(self):
+        """确认全文索引存在且分词器与设置一致"""
+        cursor = self.conn.cursor()
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clipboard_fts'"
+        ).fetchone()
+        current = self.get_setting('fts_tokenizer')
+        
+        if exists and current == self.fts_tokenizer and not self._fts_rebuild_needed:
+            self.fts_enabled = True
+            return
+        
+        self._create_fts(self.fts_tokenizer)
+    
+    def _create_fts(self, tokenizer):
+        """（重新）创建 FTS5 虚拟表、同步触发器，并从历史表回填索引"""
+        cursor = self.conn.cursor()
+        self._fts_rebuild_needed = False
+        
+        try:
+            cursor.execute('DROP TABLE IF EXISTS clipboard_fts')
+            # 无内容表：文本由 history_text() 提供（大内容不在历史表中）
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE clipboard_fts USING fts5(
+                    content,
+                    content = '',
+                    tokenize = '{tokenizer}'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            if tokenizer != 'unicode61':
+                # 旧版本 SQLite 不支持 trigram，退回默认分词器
+                print(f"✗ 分词器 {tokenizer} 不可用（{e}），改用 unicode61")
+                self.fts_tokenizer = 'unicode61'
+                return self._create_fts('unicode61')
+            # 当前 SQLite 未编译 FTS5，搜索退回 LIKE 扫描
+            print(f"✗ 全文索引不可用，搜索将使用 LIKE: {e}")
+            self.fts_enabled = False
+            return
+        
+        self._create_fts_triggers(cursor)
         
+        # 回填已有记录
+        cursor.execute(
+            'INSERT INTO clipboard_fts(rowid, content) '
+            'SELECT id, history_index_text(content, blob_hash, preview) FROM clipboard_history'
+        )
+        cursor.execute(
+            'INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)',
+            ('fts_tokenizer', tokenizer)
+        )
         self.conn.commit()
+        self.fts_enabled = True
+        print(f"✓ 全文索引已就绪（分词器: {tokenizer}）")
+    
+    def _create_fts_triggers(self, cursor):
+        """创建保持索引与历史表同步的触发器（仅内容变化时更新索引）"""
+        cursor.executescript('''
+            DROP TRIGGER IF EXISTS clipboard_history_ai;
+            DROP TRIGGER IF EXISTS clipboard_history_ad;
+            DROP TRIGGER IF EXISTS clipboard_history_au;
+            
+            CREATE TRIGGER clipboard_history_ai AFTER INSERT ON clipboard_history BEGIN
+                INSERT INTO clipboard_fts(rowid, content)
+                VALUES (new.id, history_index_text(new.content, new.blob_hash, new.preview));
+            END;
+            
+            CREATE TRIGGER clipboard_history_ad AFTER DELETE ON clipboard_history BEGIN
+                INSERT INTO clipboard_fts(clipboard_fts, rowid, content)
+                VALUES ('delete', old.id, history_index_text(old.content, old.blob_hash, old.preview));
+            END;
+            
+            CREATE TRIGGER clipboard_history_au AFTER UPDATE OF content, blob_hash ON clipboard_history BEGIN
+                INSERT INTO clipboard_fts(clipboard_fts, rowid, content)
+                VALUES ('delete', old.id, history_index_text(old.content, old.blob_hash, old.preview));
+                INSERT INTO clipboard_fts(rowid, content)
+                VALUES (new.id, history_index_text(new.content, new.blob_hash, new.preview));
+            END;
+        ''')
+    
+    def _get_content_hash(self, data):
+        """获取内容（UTF-8 字节）的哈希值"""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    
+    # ==================== 大内容存储 ====================
+    
+    def _store_blob(self, blob_hash, data):
+        """按哈希保存内容（已存在时跳过），压缩后更小才使用压缩数据"""
+        exists = self.conn.execute(
+            'SELECT 1 FROM clipboard_blobs WHERE hash = ?', (blob_hash,)
+        ).fetchone()
+        if exists:
+            return
+        
+        codec, payload = self._compress(data)
+        self.conn.execute(
+            'INSERT INTO clipboard_blobs (hash, codec, raw_size, data) VALUES (?, ?, ?, ?)',
+            (blob_hash, codec, len(data), payload)
+        )
+    
+    @staticmethod
+    def _compress(data):
+        """压缩数据，压缩后更小才使用压缩数据，返回 (codec, 数据)"""
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return 'zlib', compressed
+        return 'raw', data
+    
+    def _spill_blob(self, blob_hash, content):
+        """按哈希将内容分块压缩写入单独的文件（已存在时跳过）"""
+        exists = self.conn.execute(
+            'SELECT 1 FROM clipboard_blobs WHERE hash = ?', (blob_hash,)
+        ).fetchone()
+        if exists:
+            return
+        
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        path = self._spill_path(blob_hash)
+        temp_path = path.with_suffix('.tmp')
+        compressor = zlib.compressobj(6)
+        raw_size = 0
+        with open(temp_path, 'wb') as f:
+            for chunk in self._iter_chunks(content):
+                data = chunk.encode('utf-8')
+                raw_size += len(data)
+                f.write(compressor.compress(data))
+            f.write(compressor.flush())
+        os.replace(temp_path, path)
+        
+        self.conn.execute(
+            "INSERT INTO clipboard_blobs (hash, codec, raw_size, data) VALUES (?, 'file', ?, ?)",
+            (blob_hash, raw_size, b'')
+        )
+    
+    def _spill_path(self, blob_hash):
+        """单独保存的内容文件路径"""
+        return self.blob_dir / f'{blob_hash}.zlib'
+    
+    def _iter_spilled_text(self, blob_hash):
+        """流式读取并解压单独保存的内容，逐块返回文本（调用时即打开文件，之后只读取文件）"""
+        return self._iter_compressed_file(open(self._spill_path(blob_hash), 'rb'))
+    
+    @staticmethod
+    def _iter_compressed_file(f):
+        """流式解压已打开的文件，逐块返回文本（读取结束后关闭文件）"""
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with f:
+            while True:
+                data = f.read(STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+                # 限制每次解压的输出大小，高压缩比的内容不会一次展开
+                while data:
+                    text = decoder.decode(decompressor.decompress(data, STREAM_CHUNK_SIZE))
+                    data = decompressor.unconsumed_tail
+                    if text:
+                        yield text
+        text = decoder.decode(decompressor.flush(), final=True)
+        if text:
+            yield text
+    
+    @staticmethod
+    def _iter_chunks(content):
+        """将文本按 STREAM_CHUNK_SIZE 个字符分块"""
+        for start in range(0, len(content), STREAM_CHUNK_SIZE):
+            yield content[start:start + STREAM_CHUNK_SIZE]
+    
+    def _load_blob(self, blob_hash):
+        """读取并解压内容"""
+        row = self.conn.execute(
+            'SELECT codec, data FROM clipboard_blobs WHERE hash = ?', (blob_hash,)
+        ).fetchone()
+        if not row:
+            return None
+        
+        if row['codec'] == 'file':
+            try:
+                return ''.join(self._iter_spilled_text(blob_hash))
+            except (OSError, zlib.error, UnicodeDecodeError) as e:
+                print(f"✗ 读取大内容文件失败: {blob_hash} - {e}")
+                return None
+        
+        data = row['data']
+        if row['codec'] == 'zlib':
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+    
+    def _store_formats(self, history_id, formats):
+        """保存记录的其他剪贴板格式（替换该记录原有的格式）"""
+        self.conn.execute('DELETE FROM clipboard_formats WHERE history_id = ?', (history_id,))
+        rows = []
+        for mime, data in formats.items():
+            codec, payload = self._compress(data)
+            rows.append((history_id, mime, codec, len(data), payload))
+        self.conn.executemany(
+            'INSERT INTO clipboard_formats (history_id, mime, codec, raw_size, data) '
+            'VALUES (?, ?, ?, ?, ?)', rows
+        )
+    
+    def _history_text(self, content, blob_hash):
+        """SQL 函数 history_text(content, blob_hash)：返回记录的完整文本"""
+        if not blob_hash:
+            return content
+        
+        text = self._blob_text_cache.get(blob_hash)
+        if text is None:
+            text = self._load_blob(blob_hash)
+        return text if text is not None else content
+    
+    def _history_index_text(self, content, blob_hash, preview):
+        """SQL 函数 history_index_text(content, blob_hash, preview)：全文索引和 LIKE 搜索使用的文本"""
+        if blob_hash and blob_hash not in self._blob_text_cache:
+            row = self.conn.execute(
+                'SELECT codec FROM clipboard_blobs WHERE hash = ?', (blob_hash,)
+            ).fetchone()
+            if row and row['codec'] == 'file':
+                # 单独保存的超大内容不读取全文，只使用预览
+                return preview or ''
+        return self._history_text(content, blob_hash)
+    
+    def _delete_orphan_blobs(self, blob_hashes=None):
+        """
+        删除不再被任何记录引用的内容
+        
+        Args:
+            blob_hashes: 只检查这些哈希；None 表示检查全部
+        """
+        orphan_filter = '''
+            NOT EXISTS (SELECT 1 FROM clipboard_history WHERE blob_hash = clipboard_blobs.hash)
+        '''
+        if blob_hashes is None:
+            spilled = [row['hash'] for row in self.conn.execute(
+                f"SELECT hash FROM clipboard_blobs WHERE codec = 'file' AND {orphan_filter}"
+            )]
+            self.conn.execute(f'DELETE FROM clipboard_blobs WHERE {orphan_filter}')
+        else:
+            hashes = [(h,) for h in blob_hashes if h]
+            spilled = [h for (h,) in hashes if self.conn.execute(
+                f"SELECT 1 FROM clipboard_blobs WHERE hash = ? AND codec = 'file' AND {orphan_filter}",
+                (h,)
+            ).fetchone()]
+            self.conn.executemany(
+                f'DELETE FROM clipboard_blobs WHERE hash = ? AND {orphan_filter}', hashes
+            )
+        
+        # 删除对应的内容文件
+        for blob_hash in spilled:
+            try:
+                self._spill_path(blob_hash).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"✗ 删除大内容文件失败: {blob_hash} - {e}")
     
-    def _get_content_hash(self, content):
-        """获取内容的哈希值"""
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+    def _select_columns(self, include_content, prefix=''):
+        """构造查询字段列表；include_content 为 True 时附带完整内容"""
+        columns = [f'{prefix}{name}' for name in SUMMARY_COLUMNS]
+        if include_content:
+            columns.append(f'history_text({prefix}content, {prefix}blob_hash) AS content')
+        return ', '.join(columns)
     
     def _count_words(self, content):
-        """统计单词数"""
-        return len(content.split())
+        """统计单词数（大内容分块统计，不生成完整的单词列表）"""
+        if len(content) <= STREAM_CHUNK_SIZE:
+            return len(content.split())
+        
+        count = 0
+        previous_in_word = False
+        for chunk in self._iter_chunks(content):
+            count += len(chunk.split())
+            # 跨越分块边界的单词被统计了两次
+            if previous_in_word and not chunk[0].isspace():
+                count -= 1
+            previous_in_word = not chunk[-1].isspace()
+        return count
     
     def add_history(self, content):
-        """添加历史记录"""
+        """
+        添加历史记录
+        
+        Returns:
+            记录ID；写入缓冲模式下记录尚未落盘，返回 None
+        """
         if not content or not content.strip():
             return None
+        return self.add_history_many([content])[0]
+    
+    def add_history_many(self, contents, formats=None):
+        """
+        按顺序添加多条历史记录（不写入缓冲时在同一个事务中写入）
         
-        content_hash = self._get_content_hash(content)
-        char_count = len(content)
-        word_count = self._count_words(content)
+        Args:
+            contents: 文本列表
+            formats: 与 contents 对应的其他剪贴板格式列表 [{mime: bytes}, ...]，可省略
         
-        cursor = self.conn.cursor()
+        Returns:
+            各条记录的ID列表（与 contents 对应）；空内容和写入缓冲模式下为 None
+        """
+        formats = formats or [None] * len(contents)
+        entries = [self._make_entry(content, content_formats) if content and content.strip() else None
+                   for content, content_formats in zip(contents, formats)]
+        valid = [entry for entry in entries if entry]
+        if not valid:
+            return [None] * len(entries)
         
-        # 检查是否已存在
-        cursor.execute(
-            'SELECT id FROM clipboard_history WHERE content_hash = ?',
-            (content_hash,)
+        with self._lock:
+            if not self.write_behind:
+                ids = iter(self._write_entries(valid))
+                return [next(ids) if entry else None for entry in entries]
+            
+            for entry in valid:
+                # 相同内容只保留最新一次
+                self._pending.pop(entry[1], None)
+                self._pending[entry[1]] = entry
+            
+            if len(self._pending) >= self.batch_size:
+                self._flush_pending()
+            elif not self._flush_scheduled:
+                self._flush_scheduled = True
+                if self._schedule_flush:
+                    self._schedule_flush(self.flush_interval)
+                else:
+                    self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+        return [None] * len(entries)
+    
+    def _make_entry(self, content, formats=None):
+        """生成待写入的记录 (content, content_hash, char_count, word_count, byte_size, timestamp, formats)"""
+        if len(content) <= STREAM_CHUNK_SIZE:
+            data = content.encode('utf-8')
+            content_hash = self._get_content_hash(data)
+            byte_size = len(data)
+        else:
+            # 大内容分块编码计算哈希和大小，不生成完整的 UTF-8 副本
+            hasher = hashlib.blake2b(digest_size=16)
+            byte_size = 0
+            for chunk in self._iter_chunks(content):
+                data = chunk.encode('utf-8')
+                hasher.update(data)
+                byte_size += len(data)
+            content_hash = hasher.hexdigest()
+        return (
+            content,
+            content_hash,
+            len(content),
+            self._count_words(content),
+            byte_size,
+            self._next_timestamp(),
+            formats or None,
         )
-        existing = cursor.fetchone()
+    
+    def _next_timestamp(self):
+        """
+        分配记录时间：以加入时间为准，精确到毫秒（UTC，与 CURRENT_TIMESTAMP 格式兼容）
         
-        if existing:
-            # 更新时间戳 - 使用 SQLite 的 CURRENT_TIMESTAMP 确保格式一致
-            cursor.execute(
-                'UPDATE clipboard_history SET timestamp = CURRENT_TIMESTAMP WHERE id = ?',
-                (existing['id'],)
-            )
-            self.conn.commit()
-            print(f"✓ 更新已存在记录的时间戳: ID={existing['id']}")
-            return existing['id']
-        else:
-            # 插入新记录 - 使用 CURRENT_TIMESTAMP 确保与更新时格式一致
+        同一毫秒内加入的多条记录（如同一批）依次加 1 毫秒，按 (timestamp, id) 排序时与加入顺序一致。
+        """
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            self._last_timestamp_ms = max(now_ms, self._last_timestamp_ms + 1)
+            seconds, ms = divmod(self._last_timestamp_ms, 1000)
+        return f"{datetime.fromtimestamp(seconds, timezone.utc):%Y-%m-%d %H:%M:%S}.{ms:03d}"
+    
+    def flush(self):
+        """立即写入缓冲中的历史记录"""
+        with self._lock:
+            self._flush_pending()
+    
+    @property
+    def pending_count(self):
+        """缓冲中尚未写入的记录数"""
+        return len(self._pending)
+    
+    def _flush_pending(self):
+        """写入缓冲中的记录（调用方需持有锁）"""
+        # 已安排的延迟写入到时后发现缓冲为空，不会重复写入
+        self._flush_scheduled = False
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        
+        if not self._pending or self.conn is None:
+            return
+        
+        entries = list(self._pending.values())
+        self._pending.clear()
+        self._write_entries(entries)
+        if len(entries) > 1:
+            print(f"✓ 批量写入 {len(entries)} 条历史记录")
+    
+    def _write_entries(self, entries):
+        """
+        在单个事务中写入多条历史记录
+        
+        Args:
+            entries: [(content, content_hash, char_count, word_count, byte_size, timestamp, formats), ...]
+        
+        Returns:
+            各条记录的ID列表
+        """
+        ids = []
+        with self.conn:
+            cursor = self.conn.cursor()
+            for content, content_hash, char_count, word_count, byte_size, timestamp, formats in entries:
+                # 检查是否已存在
+                cursor.execute(
+                    'SELECT id FROM clipboard_history WHERE content_hash = ?',
+                    (content_hash,)
+                )
+                existing = cursor.fetchone()
+                
+                if existing:
+                    # 更新时间戳
+                    cursor.execute(
+                        'UPDATE clipboard_history SET timestamp = ? WHERE id = ?',
+                        (timestamp, existing['id'])
+                    )
+                    print(f"✓ 更新已存在记录的时间戳: ID={existing['id']}")
+                    ids.append(existing['id'])
+                else:
+                    # 插入新记录，大内容按哈希压缩存储，超大内容保存为单独的文件
+                    blob_hash = None
+                    if self.spill_threshold and byte_size > self.spill_threshold:
+                        blob_hash = content_hash
+                        self._spill_blob(blob_hash, content)
+                    elif byte_size > self.blob_threshold:
+                        blob_hash = content_hash
+                        self._store_blob(blob_hash, content.encode('utf-8'))
+                        self._blob_text_cache[blob_hash] = content
+                    
+                    try:
+                        cursor.execute('''
+                            INSERT INTO clipboard_history 
+                            (content, content_hash, char_count, word_count, byte_size,
+                             blob_hash, preview, timestamp) 
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', ('' if blob_hash else content, content_hash, char_count,
+                              word_count, byte_size, blob_hash,
+                              content[:PREVIEW_LENGTH], timestamp))
+                    finally:
+                        self._blob_text_cache.pop(blob_hash, None)
+                    print(f"✓ 插入新记录: ID={cursor.lastrowid}")
+                    ids.append(cursor.lastrowid)
+                
+                if formats:
+                    self._store_formats(ids[-1], formats)
+        
+        if self.on_written:
+            self.on_written(ids)
+        
+        # 超出保留策略时增量删除最旧的记录
+        self._prune(self.prune_batches_per_write)
+        return ids
+    
+    # ==================== 保留策略 ====================
+    
+    def set_retention(self, max_count=None, max_bytes=None, max_age_days=None):
+        """
+        设置保留策略并立即清理超出部分
+        
+        Args:
+            max_count: 最多保留的记录数（None/0 表示不限制）
+            max_bytes: 最多保留的内容总字节数（None/0 表示不限制）
+            max_age_days: 记录最长保留天数（None/0 表示不限制）
+        
+        Returns:
+            删除的记录数
+        """
+        with self._lock:
+            self.max_count = max_count or None
+            self.max_bytes = max_bytes or None
+            self.max_age_days = max_age_days or None
+            self._flush_pending()
+            return self._prune()
+    
+    def prune_history(self, max_batches=None):
+        """
+        按保留策略删除超出的非收藏记录
+        
+        Args:
+            max_batches: 最多执行的删除事务数（None 表示直到满足策略）
+        
+        Returns:
+            删除的记录数
+        """
+        with self._lock:
+            self._flush_pending()
+            return self._prune(max_batches)
+    
+    def get_stats(self):
+        """获取记录总数和内容总字节数"""
+        with self._lock:
+            self._flush_pending()
+            row = self.conn.execute(
+                'SELECT row_count, total_bytes FROM clipboard_stats WHERE id = 1'
+            ).fetchone()
+            return (row['row_count'], row['total_bytes']) if row else (0, 0)
+    
+    def _prune(self, max_batches=None):
+        """
+        分批删除超出保留策略的记录（调用方需持有锁）
+        
+        每批按 (is_favorite, timestamp) 索引取最旧的记录，在单独的事务中删除，
+        不会重写整张表；删除后回收空闲页。
+        """
+        if not (self.max_count or self.max_bytes or self.max_age_days):
+            return 0
+        
+        deleted = []
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = self._select_prune_batch()
+            if not ids:
+                break
+            
+            with self.conn:
+                placeholders = ','.join('?' * len(ids))
+                blob_hashes = [row['blob_hash'] for row in self.conn.execute(
+                    f'SELECT blob_hash FROM clipboard_history WHERE id IN ({placeholders}) '
+                    'AND blob_hash IS NOT NULL', ids
+                )]
+                self.conn.executemany(
+                    'DELETE FROM clipboard_history WHERE id = ?',
+                    [(i,) for i in ids]
+                )
+                self._delete_orphan_blobs(blob_hashes)
+            deleted.extend(ids)
+            batches += 1
+        
+        if deleted:
+            print(f"✓ 按保留策略清理 {len(deleted)} 条历史记录")
+            self._reclaim_space()
+            if self.on_pruned:
+                self.on_pruned(deleted)
+        return len(deleted)
+    
+    def _select_prune_batch(self):
+        """选出下一批需要删除的记录ID"""
+        cursor = self.conn.cursor()
+        limit = self.prune_batch_size
+        
+        # 按保存时间
+        if self.max_age_days:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.max_age_days)
             cursor.execute('''
-                INSERT INTO clipboard_history 
-                (content, content_hash, char_count, word_count, timestamp) 
-                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (content, content_hash, char_count, word_count))
-            self.conn.commit()
-            print(f"✓ 插入新记录: ID={cursor.lastrowid}")
-            return cursor.lastrowid
+                SELECT id FROM clipboard_history
+                WHERE is_favorite = 0 AND timestamp < ?
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', (cutoff.strftime('%Y-%m-%d %H:%M:%S'), limit))
+            ids = [row['id'] for row in cursor.fetchall()]
+            if ids:
+                return ids
+        
+        row_count, total_bytes = cursor.execute(
+            'SELECT row_count, total_bytes FROM clipboard_stats WHERE id = 1'
+        ).fetchone()
+        
+        # 按记录数
+        if self.max_count and row_count > self.max_count:
+            cursor.execute('''
+                SELECT id FROM clipboard_history
+                WHERE is_favorite = 0
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', (min(row_count - self.max_count, limit),))
+            ids = [row['id'] for row in cursor.fetchall()]
+            if ids:
+                return ids
+        
+        # 按总字节数：从最旧的记录开始累计，直到释放足够空间
+        if self.max_bytes and total_bytes > self.max_bytes:
+            excess = total_bytes - self.max_bytes
+            cursor.execute('''
+                SELECT id, byte_size FROM clipboard_history
+                WHERE is_favorite = 0
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', (limit,))
+            ids = []
+            for row in cursor.fetchall():
+                ids.append(row['id'])
+                excess -= row['byte_size'] or 0
+                if excess <= 0:
+                    break
+            return ids
+        
+        return []
+    
+    def _reclaim_space(self):
+        """增量回收空闲页，缩小数据库文件"""
+        # executescript 会执行到完成；execute 每次只回收一页
+        self.conn.executescript(f'PRAGMA incremental_vacuum({self.vacuum_pages});')
     
-    def get_history(self, limit=50, favorites_only=False):
-        """获取历史记录列表"""
+    @_flush_pending_first
+    def get_history(self, limit=50, favorites_only=False, include_content=False):
+        """
+        获取历史记录列表
+        
+        Args:
+            include_content: 是否返回完整内容；默认只返回摘要字段，
+                             大内容不会被读取和解压
+        """
         cursor = self.conn.cursor()
+        columns = self._select_columns(include_content)
         
         if favorites_only:
-            query = '''
-                SELECT * FROM clipboard_history 
+            query = f'''
+                SELECT {columns} FROM clipboard_history 
                 WHERE is_favorite = 1 
-                ORDER BY timestamp DESC 
+                ORDER BY timestamp DESC, id DESC 
                 LIMIT ?
             '''
         else:
-            query = '''
-                SELECT * FROM clipboard_history 
-                ORDER BY timestamp DESC 
+            query = f'''
+                SELECT {columns} FROM clipboard_history 
+                ORDER BY timestamp DESC, id DESC 
                 LIMIT ?
             '''
         
         cursor.execute(query, (limit,))
         return cursor.fetchall()
     
+    @_flush_pending_first
+    def get_history_page(self, limit=50, before=None, favorites_only=False, after=None):
+        """
+        分页获取历史记录摘要（按时间倒序，不含完整内容）
+        
+        使用 (timestamp, id) 游标分页，翻页代价与页数无关。
+        
+        Args:
+            limit: 每页条数
+            before: 上一页最后一条的 (timestamp, id)；None 表示第一页
+            favorites_only: 只返回收藏
+            after: 只返回比该 (timestamp, id) 更新的记录（用于增量刷新）
+        
+        Returns:
+            记录列表，字段见 SUMMARY_COLUMNS
+        """
+        conditions = []
+        params = []
+        if favorites_only:
+            conditions.append('is_favorite = 1')
+        if before is not None:
+            conditions.append('(timestamp, id) < (?, ?)')
+            params.extend(before)
+        if after is not None:
+            conditions.append('(timestamp, id) > (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT {self._select_columns(False)} FROM clipboard_history 
+            {where}
+            ORDER BY timestamp DESC, id DESC 
+            LIMIT ?
+        ''', (*params, limit))
+        return cursor.fetchall()
+    
+    @_flush_pending_first
     def get_history_by_id(self, history_id):
-        """根据ID获取历史记录"""
+        """根据ID获取历史记录（含完整内容）"""
         cursor = self.conn.cursor()
         cursor.execute(
-            'SELECT * FROM clipboard_history WHERE id = ?',
+            f'SELECT {self._select_columns(True)} FROM clipboard_history WHERE id = ?',
             (history_id,)
         )
         return cursor.fetchone()
     
-    def search_history(self, keyword, limit=50):
-        """搜索历史记录"""
+    @_flush_pending_first
+    def iter_history_text(self, history_id):
+        """
+        逐块读取记录的完整文本（不经过 SQL 函数，单独保存的内容从文件流式解压）
+        
+        在调用线程中查询记录并打开文件，返回的迭代器只读取文件，可以在其他线程中使用。
+        
+        Returns:
+            文本块（每块最多 STREAM_CHUNK_SIZE 个字符）的迭代器；记录不存在或读取失败时返回 None
+        """
+        row = self.conn.execute('''
+            SELECT h.content, h.blob_hash, b.codec FROM clipboard_history h
+            LEFT JOIN clipboard_blobs b ON b.hash = h.blob_hash
+            WHERE h.id = ?
+        ''', (history_id,)).fetchone()
+        if not row:
+            return None
+        
+        if row['codec'] == 'file':
+            try:
+                return self._iter_spilled_text(row['blob_hash'])
+            except OSError as e:
+                print(f"✗ 读取大内容文件失败: {row['blob_hash']} - {e}")
+                return None
+        return self._iter_chunks(self._history_text(row['content'], row['blob_hash']) or '')
+    
+    @_flush_pending_first
+    def get_history_formats(self, history_id):
+        """
+        获取记录保存的其他剪贴板格式（不读取数据）
+        
+        Returns:
+            [{'mime': 格式, 'raw_size': 字节数}, ...]
+        """
+        return self.conn.execute(
+            'SELECT mime, raw_size FROM clipboard_formats WHERE history_id = ? ORDER BY mime',
+            (history_id,)
+        ).fetchall()
+    
+    @_flush_pending_first
+    def get_history_format(self, history_id, mime):
+        """
+        读取记录保存的某种剪贴板格式
+        
+        Returns:
+            解压后的数据（bytes）；没有该格式时返回 None
+        """
+        row = self.conn.execute(
+            'SELECT codec, data FROM clipboard_formats WHERE history_id = ? AND mime = ?',
+            (history_id, mime)
+        ).fetchone()
+        if not row:
+            return None
+        data = row['data']
+        return zlib.decompress(data) if row['codec'] == 'zlib' else bytes(data)
+    
+    @_flush_pending_first
+    def search_history(self, keyword, limit=50, ranked=True, include_content=False):
+        """
+        搜索历史记录
+        
+        支持的查询语法（全文索引可用时）:
+            词语        前缀匹配，如 pyth 可匹配 python
+            "短语"      短语匹配
+            AND/OR/NOT  布尔组合，如 error OR warning、log NOT debug
+        
+        Args:
+            keyword: 查询字符串
+            limit: 最多返回条数
+            ranked: True 按相关度排序，False 按时间倒序
+            include_content: 是否返回完整内容
+        """
+        if not keyword or not keyword.strip():
+            return []
+        
+        query = self._build_fts_query(keyword) if self.fts_enabled else None
+        if query is None:
+            return self._search_history_like(keyword, limit, include_content)
+        
+        order = 'clipboard_fts.rank' if ranked else 'h.timestamp DESC'
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM clipboard_history 
-            WHERE content LIKE ? 
+        try:
+            cursor.execute(f'''
+                SELECT {self._select_columns(include_content, 'h.')} FROM clipboard_fts
+                JOIN clipboard_history h ON h.id = clipboard_fts.rowid
+                WHERE clipboard_fts MATCH ?
+                ORDER BY {order}
+                LIMIT ?
+            ''', (query, limit))
+        except sqlite3.OperationalError as e:
+            # 查询语法无效（如孤立的 AND），退回普通匹配
+            print(f"✗ 全文查询无效，改用 LIKE: {e}")
+            return self._search_history_like(keyword, limit, include_content)
+        return cursor.fetchall()
+    
+    def _search_history_like(self, keyword, limit=50, include_content=False):
+        """LIKE 扫描搜索（全文索引不可用时的后备方案）"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT {self._select_columns(include_content)} FROM clipboard_history 
+            WHERE history_index_text(content, blob_hash, preview) LIKE ? 
             ORDER BY timestamp DESC 
             LIMIT ?
         ''', (f'%{keyword}%', limit))
         return cursor.fetchall()
     
+    def _build_fts_query(self, keyword):
+        """
+        将用户输入转换为 FTS5 查询表达式
+        
+        Returns:
+            查询表达式；无法用全文索引表达时返回 None
+        """
+        trigram = self.fts_tokenizer == 'trigram'
+        parts = []
+        
+        for token in re.findall(r'"[^"]*"\*?|\S+', keyword):
+            if token in ('AND', 'OR', 'NOT'):
+                parts.append(token)
+                continue
+            
+            if token.startswith('"'):
+                # 短语（可带 * 表示短语前缀）
+                prefix = token.endswith('*')
+                term = token.rstrip('*').strip('"')
+            else:
+                prefix = token.endswith('*') or not trigram
+                term = token.rstrip('*').replace('"', '')
+            
+            if not term:
+                continue
+            # trigram 分词器无法匹配少于 3 个字符的片段
+            if trigram and len(term) < 3:
+                return None
+            
+            parts.append(f'"{term}"' + ('*' if prefix and not trigram else ''))
+        
+        return ' '.join(parts) if parts else None
+    
+    @_flush_pending_first
     def toggle_favorite(self, history_id):
         """切换收藏状态"""
         cursor = self.conn.cursor()
@@ -152,15 +1257,23 @@ class StorageManager:
         )
         self.conn.commit()
     
+    @_flush_pending_first
     def delete_history(self, history_id):
         """删除历史记录"""
         cursor = self.conn.cursor()
+        row = cursor.execute(
+            'SELECT blob_hash FROM clipboard_history WHERE id = ?', (history_id,)
+        ).fetchone()
         cursor.execute(
             'DELETE FROM clipboard_history WHERE id = ?',
             (history_id,)
         )
+        if row and row['blob_hash']:
+            self._delete_orphan_blobs([row['blob_hash']])
         self.conn.commit()
+        self._reclaim_space()
     
+    @_flush_pending_first
     def clear_history(self, keep_favorites=True):
         """清空历史记录"""
         cursor = self.conn.cursor()
@@ -168,25 +1281,32 @@ class StorageManager:
             cursor.execute('DELETE FROM clipboard_history WHERE is_favorite = 0')
         else:
             cursor.execute('DELETE FROM clipboard_history')
+        self._delete_orphan_blobs()
         self.conn.commit()
+        self._reclaim_space()
     
     def get_setting(self, key, default=None):
         """获取设置"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT value FROM app_settings WHERE key = ?', (key,))
-        row = cursor.fetchone()
-        return row['value'] if row else default
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT value FROM app_settings WHERE key = ?', (key,))
+            row = cursor.fetchone()
+            return row['value'] if row else default
     
     def set_setting(self, key, value):
         """设置配置"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO app_settings (key, value) 
-            VALUES (?, ?)
-        ''', (key, str(value)))
-        self.conn.commit()
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO app_settings (key, value) 
+                VALUES (?, ?)
+            ''', (key, str(value)))
+            self.conn.commit()
     
     def close(self):
-        """关闭数据库连接"""
-        if self.conn:
-            self.conn.close()
+        """关闭数据库连接（先写入缓冲中的记录）"""
+        with self._lock:
+            self._flush_pending()
+            if self.conn:
+                self.conn.close()
+                self.conn = None
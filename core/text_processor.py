@@ -1,91 +1,776 @@
 """
 文本处理器 - 执行自定义规则
 """
+import os
 import re
-from typing import Dict, Any, List
+import json
+import pickle
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Callable, Iterable, Iterator, NamedTuple, Optional, Tuple
+from .regex_guard import RegexGuard, has_nested_quantifier
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants  # Python 3.11+
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+class ProcessCancelled(Exception):
+    """处理被取消（由进度回调抛出）"""
+
+
+class CompiledStep(NamedTuple):
+    """编译后的步骤：参数已解析，正则已预编译"""
+    type: str
+    func: Callable[[str], str]
+    # 逐行处理方式 (('map', 行 -> 行) 或 ('filter', 行 -> 是否保留), ...)；空表示不能逐行处理
+    line_ops: Tuple[Tuple[str, Callable[[str], Any]], ...] = ()
+    # 分块处理函数：对按换行切开的每一块单独执行，结果与整段执行一致；
+    # 返回 None 表示该块所有行都被移除。None 表示该步骤需要完整文本
+    chunk_func: Optional[Callable[[str], Optional[str]]] = None
+    # 用户正则 (pattern, flags, replacement)：设置了时间预算时在 RegexGuard 进程中执行
+    regex: Optional[Tuple[str, int, str]] = None
+
+
+class CompiledRule(NamedTuple):
+    """编译后的规则（不可变，可在多次执行间复用）"""
+    rule_id: Optional[str]
+    name: str
+    steps: Tuple[CompiledStep, ...]
 
 
 class TextProcessor:
     """文本处理引擎"""
     
-    def __init__(self):
-        # 注册步骤处理器
+    # 编译结果缓存的最大规则数
+    CACHE_SIZE = 64
+    
+    # 超过该字符数的文本自动分块处理（规则支持时）
+    STREAM_THRESHOLD = 8 * 1024 * 1024
+    # 分块处理时每块的大约字符数（在换行处切分）
+    CHUNK_SIZE = 1024 * 1024
+    # 超过该字符数的文本使用多进程并行处理（规则支持分块且有多个 CPU 时）
+    PARALLEL_THRESHOLD = 4 * 1024 * 1024
+    # 批量替换的项数不超过该值且互不影响时逐个 str.replace（比正则扫描快）
+    SEQUENTIAL_REPLACE_LIMIT = 16
+    # 正则步骤默认的执行时间预算（秒）
+    REGEX_TIMEOUT = 5.0
+    
+    def __init__(self, max_workers=None, regex_timeout=REGEX_TIMEOUT):
+        """
+        Args:
+            max_workers: 并行处理的最大进程数，默认为 CPU 核数
+            regex_timeout: 每个正则步骤的执行时间预算（秒），0 或 None 表示不限制
+        """
+        # 注册步骤编译器：根据参数生成 text -> text 的处理函数
         self.handlers = {
-            'find_replace': self._handle_find_replace,
-            'regex_replace': self._handle_regex_replace,
-            'remove_empty_lines': self._handle_remove_empty_lines,
-            'case_transform': self._handle_case_transform,
-            'strip_lines': self._handle_strip_lines,
-            'add_prefix': self._handle_add_prefix,
-            'add_suffix': self._handle_add_suffix,
+            'find_replace': self._compile_find_replace,
+            'multi_replace': self._compile_multi_replace,
+            'regex_replace': self._compile_regex_replace,
+            'remove_empty_lines': self._compile_remove_empty_lines,
+            'case_transform': self._compile_case_transform,
+            'strip_lines': self._compile_strip_lines,
+            'add_prefix': self._compile_add_prefix,
+            'add_suffix': self._compile_add_suffix,
         }
+        
+        # 编译缓存 {(规则ID, 步骤指纹): CompiledRule}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()  # 规则可能在多个线程中同时执行
+        
+        # 并行处理进程池（首次使用时创建）
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+        
+        # 正则步骤在独立进程中执行，超时可终止
+        self.regex_timeout = regex_timeout
+        self.regex_guard = RegexGuard()
     
-    def process(self, text: str, rule: Dict[str, Any]) -> str:
+    def process(self, text: str, rule: Dict[str, Any],
+                progress: Optional[Callable[[float], None]] = None,
+                errors: Optional[List[Tuple[str, Exception]]] = None) -> str:
         """
         执行规则处理文本
         
         Args:
             text: 输入文本
             rule: 规则对象
-            
+            progress: 进度回调，参数为 0~1 的完成比例；抛出 ProcessCancelled 可中止处理
+            errors: 如果提供，执行失败（如正则超时）而被跳过的步骤以 (步骤类型, 异常) 追加到其中
+        
         Returns:
             处理后的文本
         """
         if not rule or 'steps' not in rule:
             return text
         
+        compiled = self.compile(rule)
+        if self.is_streamable(compiled) and not self._needs_guard(compiled):
+            if len(text) > self.PARALLEL_THRESHOLD and self.max_workers > 1:
+                # 大文本按行分块，在多个进程中并行处理
+                return self.process_parallel(text, rule, progress)
+            if len(text) > self.STREAM_THRESHOLD:
+                # 大文本分块处理，避免每个步骤都生成完整的中间文本
+                pieces = self._report_progress(self.iter_pieces(text), len(text), progress)
+                return ''.join(self.run_stream(pieces, compiled))
+        return self.run(text, compiled, progress, errors)
+    
+    def run(self, text: str, compiled: CompiledRule,
+            progress: Optional[Callable[[float], None]] = None,
+            errors: Optional[List[Tuple[str, Exception]]] = None) -> str:
+        """执行已编译的规则（每完成一个步骤报告一次进度）"""
         result = text
+        total = len(compiled.steps)
         
-        for step in rule['steps']:
+        for index, step in enumerate(compiled.steps):
             try:
-                result = self._execute_step(result, step)
+                if step.regex and self.regex_timeout:
+                    result = self._run_guarded(step, result, progress, index / total)
+                else:
+                    result = step.func(result)
+            except ProcessCancelled:
+                raise
             except Exception as e:
-                print(f"✗ 步骤执行失败: {step.get('type', 'unknown')} - {str(e)}")
-                # 继续执行下一步，不中断整个流程
-                continue
+                # 跳过该步骤，继续执行下一步，不中断整个流程
+                print(f"✗ 步骤执行失败: {step.type} - {str(e)}")
+                if errors is not None:
+                    errors.append((step.type, e))
+            
+            if progress:
+                progress((index + 1) / total)
         
         return result
     
-    def _execute_step(self, text: str, step: Dict[str, Any]) -> str:
-        """执行单个步骤"""
+    def _run_guarded(self, step: CompiledStep, text: str,
+                     progress: Optional[Callable[[float], None]], done: float) -> str:
+        """在 RegexGuard 进程中执行正则步骤（超时抛出 RegexTimeout，等待期间可取消）"""
+        pattern, flags, replacement = step.regex
+        check = (lambda: progress(done)) if progress else None
+        return self.regex_guard.sub(pattern, flags, replacement, text, self.regex_timeout, check)
+    
+    def _needs_guard(self, compiled: CompiledRule) -> bool:
+        """规则是否有需要在 RegexGuard 中执行的步骤（这类规则整段执行）"""
+        return bool(self.regex_timeout) and any(step.regex for step in compiled.steps)
+    
+    @staticmethod
+    def _report_progress(pieces: Iterable[str], total: int,
+                         progress: Optional[Callable[[float], None]]) -> Iterator[str]:
+        """按已读取的输入字符数报告进度"""
+        done = 0
+        for piece in pieces:
+            if progress and total:
+                progress(done / total)
+            yield piece
+            done += len(piece)
+    
+    # ==================== 分块（流式）执行 ====================
+    
+    def process_stream(self, pieces: Iterable[str], rule: Dict[str, Any]) -> Iterator[str]:
+        """
+        流式执行规则
+        
+        Args:
+            pieces: 任意切分的输入文本片段（如文件对象、iter_pieces 的结果）
+            rule: 规则对象
+        
+        Yields:
+            输出文本片段，依次拼接即为完整结果
+        """
+        if not rule or 'steps' not in rule:
+            yield from pieces
+            return
+        
+        yield from self.run_stream(pieces, self.compile(rule))
+    
+    def run_stream(self, pieces: Iterable[str], compiled: CompiledRule,
+                   chunk_size: Optional[int] = None) -> Iterator[str]:
+        """
+        流式执行已编译的规则
+        
+        输入在换行处重新切分为约 chunk_size 字符的块，每块依次经过所有步骤后输出，
+        内存占用与输入大小无关。规则包含需要完整文本的步骤（跨行正则、首字母大写、
+        整段前后缀等）时退回整段执行。
+        """
+        if not self.is_streamable(compiled):
+            yield self.run(''.join(pieces), compiled)
+            return
+        
+        chunks = self._line_chunks(pieces, chunk_size or self.CHUNK_SIZE)
+        results = (self._run_chunk(chunk, compiled.steps) for chunk in chunks)
+        yield from self._stitch(results, compiled)
+    
+    def _stitch(self, results: Iterable[Tuple[Optional[str], int]],
+                compiled: CompiledRule) -> Iterator[str]:
+        """按顺序拼接各块的处理结果（见 _run_chunk 的返回值）"""
+        first = True
+        dropped_at = -1  # 块内所有行被移除时的步骤序号（取最大值）
+        for result, dropped in results:
+            if result is None:
+                dropped_at = max(dropped_at, dropped)
+                continue
+            
+            if not first:
+                yield '\n'
+            yield result
+            first = False
+        
+        if first:
+            # 所有行都被移除：与整段执行一致，从移除行的步骤起作用于空文本
+            # （融合步骤中移除行之后的逐行操作也需要执行；移除空行作用于空文本结果不变）
+            yield self.run('', compiled._replace(steps=compiled.steps[dropped_at:]))
+    
+    # ==================== 多进程并行执行 ====================
+    
+    def process_parallel(self, text: str, rule: Dict[str, Any],
+                         progress: Optional[Callable[[float], None]] = None) -> str:
+        """
+        在多个进程中并行执行规则
+        
+        文本在换行处切分后分发给进程池，结果按原顺序拼接。规则每次调用只序列化一次，
+        工作进程按序列化数据缓存编译结果。进程池在多次调用间复用（可用 warm_up 提前
+        启动）。规则不支持分块或进程池不可用时退回单进程执行。
+        """
+        compiled = self.compile(rule)
+        if not self.is_streamable(compiled):
+            return self.run(text, compiled)
+        
+        pool = self._get_pool()
+        if pool is None:
+            pieces = self._report_progress(self.iter_pieces(text), len(text), progress)
+            return ''.join(self.run_stream(pieces, compiled))
+        
+        # 每个进程约分到 4 块，兼顾负载均衡与传输开销
+        chunk_size = max(self.CHUNK_SIZE, len(text) // (self.max_workers * 4))
+        pieces = self._report_progress(self.iter_pieces(text), len(text), progress)
+        chunks = self._line_chunks(pieces, chunk_size)
+        try:
+            rule_data = pickle.dumps(rule, protocol=pickle.HIGHEST_PROTOCOL)
+            results = self._map_ordered(pool, rule_data, chunks, self.max_workers * 2)
+            return ''.join(self._stitch(results, compiled))
+        except ProcessCancelled:
+            raise
+        except Exception as e:
+            print(f"✗ 并行处理失败，改为单进程: {e}")
+            self.shutdown()
+            pieces = self._report_progress(self.iter_pieces(text), len(text), progress)
+            return ''.join(self.run_stream(pieces, compiled))
+    
+    @staticmethod
+    def _map_ordered(pool, rule_data, chunks, max_pending):
+        """按顺序返回各块结果，同时最多提交 max_pending 块（限制内存占用）"""
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(_run_chunk_in_worker, rule_data, chunk))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # 中止（取消或出错）时不再执行尚未开始的块
+            for future in pending:
+                future.cancel()
+    
+    def _get_pool(self):
+        """获取进程池（首次调用时创建）"""
+        with self._lock:
+            if self._pool is None and self.max_workers > 1:
+                try:
+                    # 使用 spawn：界面进程中有其他线程（如存储线程），fork 不安全
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                except Exception as e:
+                    print(f"✗ 创建进程池失败: {e}")
+                    self.max_workers = 1
+            return self._pool
+    
+    def warm_up(self):
+        """
+        在后台启动并行处理的全部工作进程（不等待）
+        
+        spawn 方式启动进程并导入模块需要数百毫秒，提前启动后首次并行处理无需等待。
+        """
+        pool = self._get_pool()
+        if pool is None:
+            return
+        # 没有空闲进程时每个任务会启动一个新进程
+        for _ in range(self.max_workers):
+            pool.submit(_warm_up_worker)
+    
+    def shutdown(self):
+        """关闭并行处理进程池和正则执行进程"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        self.regex_guard.stop()
+    
+    @staticmethod
+    def is_streamable(compiled: CompiledRule) -> bool:
+        """规则是否可以分块执行"""
+        return all(step.chunk_func for step in compiled.steps)
+    
+    @staticmethod
+    def iter_pieces(text: str, size: int = 1024 * 1024) -> Iterator[str]:
+        """将文本切成固定大小的片段（供 run_stream 使用）"""
+        for start in range(0, len(text), size):
+            yield text[start:start + size]
+        if not text:
+            yield ''
+    
+    @staticmethod
+    def _line_chunks(pieces: Iterable[str], chunk_size: int) -> Iterator[str]:
+        """
+        将片段重新切分为在换行处断开的块
+        
+        相邻两块之间的换行不包含在块内，最后一块为最后一个换行之后的内容（可能为空）。
+        """
+        buffer = ''
+        for piece in pieces:
+            buffer += piece
+            if len(buffer) < chunk_size:
+                continue
+            cut = buffer.rfind('\n')
+            if cut < 0:
+                continue
+            yield buffer[:cut]
+            buffer = buffer[cut + 1:]
+        yield buffer
+    
+    @staticmethod
+    def _run_chunk(chunk: str, steps: Tuple[CompiledStep, ...]) -> Tuple[Optional[str], int]:
+        """
+        对一块文本依次执行所有步骤
+        
+        Returns:
+            (结果, -1)；块内所有行被移除时返回 (None, 移除行的步骤序号)
+        """
+        for index, step in enumerate(steps):
+            try:
+                result = step.chunk_func(chunk)
+            except Exception as e:
+                print(f"✗ 步骤执行失败: {step.type} - {str(e)}")
+                continue
+            if result is None:
+                return None, index
+            chunk = result
+        return chunk, -1
+    
+    def compile(self, rule: Dict[str, Any]) -> CompiledRule:
+        """
+        编译规则（带缓存）
+        
+        缓存键为规则ID和步骤内容的指纹，无论规则在哪里被修改，步骤改变后都会重新编译。
+        """
+        key = (rule.get('id'), self._fingerprint(rule.get('steps', [])))
+        with self._lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+                return compiled
+        
+        steps = []
+        for step in rule.get('steps', []):
+            compiled_step = self._compile_step(step)
+            if compiled_step:
+                steps.append(compiled_step)
+        steps = self._fuse_line_steps(steps)
+        compiled = CompiledRule(rule.get('id'), rule.get('name', ''), tuple(steps))
+        
+        with self._lock:
+            self._cache[key] = compiled
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return compiled
+    
+    def clear_cache(self):
+        """清空编译缓存"""
+        with self._lock:
+            self._cache.clear()
+    
+    @staticmethod
+    def _fingerprint(steps: List[Dict[str, Any]]) -> str:
+        """步骤内容的指纹"""
+        return json.dumps(steps, sort_keys=True, ensure_ascii=False, default=str)
+    
+    def _compile_step(self, step: Dict[str, Any]) -> Optional[CompiledStep]:
+        """编译单个步骤；无效或不产生变化的步骤返回 None"""
         step_type = step.get('type')
         params = step.get('params', {})
         
-        handler = self.handlers.get(step_type)
-        if not handler:
+        compiler = self.handlers.get(step_type)
+        if not compiler:
             print(f"✗ 未知的步骤类型: {step_type}")
+            return None
+        
+        try:
+            func = compiler(params)
+        except Exception as e:
+            print(f"✗ 步骤编译失败: {step_type} - {str(e)}")
+            return None
+        
+        if not func:
+            return None
+        
+        line_ops = self._line_ops(step_type, params)
+        if line_ops:
+            chunk_func = self._make_lines_func(line_ops)
+        elif self._is_chunk_safe(step_type, params):
+            chunk_func = func
+        else:
+            chunk_func = None
+        
+        regex = None
+        if step_type == 'regex_replace':
+            regex = (params['pattern'], self._regex_flags(params.get('flags', [])),
+                     params.get('replacement', ''))
+        return CompiledStep(step_type, func, line_ops, chunk_func, regex)
+    
+    # ==================== 逐行步骤融合 ====================
+    
+    @staticmethod
+    def _line_ops(step_type: str, params: Dict[str, Any]):
+        """
+        获取步骤的逐行处理方式
+        
+        只有结果不改变行边界的步骤才能逐行处理（前缀/后缀含换行时不行）。
+        """
+        if step_type == 'strip_lines':
+            mode = params.get('mode', 'both')
+            strip = {'left': str.lstrip, 'right': str.rstrip}.get(mode, str.strip)
+            return (('map', strip),)
+        
+        if step_type == 'remove_empty_lines':
+            return (('filter', str.strip),)
+        
+        if step_type == 'add_prefix' and params.get('per_line', True):
+            prefix = params.get('prefix', '')
+            if '\n' not in prefix:
+                return (('map', prefix.__add__),)
+        
+        if step_type == 'add_suffix' and params.get('per_line', True):
+            suffix = params.get('suffix', '')
+            if '\n' not in suffix:
+                return (('map', lambda line: line + suffix),)
+        
+        return ()
+    
+    def _fuse_line_steps(self, steps: List[CompiledStep]) -> List[CompiledStep]:
+        """将连续的逐行步骤合并为一个步骤，只拆分、拼接一次文本"""
+        fused = []
+        run = []
+        
+        for step in steps + [None]:
+            if step is not None and step.line_ops:
+                run.append(step)
+                continue
+            
+            if len(run) > 1:
+                line_ops = tuple(op for s in run for op in s.line_ops)
+                lines_func = self._make_lines_func(line_ops)
+                fused.append(CompiledStep(
+                    '+'.join(s.type for s in run),
+                    self._make_fused_func(lines_func, [s.func for s in run]),
+                    line_ops,
+                    lines_func,
+                ))
+            else:
+                fused.extend(run)
+            run = []
+            
+            if step is not None:
+                fused.append(step)
+        
+        return fused
+    
+    @staticmethod
+    def _make_lines_func(line_ops) -> Callable[[str], Optional[str]]:
+        """生成一次遍历所有行、依次应用各逐行操作的函数；所有行都被移除时返回 None"""
+        def apply_lines(text):
+            lines = iter(text.split('\n'))
+            for kind, func in line_ops:
+                lines = map(func, lines) if kind == 'map' else filter(func, lines)
+            result = list(lines)
+            return '\n'.join(result) if result else None
+        
+        return apply_lines
+    
+    @staticmethod
+    def _make_fused_func(lines_func, step_funcs) -> Callable[[str], str]:
+        """生成融合步骤的整段处理函数"""
+        def fused(text):
+            result = lines_func(text)
+            if result is not None:
+                return result
+            
+            # 所有行都被移除：逐步执行，保证后续步骤作用于空文本的结果与未融合时一致
+            for func in step_funcs:
+                text = func(text)
             return text
         
-        return handler(text, params)
+        return fused
+    
+    # ==================== 分块安全性判断 ====================
     
-    # ==================== 步骤处理器 ====================
+    def _is_chunk_safe(self, step_type: str, params: Dict[str, Any]) -> bool:
+        """
+        步骤能否对按换行切开的各块分别执行（结果拼接后与整段执行相同）
+        
+        即步骤的匹配不会跨越换行，也不依赖文本开头或结尾的位置。
+        """
+        if step_type == 'find_replace':
+            return '\n' not in params.get('find', '')
+        
+        if step_type == 'multi_replace':
+            return all('\n' not in pair.get('find', '') for pair in params.get('pairs', []))
+        
+        if step_type == 'regex_replace':
+            try:
+                regex = re.compile(params.get('pattern', ''), self._regex_flags(params.get('flags', [])))
+            except re.error:
+                return False
+            return self._is_line_local_regex(regex)
+        
+        if step_type == 'case_transform':
+            # capitalize 只作用于整段文本的第一个字符
+            return params.get('mode', 'upper') in ('upper', 'lower', 'title')
+        
+        if step_type in ('add_prefix', 'add_suffix'):
+            return params.get('per_line', True)
+        
+        return False
+    
+    @classmethod
+    def _is_line_local_regex(cls, regex: re.Pattern) -> bool:
+        """正则是否只在单行内匹配（不匹配换行，不使用整段文本的首尾锚点）"""
+        try:
+            parsed = sre_parse.parse(regex.pattern, regex.flags)
+        except Exception:
+            return False
+        return cls._is_line_local_items(parsed, regex.flags)
     
-    def _handle_find_replace(self, text: str, params: Dict[str, Any]) -> str:
+    @classmethod
+    def _is_line_local_items(cls, items, flags: int) -> bool:
+        """递归检查解析后的正则节点"""
+        c = sre_constants
+        repeats = (c.MAX_REPEAT, c.MIN_REPEAT, getattr(c, 'POSSESSIVE_REPEAT', None))
+        
+        for op, av in items:
+            if op is c.LITERAL:
+                if av == 10:
+                    return False
+            elif op is c.NOT_LITERAL:
+                if av != 10:
+                    return False
+            elif op is c.ANY:
+                if flags & re.DOTALL:
+                    return False
+            elif op is c.IN:
+                if cls._set_matches_newline(av):
+                    return False
+            elif op is c.AT:
+                if av in (c.AT_BEGINNING_STRING, c.AT_END_STRING):
+                    return False
+                if av in (c.AT_BEGINNING, c.AT_END) and not flags & re.MULTILINE:
+                    return False
+            elif op is c.SUBPATTERN:
+                _, add_flags, del_flags, sub = av
+                if not cls._is_line_local_items(sub, (flags | add_flags) & ~del_flags):
+                    return False
+            elif op in repeats:
+                if not cls._is_line_local_items(av[2], flags):
+                    return False
+            elif op is c.BRANCH:
+                if not all(cls._is_line_local_items(branch, flags) for branch in av[1]):
+                    return False
+            elif op in (c.ASSERT, c.ASSERT_NOT):
+                if not cls._is_line_local_items(av[1], flags):
+                    return False
+            elif op is getattr(c, 'ATOMIC_GROUP', None):
+                if not cls._is_line_local_items(av, flags):
+                    return False
+            elif op is c.GROUPREF_EXISTS:
+                _, yes, no = av
+                if not cls._is_line_local_items(yes, flags):
+                    return False
+                if no is not None and not cls._is_line_local_items(no, flags):
+                    return False
+            elif op is not c.GROUPREF:
+                # 未识别的节点按跨行处理
+                return False
+        
+        return True
+    
+    @staticmethod
+    def _set_matches_newline(items) -> bool:
+        """字符集 [...] 是否可以匹配换行"""
+        c = sre_constants
+        negate = False
+        matches = False
+        
+        for op, av in items:
+            if op is c.NEGATE:
+                negate = True
+            elif op is c.LITERAL:
+                matches = matches or av == 10
+            elif op is c.RANGE:
+                matches = matches or av[0] <= 10 <= av[1]
+            elif op is c.CATEGORY:
+                matches = matches or av in (
+                    c.CATEGORY_SPACE, c.CATEGORY_NOT_DIGIT,
+                    c.CATEGORY_NOT_WORD, c.CATEGORY_LINEBREAK,
+                )
+            else:
+                return True
+        
+        return matches != negate
+    
+    # ==================== 步骤编译器 ====================
+    
+    def _compile_find_replace(self, params: Dict[str, Any]) -> Optional[Callable[[str], str]]:
         """查找替换"""
         find = params.get('find', '')
         replace = params.get('replace', '')
         case_sensitive = params.get('case_sensitive', True)
         
         if not find:
-            return text
+            return None
         
         if case_sensitive:
-            return text.replace(find, replace)
+            return lambda text: text.replace(find, replace)
         else:
             # 不区分大小写的替换
             pattern = re.compile(re.escape(find), re.IGNORECASE)
-            return pattern.sub(replace, text)
+            if not self._check_template(replace, pattern):
+                return None
+            return lambda text: pattern.sub(replace, text)
+    
+    def _compile_multi_replace(self, params: Dict[str, Any]) -> Optional[Callable[[str], str]]:
+        """
+        批量查找替换
+        
+        所有查找内容构成一棵前缀树并编译为一个正则，一次遍历完成全部替换；
+        同一位置优先匹配最长的查找内容，替换结果不会被再次匹配。查找内容重复时以第一行为准。
+        """
+        pairs = params.get('pairs', [])
+        case_sensitive = params.get('case_sensitive', True)
+        
+        table = {}
+        for pair in pairs:
+            find = pair.get('find', '')
+            key = find if case_sensitive else find.lower()
+            if find and key not in table:
+                table[key] = pair.get('replace', '')
+        
+        if not table:
+            return None
+        
+        if case_sensitive and len(table) <= self.SEQUENTIAL_REPLACE_LIMIT and self._is_independent(table):
+            # 各查找内容之间互不影响时逐个 str.replace 结果相同，且比正则扫描更快
+            items = tuple(table.items())
+            
+            def replace_each(text):
+                for find, replace in items:
+                    text = text.replace(find, replace)
+                return text
+            return replace_each
+        
+        # 整体作为一个捕获组：split 的结果中奇数位置为匹配到的查找内容
+        regex = re.compile(f'({self._trie_pattern(table)})', 0 if case_sensitive else re.IGNORECASE)
+        
+        def multi_replace(text):
+            parts = regex.split(text)
+            if case_sensitive:
+                parts[1::2] = map(table.__getitem__, parts[1::2])
+            else:
+                parts[1::2] = [table.get(found.lower(), found) for found in parts[1::2]]
+            return ''.join(parts)
+        return multi_replace
+    
+    @staticmethod
+    def _is_independent(table: Dict[str, str]) -> bool:
+        """
+        批量替换的各项是否互不影响（按顺序逐个替换与一次替换结果相同）
+        
+        即任意查找内容与其他查找内容、其他项的替换结果之间没有包含或首尾重叠，
+        替换不会产生新的匹配，匹配位置也不会互相冲突。
+        """
+        def overlaps(a, b):
+            if a in b or b in a:
+                return True
+            return any(a.endswith(b[:n]) or b.endswith(a[:n]) for n in range(1, min(len(a), len(b))))
+        
+        for find in table:
+            for other, replace in table.items():
+                if other != find and (overlaps(find, other) or overlaps(find, replace)):
+                    return False
+        return True
     
-    def _handle_regex_replace(self, text: str, params: Dict[str, Any]) -> str:
+    @staticmethod
+    def _trie_pattern(words: Iterable[str]) -> str:
+        """
+        将多个字面量构建为前缀树形式的正则
+        
+        每个分支的首字符互不相同，匹配时只需沿树前进；可选的后续部分为贪婪匹配，
+        因此同一位置得到的是最长的字面量。
+        """
+        trie = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = None  # 单词结束标记
+        
+        def node_pattern(node):
+            parts = []
+            # 没有分叉的一段直接拼接
+            while len(node) == 1 and '' not in node:
+                (char, node), = node.items()
+                parts.append(re.escape(char))
+            
+            branches = [re.escape(char) + node_pattern(child)
+                        for char, child in node.items() if char]
+            if branches:
+                group = '|'.join(branches)
+                if '' in node:
+                    parts.append(f'(?:{group})?')
+                elif len(branches) > 1:
+                    parts.append(f'(?:{group})')
+                else:
+                    parts.append(group)
+            return ''.join(parts)
+        
+        return node_pattern(trie)
+    
+    def _compile_regex_replace(self, params: Dict[str, Any]) -> Optional[Callable[[str], str]]:
         """正则替换"""
         pattern = params.get('pattern', '')
         replacement = params.get('replacement', '')
         flags = params.get('flags', [])
         
         if not pattern:
-            return text
+            return None
+        
+        try:
+            regex = re.compile(pattern, self._regex_flags(flags))
+        except re.error as e:
+            print(f"✗ 正则表达式错误: {e}")
+            return None
         
-        # 构建正则标志
+        if not self._check_template(replacement, regex):
+            return None
+        return lambda text: regex.sub(replacement, text)
+    
+    @staticmethod
+    def _regex_flags(flags: List[str]) -> int:
+        """构建正则标志"""
         regex_flags = 0
         if 'IGNORECASE' in flags or 'I' in flags:
             regex_flags |= re.IGNORECASE
@@ -93,78 +778,78 @@ class TextProcessor:
             regex_flags |= re.MULTILINE
         if 'DOTALL' in flags or 'S' in flags:
             regex_flags |= re.DOTALL
-        
+        return regex_flags
+    
+    @staticmethod
+    def _check_template(replacement: str, regex: re.Pattern) -> bool:
+        """检查替换文本中的分组引用（如 \\1）是否有效"""
         try:
-            return re.sub(pattern, replacement, text, flags=regex_flags)
+            sre_parse.parse_template(replacement, regex)
         except re.error as e:
             print(f"✗ 正则表达式错误: {e}")
-            return text
+            return False
+        return True
     
-    def _handle_remove_empty_lines(self, text: str, params: Dict[str, Any]) -> str:
+    def _compile_remove_empty_lines(self, params: Dict[str, Any]) -> Callable[[str], str]:
         """移除空行"""
-        lines = text.split('\n')
-        non_empty_lines = [line for line in lines if line.strip()]
-        return '\n'.join(non_empty_lines)
+        def remove_empty_lines(text):
+            return '\n'.join(line for line in text.split('\n') if line.strip())
+        return remove_empty_lines
     
-    def _handle_case_transform(self, text: str, params: Dict[str, Any]) -> str:
+    def _compile_case_transform(self, params: Dict[str, Any]) -> Optional[Callable[[str], str]]:
         """大小写转换"""
         mode = params.get('mode', 'upper')
         
-        if mode == 'upper':
-            return text.upper()
-        elif mode == 'lower':
-            return text.lower()
-        elif mode == 'title':
-            return text.title()
-        elif mode == 'capitalize':
-            return text.capitalize()
-        else:
-            return text
+        transforms = {
+            'upper': str.upper,
+            'lower': str.lower,
+            'title': str.title,
+            'capitalize': str.capitalize,
+        }
+        return transforms.get(mode)
     
-    def _handle_strip_lines(self, text: str, params: Dict[str, Any]) -> str:
+    def _compile_strip_lines(self, params: Dict[str, Any]) -> Callable[[str], str]:
         """去除行首尾空格"""
         mode = params.get('mode', 'both')  # left/right/both
         
-        lines = text.split('\n')
-        
         if mode == 'left':
-            lines = [line.lstrip() for line in lines]
+            strip = str.lstrip
         elif mode == 'right':
-            lines = [line.rstrip() for line in lines]
+            strip = str.rstrip
         else:  # both
-            lines = [line.strip() for line in lines]
+            strip = str.strip
         
-        return '\n'.join(lines)
+        def strip_lines(text):
+            return '\n'.join(strip(line) for line in text.split('\n'))
+        return strip_lines
     
-    def _handle_add_prefix(self, text: str, params: Dict[str, Any]) -> str:
+    def _compile_add_prefix(self, params: Dict[str, Any]) -> Optional[Callable[[str], str]]:
         """添加前缀"""
         prefix = params.get('prefix', '')
         per_line = params.get('per_line', True)
         
         if not prefix:
-            return text
+            return None
         
         if per_line:
-            lines = text.split('\n')
-            lines = [prefix + line for line in lines]
-            return '\n'.join(lines)
+            separator = '\n' + prefix
+            return lambda text: prefix + text.replace('\n', separator)
         else:
-            return prefix + text
+            return lambda text: prefix + text
     
-    def _handle_add_suffix(self, text: str, params: Dict[str, Any]) -> str:
+    def _compile_add_suffix(self, params: Dict[str, Any]) -> Optional[Callable[[str], str]]:
         """添加后缀"""
         suffix = params.get('suffix', '')
         per_line = params.get('per_line', True)
         
         if not suffix:
-            return text
+            return None
         
         if per_line:
-            lines = text.split('\n')
-            lines = [line + suffix for line in lines]
-            return '\n'.join(lines)
+            separator = suffix + '\n'
+            return lambda text: text.replace('\n', separator) + suffix
         else:
-            return text + suffix
+            return lambda text: text + suffix
     
     # ==================== 辅助方法 ====================
     
@@ -173,7 +858,7 @@ class TextProcessor:
         验证规则是否有效
         
         Returns:
-            (是否有效, 错误信息)
+            (是否有效, 错误信息)；有效但存在风险（如正则含嵌套量词）时错误信息为警告内容
         """
         if not rule:
             return False, "规则为空"
@@ -191,20 +876,31 @@ class TextProcessor:
             return False, "步骤数量不能超过20个"
         
         # 验证每个步骤
+        warnings = []
         for i, step in enumerate(rule['steps']):
             if 'type' not in step:
                 return False, f"步骤 {i+1} 缺少类型"
             
             if step['type'] not in self.handlers:
                 return False, f"步骤 {i+1} 类型无效: {step['type']}"
+            
+            if step['type'] == 'regex_replace':
+                params = step.get('params', {})
+                pattern = params.get('pattern', '')
+                try:
+                    if pattern and has_nested_quantifier(pattern, self._regex_flags(params.get('flags', []))):
+                        warnings.append(f"步骤 {i+1} 的正则含有嵌套量词（如 (a+)+），在部分文本上可能执行很慢")
+                except re.error as e:
+                    return False, f"步骤 {i+1} 正则表达式错误: {e}"
         
-        return True, ""
+        return True, "\n".join(warnings)
     
     @staticmethod
     def get_step_types() -> List[Dict[str, str]]:
         """获取所有可用的步骤类型"""
         return [
             {'id': 'find_replace', 'name': '查找替换', 'icon': '🔍'},
+            {'id': 'multi_replace', 'name': '批量替换', 'icon': '🔁'},
             {'id': 'regex_replace', 'name': '正则替换', 'icon': '🔣'},
             {'id': 'remove_empty_lines', 'name': '移除空行', 'icon': '📝'},
             {'id': 'case_transform', 'name': '大小写转换', 'icon': 'Aa'},
@@ -212,3 +908,105 @@ class TextProcessor:
             {'id': 'add_prefix', 'name': '添加前缀', 'icon': '⬅️'},
             {'id': 'add_suffix', 'name': '添加后缀', 'icon': '➡️'},
         ]
+
+
+class StepCache:
+    """
+    逐步骤的中间结果缓存
+    
+    键由输入文本的哈希与前 k 个步骤的指纹依次串联得到，值为执行完前 k 个步骤后的文本。
+    同一输入再次执行时从最长的已缓存前缀继续，修改第 k 个步骤只需重新执行第 k 步及之后的步骤。
+    用于规则编辑时的测试区（输入不变、每次只改动个别步骤）。
+    """
+    
+    # 缓存的中间结果总字符数上限
+    MAX_CHARS = 32 * 1024 * 1024
+    
+    def __init__(self, processor: Optional[TextProcessor] = None, max_chars: int = MAX_CHARS):
+        self.processor = processor or get_text_processor()
+        self.max_chars = max_chars
+        self.reused = 0  # 最近一次执行复用的步骤数
+        
+        self._entries = OrderedDict()  # {前缀键: 中间结果}
+        self._chars = 0
+    
+    def process(self, text: str, steps: List[Dict[str, Any]],
+                progress: Optional[Callable[[float], None]] = None) -> str:
+        """依次执行各步骤（复用已缓存的前缀结果），每完成一个步骤报告一次进度"""
+        key = self._digest(text.encode('utf-8', 'surrogatepass'))
+        keys = []
+        for step in steps:
+            key = self._digest(key + TextProcessor._fingerprint([step]).encode('utf-8'))
+            keys.append(key)
+        
+        # 从最长的已缓存前缀开始
+        start, result = 0, text
+        for k in range(len(keys), 0, -1):
+            cached = self._entries.get(keys[k - 1])
+            if cached is not None:
+                self._entries.move_to_end(keys[k - 1])
+                start, result = k, cached
+                break
+        self.reused = start
+        
+        for k in range(start, len(steps)):
+            compiled = self.processor.compile({'steps': [steps[k]]})
+            result = self.processor.run(result, compiled)
+            self._store(keys[k], result)
+            if progress:
+                progress((k + 1) / len(steps))
+        
+        return result
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._chars = 0
+    
+    def _store(self, key: bytes, result: str):
+        """保存中间结果，超出上限时淘汰最久未使用的"""
+        if len(result) > self.max_chars or key in self._entries:
+            return
+        self._entries[key] = result
+        self._chars += len(result)
+        while self._chars > self.max_chars:
+            _, evicted = self._entries.popitem(last=False)
+            self._chars -= len(evicted)
+    
+    @staticmethod
+    def _digest(data: bytes) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+
+# 工作进程中的编译结果 {规则序列化数据: 编译后的步骤}
+_worker_rules = OrderedDict()
+
+
+def _run_chunk_in_worker(rule_data: bytes, chunk: str) -> Tuple[Optional[str], int]:
+    """工作进程中执行一块文本（规则在进程内编译，按序列化数据缓存）"""
+    processor = get_text_processor()
+    steps = _worker_rules.get(rule_data)
+    if steps is None:
+        steps = processor.compile(pickle.loads(rule_data)).steps
+        _worker_rules[rule_data] = steps
+        if len(_worker_rules) > TextProcessor.CACHE_SIZE:
+            _worker_rules.popitem(last=False)
+    else:
+        _worker_rules.move_to_end(rule_data)
+    return processor._run_chunk(chunk, steps)
+
+
+def _warm_up_worker():
+    """工作进程启动后预先创建文本处理器"""
+    get_text_processor()
+
+
+# 全局实例
+_text_processor = None
+
+def get_text_processor():
+    """获取文本处理器实例（单例，共享编译缓存）"""
+    global _text_processor
+    if _text_processor is None:
+        _text_processor = TextProcessor()
+    return _text_processor
@@ -0,0 +1,132 @@
+"""
+文本变换执行器
+在工作线程中执行耗时的文本变换，支持进度、取消和合并重复触发
+"""
+import threading
+from PyQt6.QtCore import QObject, pyqtSignal
+from .text_processor import ProcessCancelled
+
+
+class _TransformJob:
+    """一次变换任务"""
+    
+    def __init__(self, data, compute, callback):
+        self.data = data
+        self.compute = compute
+        self.callback = callback
+        self.cancel_event = threading.Event()
+        self.last_percent = -1
+
+
+class TransformRunner(QObject):
+    """
+    文本变换执行器
+    
+    同一时间只执行一个任务。任务执行期间再次提交时，当前任务被取消，
+    等待中的请求只保留最新一个，当前任务结束后再开始（合并快速重复触发）。
+    """
+    
+    # 任务开始执行
+    started = pyqtSignal()
+    # 进度（0~100）
+    progress_changed = pyqtSignal(int)
+    # 没有正在执行或等待的任务
+    idle = pyqtSignal()
+    
+    # 内部信号：将工作线程的结果/进度投递回界面线程
+    _job_done = pyqtSignal(object, object, object)
+    _job_progress = pyqtSignal(object, int)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._job = None
+        self._pending = None
+        
+        self._job_done.connect(self._on_job_done)
+        self._job_progress.connect(self._on_job_progress)
+    
+    def submit(self, prepare, compute, callback):
+        """
+        提交变换任务
+        
+        Args:
+            prepare: 任务开始时在界面线程中调用，返回任务输入（如当前文本和文档版本）；
+                     返回 None 表示不执行
+            compute: 在工作线程中调用 compute(data, progress)，返回结果；
+                     progress(比例) 在任务被取消时抛出 ProcessCancelled
+            callback: 完成后在界面线程中调用 callback(data, result, error)；
+                      被取消的任务不会调用
+        """
+        self._pending = (prepare, compute, callback)
+        if self._job:
+            # 取消当前任务，结束后执行最新的请求
+            self._job.cancel_event.set()
+        else:
+            self._start_pending()
+    
+    def cancel(self):
+        """取消正在执行和等待中的任务"""
+        self._pending = None
+        if self._job:
+            self._job.cancel_event.set()
+    
+    def is_running(self):
+        """是否有任务正在执行"""
+        return self._job is not None
+    
+    def _start_pending(self):
+        """开始执行等待中的任务"""
+        prepare, compute, callback = self._pending
+        self._pending = None
+        
+        data = prepare()
+        if data is None:
+            self.idle.emit()
+            return
+        
+        job = _TransformJob(data, compute, callback)
+        self._job = job
+        thread = threading.Thread(
+            target=self._run, args=(job,), name='TransformWorker', daemon=True
+        )
+        thread.start()
+        self.started.emit()
+    
+    def _run(self, job):
+        """工作线程：执行变换"""
+        def progress(fraction):
+            if job.cancel_event.is_set():
+                raise ProcessCancelled()
+            percent = int(fraction * 100)
+            if percent != job.last_percent:
+                job.last_percent = percent
+                self._job_progress.emit(job, percent)
+        
+        try:
+            result = job.compute(job.data, progress)
+        except ProcessCancelled:
+            self._job_done.emit(job, None, None)
+            return
+        except Exception as e:
+            print(f"✗ 文本变换失败: {e}")
+            self._job_done.emit(job, None, e)
+            return
+        self._job_done.emit(job, result, None)
+    
+    def _on_job_progress(self, job, percent):
+        """界面线程：转发当前任务的进度"""
+        if job is self._job and not job.cancel_event.is_set():
+            self.progress_changed.emit(percent)
+    
+    def _on_job_done(self, job, result, error):
+        """界面线程：任务结束"""
+        if job is self._job:
+            self._job = None
+        
+        if not job.cancel_event.is_set():
+            job.callback(job.data, result, error)
+        
+        if self._pending:
+            self._start_pending()
+        elif self._job is None:
+            self.idle.emit()
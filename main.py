@@ -3,6 +3,7 @@ TextPin - 文字剪贴板工具
 主入口文件
 """
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QIcon
 from PyQt6.QtCore import Qt
@@ -45,4 +46,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # 打包后的程序启动规则处理进程时需要
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,66 @@
+"""ClipboardMonitor 变化检测测试（轮询时先比较廉价特征）"""
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtWidgets import QApplication
+
+from core.clipboard_monitor import ClipboardMonitor
+
+
+class CountingClipboard:
+    """代理系统剪贴板，记录获取完整文本的次数"""
+    
+    def __init__(self, clipboard):
+        self._clipboard = clipboard
+        self.text_calls = 0
+    
+    def text(self):
+        self.text_calls += 1
+        return self._clipboard.text()
+    
+    def __getattr__(self, name):
+        return getattr(self._clipboard, name)
+
+
+@pytest.fixture
+def monitor():
+    app = QApplication.instance() or QApplication([])
+    app.clipboard().setText('initial')
+    monitor = ClipboardMonitor()
+    monitor.clipboard.dataChanged.disconnect(monitor._on_clipboard_changed)  # 直接调用检查
+    monitor._read_sequence = None  # 按不提供序号的平台检查
+    monitor.ignore_self = False
+    monitor.clipboard = CountingClipboard(monitor.clipboard)
+    monitor.start_monitoring()
+    monitor.clipboard.text_calls = 0
+    emitted = []
+    monitor.clipboard_changed.connect(lambda text, formats: emitted.append(text))
+    yield monitor, emitted
+    monitor.stop_monitoring()
+
+
+def test_idle_poll_does_not_fetch_text(monitor):
+    monitor, emitted = monitor
+    for _ in range(5):
+        assert not monitor._check_and_emit_change(source="轮询")
+    assert monitor.clipboard.text_calls == 0
+    assert emitted == []
+
+
+def test_poll_detects_size_change(monitor):
+    monitor, emitted = monitor
+    monitor.clipboard.setText('changed text')
+    assert monitor._check_and_emit_change(source="轮询")
+    assert emitted == ['changed text']
+    assert not monitor._check_and_emit_change(source="轮询")
+    assert monitor.clipboard.text_calls == 1
+
+
+def test_signal_fetches_when_signature_unchanged(monitor):
+    monitor, emitted = monitor
+    monitor.clipboard.setText('INITIAL')  # 格式和大小都与之前相同
+    assert monitor._check_and_emit_change(source="信号", check_signature=False)
+    assert emitted == ['INITIAL']
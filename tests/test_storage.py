@@ -0,0 +1,54 @@
+"""StorageManager 测试"""
+import pytest
+
+from core.storage import StorageManager, STREAM_CHUNK_SIZE
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = StorageManager(str(tmp_path / 'test.db'), blob_threshold=1024, spill_threshold=64 * 1024)
+    yield storage
+    storage.close()
+
+
+@pytest.mark.parametrize('content', [
+    'short text',
+    'inline blob ' * 1000,
+    '大内容文件\n' * (STREAM_CHUNK_SIZE // 3),
+])
+def test_iter_history_text_matches_content(storage, content):
+    history_id = storage.add_history(content)
+    chunks = list(storage.iter_history_text(history_id))
+    assert all(len(chunk) <= STREAM_CHUNK_SIZE for chunk in chunks)
+    assert ''.join(chunks) == content
+    assert storage.get_history_by_id(history_id)['content'] == content
+
+
+def test_iter_history_text_spilled_reads_file(storage):
+    content = 'spilled line\n' * 20000
+    history_id = storage.add_history(content)
+    assert list(storage.blob_dir.iterdir())
+    
+    chunks = storage.iter_history_text(history_id)
+    storage.delete_history(history_id)  # 文件在查询时已打开，之后删除不影响读取
+    assert ''.join(chunks) == content
+
+
+def test_iter_history_text_missing(storage):
+    assert storage.iter_history_text(12345) is None
+
+
+@pytest.mark.parametrize('write_behind', [False, True])
+def test_batch_timestamps_follow_ingest_order(tmp_path, write_behind):
+    storage = StorageManager(str(tmp_path / 'test.db'), write_behind=write_behind)
+    contents = [f'item {i}' for i in range(50)]
+    storage.add_history_many(contents)
+    storage.flush()
+    
+    history = storage.get_history(limit=100)
+    timestamps = [row['timestamp'] for row in history]
+    assert len(set(timestamps)) == len(contents)
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert [row['id'] for row in storage.get_history_page(limit=100)] == [row['id'] for row in history]
+    assert storage.get_history_by_id(history[0]['id'])['content'] == contents[-1]
+    storage.close()
@@ -0,0 +1,104 @@
+"""TextProcessor 执行结果一致性测试"""
+import pytest
+
+from core.text_processor import TextProcessor
+
+
+RULES = [
+    [
+        {'type': 'strip_lines', 'params': {'mode': 'both'}},
+        {'type': 'case_transform', 'params': {'mode': 'upper'}},
+    ],
+    [
+        {'type': 'remove_empty_lines', 'params': {}},
+        {'type': 'add_prefix', 'params': {'prefix': '- '}},
+        {'type': 'add_suffix', 'params': {'suffix': ';'}},
+    ],
+    [
+        {'type': 'find_replace', 'params': {'find': 'a', 'replace': 'AA'}},
+        {'type': 'multi_replace', 'params': {'pairs': [{'find': 'b', 'replace': ''}, {'find': 'ab', 'replace': 'x'}]}},
+        {'type': 'strip_lines', 'params': {'mode': 'right'}},
+        {'type': 'remove_empty_lines', 'params': {}},
+    ],
+]
+
+TEXTS = [
+    '',
+    '\n',
+    'single line',
+    'a\nb\n',
+    '  a b  \n\n\n  c  \n',
+    'a\r\nb\r\n\r\nlast',
+    '\n\n\n',
+    ''.join(f'  line {i} ab  \n' + '\n' * (i % 3) for i in range(500)),
+]
+
+
+@pytest.fixture(scope='module')
+def processor():
+    processor = TextProcessor(max_workers=2, regex_timeout=0)
+    processor.CHUNK_SIZE = 16  # 小块，让短文本也分成多块
+    yield processor
+    processor.shutdown()
+
+
+@pytest.mark.parametrize('steps', RULES)
+@pytest.mark.parametrize('text', TEXTS)
+def test_process_parallel_matches_run(processor, steps, text):
+    rule = {'id': None, 'steps': steps}
+    expected = processor.run(text, processor.compile(rule))
+    assert processor.process_parallel(text, rule) == expected
+
+
+# ==================== 逐行步骤融合 ====================
+
+LINE_STEPS = [
+    {'type': 'strip_lines', 'params': {'mode': 'both'}},
+    {'type': 'strip_lines', 'params': {'mode': 'right'}},
+    {'type': 'remove_empty_lines', 'params': {}},
+    {'type': 'add_prefix', 'params': {'prefix': '> '}},
+    {'type': 'add_suffix', 'params': {'suffix': ' <'}},
+]
+
+LINE_TEXTS = [
+    '',
+    '\n',
+    'last line without newline',
+    'trailing newline\n',
+    'empty last line\n\n',
+    'crlf\r\nline \r\n\r\n',
+    '   \n\t\n  ',
+    '  Mixed  \n\n  Case \n   \nEnd',
+]
+
+
+def _run_unfused(processor, steps, text):
+    """逐个步骤执行（不融合）"""
+    for step in steps:
+        compiled_step = processor._compile_step(step)
+        if compiled_step:
+            text = compiled_step.func(text)
+    return text
+
+
+@pytest.mark.parametrize('text', LINE_TEXTS)
+@pytest.mark.parametrize('start', range(len(LINE_STEPS)))
+def test_fused_line_steps_match_unfused(start, text):
+    processor = TextProcessor(max_workers=1, regex_timeout=0)
+    # 从不同位置开始的 2~5 个连续步骤（包括移除空行在首位、末位的情况）
+    for length in range(2, len(LINE_STEPS) + 1):
+        steps = [LINE_STEPS[(start + i) % len(LINE_STEPS)] for i in range(length)]
+        compiled = processor.compile({'steps': steps})
+        assert len(compiled.steps) == 1, "连续的逐行步骤应融合为一个步骤"
+        assert processor.run(text, compiled) == _run_unfused(processor, steps, text)
+
+
+def test_compile_cache_follows_step_changes():
+    processor = TextProcessor(max_workers=1, regex_timeout=0)
+    rule = {'id': 'custom_test', 'steps': [{'type': 'case_transform', 'params': {'mode': 'upper'}}]}
+    assert processor.process('abc', rule) == 'ABC'
+    assert processor.compile(rule) is processor.compile(dict(rule))
+    
+    # 直接修改步骤（不经过规则编辑对话框）后重新编译
+    rule['steps'][0]['params']['mode'] = 'lower'
+    assert processor.process('ABC', rule) == 'abc'
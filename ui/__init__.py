@@ -1,11 +1,15 @@
 """UI模块"""
 from .card_window import CardWindow
+from .card_pool import CardPool
 from .settings_window import SettingsWindow
 from .hotkey_edit import HotkeyEdit
 from .find_replace_dialog import FindReplaceDialog
 from .custom_rule_dialog import CustomRuleDialog
 from .step_edit_dialog import StepEditDialog
 from .shortcut_capture_dialog import ShortcutCaptureDialog
+from .history_model import HistoryListModel
+from .text_patch import apply_text, diff_regions, normalize_newlines
 
-__all__ = ['CardWindow', 'SettingsWindow', 'HotkeyEdit', 'FindReplaceDialog', 
-           'CustomRuleDialog', 'StepEditDialog', 'ShortcutCaptureDialog']
+__all__ = ['CardWindow', 'CardPool', 'SettingsWindow', 'HotkeyEdit', 'FindReplaceDialog', 
+           'CustomRuleDialog', 'StepEditDialog', 'ShortcutCaptureDialog', 'HistoryListModel',
+           'apply_text', 'diff_regions', 'normalize_newlines']
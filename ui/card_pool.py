@@ -0,0 +1,109 @@
+"""
+贴卡预创建池
+在空闲时预先创建隐藏的贴卡，按下快捷键时只需设置内容、定位并显示
+"""
+from PyQt6.QtCore import QObject, QTimer
+from utils import get_config
+from .card_window import CardWindow
+
+
+class CardPool(QObject):
+    """
+    贴卡预创建池
+    
+    取出贴卡后延迟 REFILL_DELAY 再补充（避免与刚显示的贴卡争抢绘制），每次空闲时
+    只创建一个，直到数量达到 size。外观和菜单配置由贴卡自行响应；只在创建时读取的
+    配置（CREATION_KEYS）改变后丢弃旧的贴卡。
+    """
+    
+    # 取出贴卡后延迟补充的时间（毫秒）
+    REFILL_DELAY = 500
+    # 贴卡只在创建时读取的配置项
+    CREATION_KEYS = ('card.always_on_top', 'card.large_document_chars')
+    
+    def __init__(self, clipboard_monitor=None, size=2, parent=None):
+        """
+        Args:
+            clipboard_monitor: 传递给贴卡的剪贴板监听器
+            size: 预创建的贴卡数量，0 表示不预创建
+        """
+        super().__init__(parent)
+        self.clipboard_monitor = clipboard_monitor
+        self.size = size
+        self._cards = []
+        
+        self.config = get_config()
+        self._creation_config = self._get_creation_config()  # 池中贴卡创建时的配置
+        self.config.section('card').changed.connect(self._on_config_changed)
+        
+        self._refill_timer = QTimer(self)
+        self._refill_timer.setSingleShot(True)
+        self._refill_timer.timeout.connect(self._refill)
+        self._schedule_refill(0)
+    
+    def take(self, content):
+        """
+        取出一个显示 content 的贴卡（未显示）
+        
+        池为空或内容需要大文本模式时直接创建新贴卡。
+        """
+        if self._cards and self._cards[-1].accepts_content(content):
+            card = self._cards.pop()
+            card.set_content(content)
+        else:
+            card = CardWindow(content, clipboard_monitor=self.clipboard_monitor)
+        
+        self._schedule_refill(self.REFILL_DELAY)
+        return card
+    
+    def _get_creation_config(self):
+        """贴卡创建时读取的配置"""
+        return tuple(self.config.get(key) for key in self.CREATION_KEYS)
+    
+    def _on_config_changed(self, key, value):
+        """贴卡配置改变"""
+        if key == 'card.pool_size':
+            self.size = value
+            if len(self._cards) > value:
+                self._discard()
+            self._schedule_refill(self.REFILL_DELAY)
+        elif key in self.CREATION_KEYS and self._get_creation_config() != self._creation_config:
+            self.invalidate()
+    
+    def invalidate(self):
+        """丢弃已创建的贴卡，稍后按当前配置重新创建"""
+        self._discard()
+        self._schedule_refill(self.REFILL_DELAY)
+    
+    def clear(self):
+        """丢弃所有贴卡并停止补充"""
+        self._refill_timer.stop()
+        self.config.section('card').changed.disconnect(self._on_config_changed)
+        self._discard()
+    
+    def _discard(self):
+        """销毁池中的贴卡"""
+        self._creation_config = self._get_creation_config()
+        for card in self._cards:
+            card.close()
+            card.deleteLater()
+        self._cards.clear()
+    
+    def _schedule_refill(self, delay):
+        """安排补充（已安排时不重复）"""
+        if len(self._cards) < self.size and not self._refill_timer.isActive():
+            self._refill_timer.start(delay)
+    
+    def _refill(self):
+        """创建一个贴卡，数量不足时继续安排"""
+        if len(self._cards) >= self.size:
+            return
+        
+        card = CardWindow(clipboard_monitor=self.clipboard_monitor)
+        # 提前应用样式表、排版并创建原生窗口，显示时不再需要
+        card.ensurePolished()
+        card.layout().activate()
+        card.winId()
+        self._cards.append(card)
+        
+        self._schedule_refill(0)
@@ -2,11 +2,14 @@
 贴卡窗口 - 卡片式显示剪贴板内容
 类似 PixPin 的浮动卡片效果
 """
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, 
-                             QPushButton, QLabel, QApplication)
-from PyQt6.QtCore import Qt, QPoint, QPropertyAnimation, QEasingCurve, pyqtSignal
-from PyQt6.QtGui import QFont, QColor, QPalette, QCursor
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QPlainTextEdit,
+                             QPushButton, QLabel, QApplication, QProgressBar)
+from PyQt6.QtCore import Qt, QPoint, QPropertyAnimation, QEasingCurve, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont, QColor, QPalette, QCursor, QTextCursor
+import time
 import pyperclip
+from core import TransformRunner
+from .text_patch import apply_text
 
 
 class CardWindow(QWidget):
@@ -14,6 +17,17 @@ class CardWindow(QWidget):
     
     # 信号
     closed = pyqtSignal()  # 窗口关闭信号
+    first_painted = pyqtSignal(float)  # 从显示请求到首次绘制的延迟（毫秒），见 track_paint_latency
+    
+    # 内容超过该字符数时使用大文本模式（QPlainTextEdit 按段落排版，不支持富文本）
+    LARGE_DOCUMENT_CHARS = 1024 * 1024
+    # 大文本模式下超过该字符数时只读分页加载，滚动到底部时再加载下一页（0 表示不分页）
+    LAZY_PAGING_CHARS = 16 * 1024 * 1024
+    # 分页加载时每页的字符数（在换行处截断）
+    PAGE_CHARS = 1024 * 1024
+    
+    # 影响外观的配置项
+    APPEARANCE_KEYS = ('card.font_family', 'card.font_size', 'card.font_color', 'card.bg_color')
     
     # 功能定义（id, 名称, 图标, 默认快捷键, 方法名, 提示文字）
     MENU_FEATURES = [
@@ -52,9 +66,9 @@ class CardWindow(QWidget):
         self.clipboard_monitor = clipboard_monitor  # 剪贴板监听器引用
         self.is_internal_copy = False  # 标记是否是内部复制操作
         
-        # 初始化配置（需要在使用前初始化）
-        from utils import ConfigManager
-        self.config = ConfigManager()
+        # 共享配置（需要在使用前初始化）
+        from utils import get_config
+        self.config = get_config()
         
         # 状态变量（必须在使用前定义）
         # 固定状态（位置和尺寸）
@@ -85,9 +99,23 @@ class CardWindow(QWidget):
         # 快捷键列表（用于管理和清理）
         self.shortcuts = []
         
+        # 显示请求的时间（perf_counter），首次绘制时输出延迟
+        self._paint_requested_at = None
+        
+        # 后台文本变换（文档版本用于判断结果是否仍然适用）
+        self._doc_version = 0
+        self._appending_page = False  # 正在追加分页内容（不是用户修改，不改变文档版本）
+        self.transform_runner = TransformRunner(self)
+        
+        # 复制时的其他剪贴板格式（按需读取，内容修改后不再使用）
+        self._format_loader = None
+        self._format_version = 0
+        
         self._init_ui()
+        self._init_transform_runner()
         self._register_shortcuts()
         self._apply_style()
+        self._init_config_watch()
         
         # 启用鼠标追踪以实时更新光标样式
         self.setMouseTracking(True)
@@ -101,8 +129,8 @@ class CardWindow(QWidget):
         # 注册到剪贴板监听器
         if self.clipboard_monitor:
             self.clipboard_monitor.register_card(self)
-        
-        
+    
+    
     def _init_ui(self):
         """初始化UI"""
         # 主布局
@@ -117,18 +145,20 @@ class CardWindow(QWidget):
         content_layout.setContentsMargins(10, 20, 10, 10)  # 增加上边距到20
         content_layout.setSpacing(0)
         
-        # 文本显示区域
-        self.text_edit = QTextEdit()
-        self.text_edit.setPlainText(self.content)
-        self.text_edit.setReadOnly(False)  # 允许编辑
+        # 文本显示区域（大文本使用纯文本编辑器）
+        self._large_chars = self.config.get('card.large_document_chars', self.LARGE_DOCUMENT_CHARS)
+        self.large_mode = len(self.content) > self._large_chars
+        if self.large_mode:
+            self.text_edit = QPlainTextEdit()
+        else:
+            self.text_edit = QTextEdit()
+        self._loaded_chars = 0  # 分页加载时已加载到编辑器的字符数
+        self._load_content(self.content)
         self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         
         # 设置字体（从配置加载）
-        font_size = self.config.get('card.font_size', 10)
-        font_family = self.config.get('card.font_family', 'Consolas')
-        font = QFont(font_family, font_size)
-        self.text_edit.setFont(font)
+        self._apply_font()
         
         # 自定义右键菜单
         self.text_edit.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -147,19 +177,244 @@ class CardWindow(QWidget):
         
         content_layout.addWidget(self.text_edit, 1)
         
+        # 分页加载提示（只读，可一次加载全部后编辑）
+        self.paging_widget = QWidget()
+        paging_layout = QHBoxLayout(self.paging_widget)
+        paging_layout.setContentsMargins(0, 4, 0, 0)
+        paging_layout.setSpacing(6)
+        
+        self.paging_label = QLabel()
+        self.load_all_btn = QPushButton("全部加载并编辑")
+        self.load_all_btn.setFixedHeight(20)
+        self.load_all_btn.clicked.connect(self._load_all_pages)
+        
+        paging_layout.addWidget(self.paging_label, 1)
+        paging_layout.addWidget(self.load_all_btn)
+        content_layout.addWidget(self.paging_widget)
+        self.text_edit.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self._update_paging_status()
+        
+        # 后台处理进度（处理时间较长时显示）
+        self.progress_widget = QWidget()
+        progress_layout = QHBoxLayout(self.progress_widget)
+        progress_layout.setContentsMargins(0, 4, 0, 0)
+        progress_layout.setSpacing(6)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setFixedHeight(8)
+        
+        self.cancel_transform_btn = QPushButton("取消")
+        self.cancel_transform_btn.setFixedHeight(20)
+        self.cancel_transform_btn.clicked.connect(self.transform_runner.cancel)
+        
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.cancel_transform_btn)
+        self.progress_widget.hide()
+        content_layout.addWidget(self.progress_widget)
+        
         main_layout.addWidget(self.content_widget)
         self.setLayout(main_layout)
         
         # 设置默认大小
         self.resize(300, 200)
+    
+    
+    # ==================== 大文本分页加载 ====================
+    
+    def _load_content(self, content):
+        """将内容加载到编辑器（大文本模式下超过分页阈值时只加载第一页）"""
+        paging_chars = self.config.get('card.lazy_paging_chars', self.LAZY_PAGING_CHARS)
+        paging = self.large_mode and paging_chars and len(content) > paging_chars
+        
+        document = self.text_edit.document()
+        if paging:
+            # 只读预览：不记录撤销（未加载的部分不在文档中，编辑会与内容不一致）
+            self._loaded_chars = self._page_end(content, 0)
+            document.setUndoRedoEnabled(False)
+            self.text_edit.setPlainText(content[:self._loaded_chars])
+        else:
+            self._loaded_chars = len(content)
+            self.text_edit.setPlainText(content)
+            document.setUndoRedoEnabled(True)
+        self.text_edit.setReadOnly(bool(paging))
+        
+        from core import TextProcessor, get_text_processor
+        if len(content) > TextProcessor.PARALLEL_THRESHOLD:
+            # 规则处理将使用多进程，提前在后台启动工作进程
+            get_text_processor().warm_up()
+    
+    def _is_paging(self):
+        """是否还有未加载的内容"""
+        return self._loaded_chars < len(self.content)
+    
+    def _page_end(self, content, start):
+        """从 start 开始的一页的结束位置（尽量在换行之后截断）"""
+        end = start + self.PAGE_CHARS
+        if end >= len(content):
+            return len(content)
+        cut = content.rfind('\n', start, end)
+        return cut + 1 if cut >= start else end
+    
+    def _append_loaded(self, end):
+        """将 [已加载位置, end) 的内容追加到文档末尾（不移动光标和滚动位置）"""
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        self._appending_page = True
+        try:
+            cursor.insertText(self.content[self._loaded_chars:end])
+        finally:
+            self._appending_page = False
+        self._loaded_chars = end
+        
+        if not self._is_paging():
+            # 全部加载完成，恢复编辑和撤销
+            self.text_edit.setReadOnly(False)
+            self.text_edit.document().setUndoRedoEnabled(True)
+            print(f"✓ 大文本已全部加载（{len(self.content)} 字符）")
+        self._update_paging_status()
+    
+    def _on_scrolled(self, value):
+        """滚动到接近底部时加载下一页"""
+        if not self._is_paging():
+            return
+        scroll_bar = self.text_edit.verticalScrollBar()
+        if value >= scroll_bar.maximum() - scroll_bar.pageStep():
+            self._append_loaded(self._page_end(self.content, self._loaded_chars))
+    
+    def _load_all_pages(self):
+        """加载全部剩余内容（编辑、查找、变换前调用）"""
+        if self._is_paging():
+            self._append_loaded(len(self.content))
+    
+    def _update_paging_status(self):
+        """更新分页加载提示"""
+        if not self._is_paging():
+            self.paging_widget.hide()
+            return
+        percent = self._loaded_chars * 100 // len(self.content)
+        self.paging_label.setText(f"只读预览，已加载 {percent}%")
+        self.paging_widget.show()
+    
+    def _init_transform_runner(self):
+        """初始化后台文本变换"""
+        self.text_edit.document().contentsChanged.connect(self._on_document_changed)
+        
+        # 处理超过 300ms 才显示进度条，避免短任务闪烁
+        self._progress_timer = QTimer(self)
+        self._progress_timer.setSingleShot(True)
+        self._progress_timer.setInterval(300)
+        self._progress_timer.timeout.connect(self.progress_widget.show)
+        
+        self.transform_runner.started.connect(self._on_transform_started)
+        self.transform_runner.progress_changed.connect(self.progress_bar.setValue)
+        self.transform_runner.idle.connect(self._on_transform_idle)
+    
+    def _on_document_changed(self):
+        """文档内容改变（追加分页内容不算修改：变换和原始格式始终基于完整的 self.content）"""
+        if not self._appending_page:
+            self._doc_version += 1
+    
+    def _on_transform_started(self):
+        """后台变换开始"""
+        self.progress_bar.setValue(0)
+        self._progress_timer.start()
+    
+    def _on_transform_idle(self):
+        """后台变换全部结束"""
+        self._progress_timer.stop()
+        self.progress_widget.hide()
+    
+    def _run_transform(self, name, compute, apply, source='plain'):
+        """
+        在后台执行文本变换
+        
+        Args:
+            name: 变换名称（用于日志）
+            compute: 在工作线程中调用 compute(text, progress)，返回结果
+            apply: 在界面线程中调用 apply(result, error)
+            source: 输入文本格式，'plain' 或 'html'
+        
+        处理期间文档被修改时丢弃结果；重复触发时只执行最后一次。
+        """
+        def prepare():
+            if source == 'html' and not self.large_mode:
+                text = self.text_edit.toHtml()
+            else:
+                # 大文本模式没有格式，直接处理纯文本
+                text = self.get_content()
+            return text, self._doc_version
+        
+        def callback(data, result, error):
+            _, version = data
+            if version != self._doc_version:
+                print(f"✗ 内容在处理期间已修改，放弃结果: {name}")
+                return
+            apply(result, error)
         
-        
+        self.transform_runner.submit(
+            prepare, lambda data, progress: compute(data[0], progress), callback
+        )
+    
+    def _init_config_watch(self):
+        """监听共享配置的变化（同一轮事件中的多次改变合并处理）"""
+        self._appearance_dirty = False
+        self._menu_dirty = False
+        self._config_timer = QTimer(self)
+        self._config_timer.setSingleShot(True)
+        self._config_timer.setInterval(0)
+        self._config_timer.timeout.connect(self._apply_config_changes)
+        
+        self._watched_sections = [
+            (self.config.section('card'), self._on_card_config_changed),
+            (self.config.section('menu'), self._on_menu_config_changed),
+            (self.config.section('custom_rules'), self._on_menu_config_changed),
+        ]
+        for section, handler in self._watched_sections:
+            section.changed.connect(handler)
+    
+    def _on_card_config_changed(self, key, value):
+        """贴卡配置改变"""
+        if key in self.APPEARANCE_KEYS:
+            self._appearance_dirty = True
+            self._config_timer.start()
+    
+    def _on_menu_config_changed(self, key, value):
+        """菜单或自定义规则配置改变"""
+        self._menu_dirty = True
+        self._config_timer.start()
+    
+    def _apply_config_changes(self):
+        """应用合并后的配置变化"""
+        if self._appearance_dirty:
+            self._appearance_dirty = False
+            if self._get_appearance() != self._appearance:
+                self._apply_font()
+                self._apply_style()
+        if self._menu_dirty:
+            self._menu_dirty = False
+            self.reload_menu_config()
+    
+    def _get_appearance(self):
+        """配置中的外观设置"""
+        return (
+            self.config.get('card.font_family', 'Consolas'),
+            self.config.get('card.font_size', 10),
+            self.config.get('card.font_color', '#000000'),
+            self.config.get('card.bg_color', '#FFFFFF'),
+        )
+    
+    def _apply_font(self):
+        """应用字体（字体族和大小）"""
+        font_family, font_size, _, _ = self._get_appearance()
+        self.text_edit.setFont(QFont(font_family, font_size))
+    
     def _apply_style(self):
         """应用样式"""
         # 从配置加载颜色
-        font_color = self.config.get('card.font_color', '#000000')
-        bg_color = self.config.get('card.bg_color', '#FFFFFF')
-        font_family = self.config.get('card.font_family', 'Consolas')
+        self._appearance = self._get_appearance()
+        font_family, _, font_color, bg_color = self._appearance
         
         # 计算半透明背景色
         from PyQt6.QtGui import QColor
@@ -173,7 +428,7 @@ class CardWindow(QWidget):
                 border: 1px solid #ddd;
             }}
             
-            QTextEdit {{
+            QTextEdit, QPlainTextEdit {{
                 background-color: transparent;
                 border: none;
                 selection-background-color: #B3D9FF;
@@ -236,7 +491,7 @@ class CardWindow(QWidget):
         if self.is_pinned:
             self.setCursor(QCursor(Qt.CursorShape.ArrowCursor))
             return
-            
+        
         if edge == 'bottom_right':
             self.setCursor(QCursor(Qt.CursorShape.SizeFDiagCursor))
         elif edge == 'bottom_left':
@@ -255,7 +510,7 @@ class CardWindow(QWidget):
             if self.is_pinned:
                 super().mousePressEvent(event)
                 return
-                
+            
             edge = self._get_resize_edge(event.pos())
             
             if edge:
@@ -357,7 +612,7 @@ class CardWindow(QWidget):
     
     def _on_copy(self):
         """复制内容到剪贴板"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
             # 使用剪贴板监听器的内部复制方法
             if self.clipboard_monitor:
@@ -551,32 +806,40 @@ class CardWindow(QWidget):
         self._toggle_always_on_top(not self.is_always_on_top)
     
     def _execute_custom_rule(self, rule):
-        """执行自定义规则"""
-        from core import TextProcessor
+        """执行自定义规则（在后台线程中处理）"""
+        from core import get_text_processor
         from PyQt6.QtWidgets import QMessageBox
         
-        # 获取当前文本
-        text = self.text_edit.toPlainText()
-        
-        if not text:
+        if self.text_edit.document().isEmpty():
             QMessageBox.warning(self, "提示", "文本为空，无需处理")
             return
         
-        # 执行处理
-        processor = TextProcessor()
-        try:
-            result = processor.process(text, rule)
-            
-            # 更新文本
-            self.text_edit.clear()
-            self.text_edit.setPlainText(result)
+        rule_name = rule.get('name', '未命名')
+        processor = get_text_processor()
+        step_errors = []  # 被跳过的步骤 (步骤类型, 异常)
+        
+        def compute(text, progress):
+            # 共享处理器，复用已编译的规则
+            step_errors.clear()
+            return processor.process(text, rule, progress, step_errors)
+        
+        def apply(result, error):
+            if error:
+                QMessageBox.critical(self, "错误", f"执行规则失败: {str(error)}")
+                print(f"✗ 执行自定义规则失败: {str(error)}")
+                return
             
-            rule_name = rule.get('name', '未命名')
+            # 更新文本（只替换变化的部分，可撤销）
+            self._set_text(result)
             print(f"✓ 已执行自定义规则: {rule_name}")
             
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"执行规则失败: {str(e)}")
-            print(f"✗ 执行自定义规则失败: {str(e)}")
+            if step_errors:
+                # 逐个报告执行失败（如正则超时）而被跳过的步骤
+                names = {t['id']: t['name'] for t in processor.get_step_types()}
+                details = "\n".join(f"{names.get(t, t)}: {e}" for t, e in step_errors)
+                QMessageBox.warning(self, "部分步骤未执行", f"以下步骤已跳过，其余步骤已执行：\n{details}")
+        
+        self._run_transform(rule_name, compute, apply)
     
     def reload_menu_config(self):
         """重新加载菜单配置（用于设置更改后立即生效）"""
@@ -613,17 +876,46 @@ class CardWindow(QWidget):
             print("✓ 窗口已取消置顶")
     
     def _on_clear(self):
-        """清空内容"""
-        self.text_edit.clear()
+        """清空内容（可撤销）"""
+        self._set_text('')
     
     def _on_clear_format(self):
-        """清除格式 - 移除所有文本格式，保留纯文本"""
+        """清除格式 - 移除所有文本格式，保留纯文本（在后台线程中处理）"""
+        def apply(final_text, error):
+            if error:
+                print(f"✗ 清除格式失败: {error}")
+                return
+            
+            # 应用清理后的纯文本（需要去掉所有格式，整体替换文档）
+            self._load_all_pages()
+            self.text_edit.clear()
+            self.text_edit.setPlainText(final_text)
+            
+            print(f"✓ 已清除格式，保留纯文本内容（{len(final_text)} 字符）")
+        
+        # 内容未修改且复制时有 HTML 格式时使用原始 HTML，否则使用编辑器导出的 HTML
+        load_original = self._original_format_loader('text/html')
+        
+        def compute(html_text, progress):
+            import re
+            
+            original = load_original() if load_original else None
+            if original:
+                # 应用程序复制的 HTML 块之间通常没有换行（编辑器导出的 HTML 每段一行），按块级标签换行
+                html_text = re.sub(
+                    r'<br\s*/?>|</(?:p|div|h[1-6]|li|tr|pre|blockquote)\s*>', '\\g<0>\n',
+                    original.decode('utf-8', errors='replace'), flags=re.IGNORECASE
+                )
+            return self._strip_formatting(html_text, progress)
+        
+        self._run_transform("清除格式", compute, apply, source='html')
+    
+    @staticmethod
+    def _strip_formatting(html_text, progress):
+        """从 HTML 中提取纯文本并清除 Markdown 语法"""
         import html
         import re
         
-        # 获取 HTML 格式的内容
-        html_text = self.text_edit.toHtml()
-        
         # 步骤1: 移除 <style> 标签及其内容（包括 CSS 代码）
         # 使用 DOTALL 模式让 . 匹配换行符
         text = re.sub(r'<style[^>]*>.*?</style>', '', html_text, flags=re.DOTALL | re.IGNORECASE)
@@ -634,12 +926,16 @@ class CardWindow(QWidget):
         # 步骤3: 移除 HTML 注释
         text = re.sub(r'<!--.*?-->', '', text, flags=re.DOTALL)
         
+        progress(0.2)
+        
         # 步骤4: 先解码 HTML 实体（必须在移除标签前做，否则 &lt;p&gt; 无法被识别）
         text = html.unescape(text)
         
         # 步骤5: 移除所有 HTML 标签（解码后才能正确匹配）
         text = re.sub(r'<[^>]+>', '', text)
         
+        progress(0.4)
+        
         # 步骤6: 清除 Markdown 语法
         # 6.1 移除图片语法 ![alt](url)
         text = re.sub(r'!\[([^\]]*)\]\([^\)]+\)', r'\1', text)
@@ -682,6 +978,8 @@ class CardWindow(QWidget):
         # 6.13 移除表格语法（简单处理，移除 | 分隔符）
         text = re.sub(r'\|', '', text)
         
+        progress(0.8)
+        
         # 步骤7: 清理空白字符
         # 移除零宽字符和其他不可见字符
         text = re.sub(r'[\u200b-\u200f\ufeff]', '', text)
@@ -698,20 +996,14 @@ class CardWindow(QWidget):
         text = '\n'.join(cleaned_lines)
         
         # 步骤11: 去除文本首尾空白
-        final_text = text.strip()
-        
-        # 应用清理后的纯文本
-        self.text_edit.clear()
-        self.text_edit.setPlainText(final_text)
-        
-        print(f"✓ 已清除格式，保留纯文本内容（{len(final_text)} 字符）")
+        return text.strip()
     
     def _on_clear_empty_lines(self):
         """清除空行 - 移除所有空白行"""
         import re
         
         # 获取当前文本
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         
         # 移除所有空白行（包括只有空格/制表符的行）
         lines = text.split('\n')
@@ -721,8 +1013,7 @@ class CardWindow(QWidget):
         cleaned_text = '\n'.join(non_empty_lines)
         
         # 更新文本
-        self.text_edit.clear()
-        self.text_edit.setPlainText(cleaned_text)
+        self._set_text(cleaned_text)
         
         removed_count = len(lines) - len(non_empty_lines)
         print(f"✓ 已清除 {removed_count} 个空行")
@@ -731,6 +1022,8 @@ class CardWindow(QWidget):
         """搜索文本 - 使用统一对话框"""
         from .find_replace_dialog import FindReplaceDialog
         
+        # 查找范围为全部内容
+        self._load_all_pages()
         dialog = FindReplaceDialog(self.text_edit, self)
         dialog.setWindowTitle("查找")  # 默认为查找模式
         dialog.show()  # 使用 show() 而不是 exec() 以允许非模态
@@ -739,6 +1032,8 @@ class CardWindow(QWidget):
         """查找替换 - 使用统一对话框"""
         from .find_replace_dialog import FindReplaceDialog
         
+        # 查找范围为全部内容
+        self._load_all_pages()
         dialog = FindReplaceDialog(self.text_edit, self)
         dialog.toggle_replace_btn.setChecked(True)  # 展开替换选项
         dialog._toggle_replace(True)
@@ -748,7 +1043,7 @@ class CardWindow(QWidget):
         """显示文本统计"""
         from PyQt6.QtWidgets import QMessageBox
         
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         
         # 统计
         char_count = len(text)
@@ -769,59 +1064,59 @@ class CardWindow(QWidget):
     
     def _on_case_upper(self):
         """转换为大写"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
-            self.text_edit.setPlainText(text.upper())
+            self._set_text(text.upper())
             print("✓ 已转换为大写")
     
     def _on_case_lower(self):
         """转换为小写"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
-            self.text_edit.setPlainText(text.lower())
+            self._set_text(text.lower())
             print("✓ 已转换为小写")
     
     def _on_case_title(self):
         """首字母大写"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
-            self.text_edit.setPlainText(text.title())
+            self._set_text(text.title())
             print("✓ 已转换为首字母大写")
     
     def _on_case_capitalize(self):
         """句首大写"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
-            self.text_edit.setPlainText(text.capitalize())
+            self._set_text(text.capitalize())
             print("✓ 已转换为句首大写")
     
     # ==================== 去除空格功能 ====================
     
     def _on_strip_both(self):
         """去除两端空格"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
             lines = text.split('\n')
             result = '\n'.join([line.strip() for line in lines])
-            self.text_edit.setPlainText(result)
+            self._set_text(result)
             print("✓ 已去除两端空格")
     
     def _on_strip_left(self):
         """去除行首空格"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
             lines = text.split('\n')
             result = '\n'.join([line.lstrip() for line in lines])
-            self.text_edit.setPlainText(result)
+            self._set_text(result)
             print("✓ 已去除行首空格")
     
     def _on_strip_right(self):
         """去除行尾空格"""
-        text = self.text_edit.toPlainText()
+        text = self.get_content()
         if text:
             lines = text.split('\n')
             result = '\n'.join([line.rstrip() for line in lines])
-            self.text_edit.setPlainText(result)
+            self._set_text(result)
             print("✓ 已去除行尾空格")
     
     def _on_add_prefix(self):
@@ -835,7 +1130,7 @@ class CardWindow(QWidget):
         )
         
         if ok and prefix:
-            text = self.text_edit.toPlainText()
+            text = self.get_content()
             if not text:
                 return
             
@@ -843,7 +1138,7 @@ class CardWindow(QWidget):
             lines = [prefix + line for line in lines]
             result = '\n'.join(lines)
             
-            self.text_edit.setPlainText(result)
+            self._set_text(result)
             print(f"✓ 已添加前缀: {prefix}")
     
     def _on_add_suffix(self):
@@ -857,7 +1152,7 @@ class CardWindow(QWidget):
         )
         
         if ok and suffix:
-            text = self.text_edit.toPlainText()
+            text = self.get_content()
             if not text:
                 return
             
@@ -865,54 +1160,116 @@ class CardWindow(QWidget):
             lines = [line + suffix for line in lines]
             result = '\n'.join(lines)
             
-            self.text_edit.setPlainText(result)
+            self._set_text(result)
             print(f"✓ 已添加后缀: {suffix}")
     
     def _on_json_format(self):
-        """JSON 格式化"""
+        """JSON 格式化（在后台线程中处理）"""
         import json
         from PyQt6.QtWidgets import QMessageBox
         
-        text = self.text_edit.toPlainText()
-        
-        try:
+        def compute(text, progress):
             # 尝试解析 JSON
             data = json.loads(text)
+            progress(0.5)
             
             # 格式化输出
-            formatted = json.dumps(data, indent=2, ensure_ascii=False)
+            return json.dumps(data, indent=2, ensure_ascii=False)
+        
+        def apply(formatted, error):
+            if isinstance(error, json.JSONDecodeError):
+                QMessageBox.warning(
+                    self, 
+                    "格式化失败", 
+                    f"JSON 解析错误:\n{str(error)}\n\n请确保内容是有效的 JSON 格式"
+                )
+                return
+            if error:
+                QMessageBox.critical(self, "错误", f"JSON 格式化失败: {str(error)}")
+                return
             
-            self.text_edit.setPlainText(formatted)
+            self._set_text(formatted)
             QMessageBox.information(self, "格式化成功", "JSON 已格式化")
-        except json.JSONDecodeError as e:
-            QMessageBox.warning(
-                self, 
-                "格式化失败", 
-                f"JSON 解析错误:\n{str(e)}\n\n请确保内容是有效的 JSON 格式"
-            )
+        
+        self._run_transform("JSON 格式化", compute, apply)
+    
+    def _set_text(self, text):
+        """更新文本：只替换变化的区域，可撤销，保留光标和滚动位置"""
+        self._load_all_pages()
+        apply_text(self.text_edit, text)
+    
+    def accepts_content(self, content):
+        """已创建的贴卡能否通过 set_content 显示该内容（编辑器类型在创建时确定）"""
+        return self.large_mode == (len(content) > self._large_chars)
+    
+    def track_paint_latency(self, requested_at):
+        """
+        记录显示请求的时间（time.perf_counter()），首次绘制时发出 first_painted
+        
+        配置 debug.log_latency 为 True 时同时输出延迟。
+        """
+        self._paint_requested_at = requested_at
+    
+    def paintEvent(self, event):
+        """绘制事件"""
+        super().paintEvent(event)
+        if self._paint_requested_at is not None:
+            latency = (time.perf_counter() - self._paint_requested_at) * 1000
+            self._paint_requested_at = None
+            if self.config.get('debug.log_latency', False):
+                print(f"✓ 贴卡显示延迟: {latency:.1f}ms")
+            self.first_painted.emit(latency)
     
     def set_content(self, content):
-        """设置内容"""
+        """设置内容（编辑器类型在创建时确定，大文本模式下超过分页阈值时分页加载）"""
         self.content = content
-        self.text_edit.setPlainText(content)
+        self._format_loader = None
+        self._load_content(content)
+        self._update_paging_status()
+    
+    def set_format_source(self, loader):
+        """
+        设置复制时其他剪贴板格式的来源（在 set_content 之后调用）
+        
+        Args:
+            loader: loader(mime) 返回该格式的数据（bytes），没有时返回 None；None 表示没有其他格式
+        """
+        self._format_loader = loader
+        self._format_version = self._doc_version
+    
+    def get_format(self, mime):
+        """
+        读取复制时的某种剪贴板格式（如 'text/html'）
+        
+        内容已修改或没有该格式时返回 None。会访问数据库，适合在后台线程中调用。
+        """
+        load = self._original_format_loader(mime)
+        return load() if load else None
+    
+    def _original_format_loader(self, mime):
+        """内容未修改时返回读取原始格式的函数，否则返回 None（在界面线程中调用）"""
+        if self._format_loader is None or self._doc_version != self._format_version:
+            return None
+        loader = self._format_loader
+        return lambda: loader(mime)
     
     def get_content(self):
         """获取内容"""
+        if self._is_paging():
+            # 分页加载期间只读，未加载的部分直接取原始内容
+            return self.content
         return self.text_edit.toPlainText()
     
     def apply_appearance(self, font_size, font_color, bg_color):
-        """应用外观设置"""
-        # 更新字体（包括字体族和大小）
-        font_family = self.config.get('card.font_family', 'Consolas')
-        font = QFont(font_family, font_size)
-        self.text_edit.setFont(font)
-        
-        # 更新配置
-        self.config.set('card.font_size', font_size)
-        self.config.set('card.font_color', font_color)
-        self.config.set('card.bg_color', bg_color)
-        
-        # 重新应用样式
+        """应用外观设置（写入共享配置，所有贴卡随之更新）"""
+        # 只写入有变化的配置项
+        for key, value in (('card.font_size', font_size), ('card.font_color', font_color),
+                           ('card.bg_color', bg_color)):
+            if self.config.get(key) != value:
+                self.config.set(key, value)
+        
+        # 当前贴卡立即更新
+        self._apply_font()
         self._apply_style()
     
     def eventFilter(self, obj, event):
@@ -930,6 +1287,17 @@ class CardWindow(QWidget):
     
     def closeEvent(self, event):
         """关闭事件"""
+        # 取消后台处理
+        self.transform_runner.cancel()
+        
+        # 停止监听配置
+        self._config_timer.stop()
+        for section, handler in self._watched_sections:
+            try:
+                section.changed.disconnect(handler)
+            except TypeError:
+                pass  # 已断开（重复关闭）
+        
         # 从剪贴板监听器注销
         if self.clipboard_monitor:
             self.clipboard_monitor.unregister_card(self)
@@ -5,19 +5,31 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QPushButton, QLineEdit, QGroupBox, QFormLayout,
                              QListWidget, QListWidgetItem, QComboBox, QTextEdit,
                              QMessageBox, QCheckBox, QScrollArea, QWidget)
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont
-from core import TextProcessor
+from core import TextProcessor, StepCache, TransformRunner, get_text_processor
 import uuid
 
 
 class CustomRuleDialog(QDialog):
     """自定义规则编辑对话框"""
     
+    # 测试区在输入或步骤修改后自动刷新的延迟（毫秒）
+    PREVIEW_DELAY = 300
+    
     def __init__(self, rule=None, parent=None):
         super().__init__(parent)
         self.rule = rule or self._create_new_rule()
-        self.processor = TextProcessor()
+        self.processor = get_text_processor()
+        
+        # 测试区：在后台执行，缓存各步骤的中间结果
+        self.step_cache = StepCache(self.processor)
+        self.preview_runner = TransformRunner(self)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(self.PREVIEW_DELAY)
+        self.preview_timer.timeout.connect(self._run_preview)
+        
         self._init_ui()
         self._load_rule()
     
@@ -132,6 +144,7 @@ class CustomRuleDialog(QDialog):
         self.test_input = QTextEdit()
         self.test_input.setPlaceholderText("在此输入测试文本...")
         self.test_input.setMaximumHeight(100)
+        self.test_input.textChanged.connect(self.preview_timer.start)
         input_layout.addWidget(self.test_input)
         test_input_layout.addLayout(input_layout)
         
@@ -146,9 +159,16 @@ class CustomRuleDialog(QDialog):
         
         test_layout.addLayout(test_input_layout)
         
+        test_button_layout = QHBoxLayout()
         test_btn = QPushButton("🧪 测试规则")
         test_btn.clicked.connect(self._test_rule)
-        test_layout.addWidget(test_btn)
+        test_button_layout.addWidget(test_btn)
+        
+        self.test_status = QLabel("")
+        self.test_status.setStyleSheet("color: #666; font-size: 11px;")
+        test_button_layout.addWidget(self.test_status)
+        test_button_layout.addStretch()
+        test_layout.addLayout(test_button_layout)
         
         test_group.setLayout(test_layout)
         layout.addWidget(test_group)
@@ -209,6 +229,8 @@ class CustomRuleDialog(QDialog):
         if step_type == 'find_replace':
             find = params.get('find', '')
             return f"'{find}'" if len(find) < 20 else f"'{find[:17]}...'"
+        elif step_type == 'multi_replace':
+            return f"{len(params.get('pairs', []))} 项"
         elif step_type == 'regex_replace':
             pattern = params.get('pattern', '')
             return f"/{pattern}/" if len(pattern) < 20 else f"/{pattern[:17]}.../"
@@ -239,6 +261,11 @@ class CustomRuleDialog(QDialog):
         self.move_up_btn.setEnabled(has_selection and row > 0)
         self.move_down_btn.setEnabled(has_selection and row < step_count - 1)
     
+    def _on_steps_changed(self):
+        """步骤被修改 - 刷新列表和预览"""
+        self._refresh_steps_list()
+        self.preview_timer.start()
+    
     def _add_step(self):
         """添加步骤"""
         from .step_edit_dialog import StepEditDialog
@@ -247,7 +274,7 @@ class CustomRuleDialog(QDialog):
         if dialog.exec() == QDialog.DialogCode.Accepted:
             step = dialog.get_step()
             self.rule['steps'].append(step)
-            self._refresh_steps_list()
+            self._on_steps_changed()
     
     def _edit_step(self):
         """编辑步骤"""
@@ -261,7 +288,7 @@ class CustomRuleDialog(QDialog):
         dialog = StepEditDialog(step=step, parent=self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.rule['steps'][row] = dialog.get_step()
-            self._refresh_steps_list()
+            self._on_steps_changed()
     
     def _move_step_up(self):
         """上移步骤"""
@@ -271,7 +298,7 @@ class CustomRuleDialog(QDialog):
         
         steps = self.rule['steps']
         steps[row], steps[row-1] = steps[row-1], steps[row]
-        self._refresh_steps_list()
+        self._on_steps_changed()
         self.steps_list.setCurrentRow(row - 1)
     
     def _move_step_down(self):
@@ -282,7 +309,7 @@ class CustomRuleDialog(QDialog):
             return
         
         steps[row], steps[row+1] = steps[row+1], steps[row]
-        self._refresh_steps_list()
+        self._on_steps_changed()
         self.steps_list.setCurrentRow(row + 1)
     
     def _delete_step(self):
@@ -300,25 +327,53 @@ class CustomRuleDialog(QDialog):
         
         if reply == QMessageBox.StandardButton.Yes:
             del self.rule['steps'][row]
-            self._refresh_steps_list()
+            self._on_steps_changed()
     
     def _test_rule(self):
         """测试规则"""
-        test_input = self.test_input.toPlainText()
-        
-        if not test_input:
+        if not self.test_input.toPlainText():
             QMessageBox.warning(self, "提示", "请输入测试文本")
             return
         
         # 保存当前编辑的规则
         self._save_to_rule()
         
-        # 执行处理
-        try:
-            result = self.processor.process(test_input, self.rule)
-            self.test_output.setPlainText(result)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"处理失败: {str(e)}")
+        self._run_preview(show_errors=True)
+    
+    def _run_preview(self, show_errors=False):
+        """
+        在后台执行规则并显示结果
+        
+        各步骤的中间结果按输入和步骤前缀缓存，修改某个步骤后只重新执行该步骤及之后的步骤。
+        """
+        self.preview_timer.stop()
+        
+        def prepare():
+            text = self.test_input.toPlainText()
+            if not text:
+                self.test_output.clear()
+                self.test_status.setText("")
+                return None
+            # 复制步骤列表：编辑步骤时替换列表元素，不影响正在执行的任务
+            return text, list(self.rule.get('steps', []))
+        
+        def compute(data, progress):
+            text, steps = data
+            result = self.step_cache.process(text, steps, progress)
+            return result, self.step_cache.reused, len(steps)
+        
+        def callback(data, result, error):
+            if error:
+                self.test_status.setText("处理失败")
+                if show_errors:
+                    QMessageBox.critical(self, "错误", f"处理失败: {str(error)}")
+                return
+            
+            output, reused, total = result
+            self.test_output.setPlainText(output)
+            self.test_status.setText(f"复用 {reused}/{total} 个步骤的结果" if reused else "")
+        
+        self.preview_runner.submit(prepare, compute, callback)
     
     def _set_shortcut(self):
         """设置快捷键"""
@@ -347,8 +402,23 @@ class CustomRuleDialog(QDialog):
             QMessageBox.warning(self, "验证失败", error_msg)
             return
         
+        if error_msg:
+            # 规则有效但存在风险（如正则可能执行很慢）
+            reply = QMessageBox.question(
+                self, "规则提示", f"{error_msg}\n\n是否仍然保存？",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        
         super().accept()
     
+    def done(self, result):
+        """关闭时停止测试区的后台处理"""
+        self.preview_timer.stop()
+        self.preview_runner.cancel()
+        super().done(result)
+    
     def get_rule(self):
         """获取编辑后的规则"""
         return self.rule
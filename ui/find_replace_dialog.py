@@ -1,11 +1,14 @@
 """
 查找替换对话框 - 类似 Word 风格
 """
+import re
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QLineEdit, QPushButton, QCheckBox, QGroupBox,
                              QRadioButton, QMessageBox, QWidget)
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QTextCursor, QTextDocument
+from core import TransformRunner, RegexTimeout, get_text_processor
+from .text_patch import apply_text
 
 
 class FindReplaceDialog(QDialog):
@@ -17,12 +20,17 @@ class FindReplaceDialog(QDialog):
         self.current_match_index = 0
         self.matches = []
         
+        # 正则操作在后台执行，受规则处理器的时间预算限制
+        self.processor = get_text_processor()
+        self.regex_runner = TransformRunner(self)
+        self.regex_runner.started.connect(lambda: self.status_label.setText("正在匹配..."))
+        
         self.setWindowTitle("查找和替换")
         self.setFixedWidth(500)
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowType.WindowContextHelpButtonHint)
         
         self._init_ui()
-        
+    
     def _init_ui(self):
         """初始化UI"""
         layout = QVBoxLayout()
@@ -212,11 +220,55 @@ class FindReplaceDialog(QDialog):
         else:
             self.hint_label.hide()
     
+    def _run_regex(self, compute, on_done):
+        """
+        在后台执行正则操作
+        
+        Args:
+            compute: 在工作线程中调用 compute(content, run)，其中
+                     run(op, *args) 在 RegexGuard 中执行查找内容对应的正则操作
+            on_done: 完成后在界面线程中调用 on_done(result)
+        
+        超过时间预算时终止并提示；执行期间文本被修改时丢弃结果。
+        """
+        pattern = self.find_input.text()
+        flags = re.IGNORECASE if not self.case_sensitive.isChecked() else 0
+        timeout = self.processor.regex_timeout
+        guard = self.processor.regex_guard
+        
+        def prepare():
+            return self.text_edit.toPlainText(), self.text_edit.document().revision()
+        
+        def run_compute(data, progress):
+            def run(op, *args):
+                return guard.run(op, pattern, flags, args, timeout, lambda: progress(0))
+            return compute(data[0], run)
+        
+        def callback(data, result, error):
+            if isinstance(error, RegexTimeout):
+                self.status_label.setText(f"正则执行超过 {error.timeout:g} 秒，已中止")
+                QMessageBox.warning(self, "正则执行超时",
+                                    f"{error}，已中止。\n请检查是否有嵌套量词（如 (a+)+）。")
+                return
+            if isinstance(error, re.error):
+                self.status_label.setText("")
+                QMessageBox.warning(self, "正则表达式错误", str(error))
+                return
+            if error:
+                self.status_label.setText(f"执行失败: {error}")
+                return
+            if data[1] != self.text_edit.document().revision():
+                self.status_label.setText("文本已修改，请重试")
+                return
+            on_done(result)
+        
+        self.regex_runner.submit(prepare, run_compute, callback)
+    
     def _on_find_text_changed(self, text):
         """查找文本改变"""
         if text:
             self.status_label.setText("")
-        
+    
     def _find_next(self):
         """查找下一个"""
         find_text = self.find_input.text()
@@ -224,7 +276,6 @@ class FindReplaceDialog(QDialog):
             self.status_label.setText("请输入查找内容")
             return
         
-        content = self.text_edit.toPlainText()
         cursor = self.text_edit.textCursor()
         
         # 构建搜索标志
@@ -238,24 +289,27 @@ class FindReplaceDialog(QDialog):
         
         # 从当前位置查找
         if self.use_regex.isChecked():
-            import re
-            pattern = re.compile(find_text, re.IGNORECASE if not self.case_sensitive.isChecked() else 0)
-            
             if self.search_down.isChecked():
                 pos = cursor.position()
-                match = pattern.search(content, pos)
-                if not match:
-                    # 从头开始
-                    match = pattern.search(content, 0)
                 
-                if match:
-                    new_cursor = self.text_edit.textCursor()
-                    new_cursor.setPosition(match.start())
-                    new_cursor.setPosition(match.end(), QTextCursor.MoveMode.KeepAnchor)
-                    self.text_edit.setTextCursor(new_cursor)
-                    self.status_label.setText(f"找到匹配项")
-                else:
-                    self.status_label.setText("未找到匹配项")
+                def search(content, run):
+                    span = run('search', content, pos)
+                    if span is None:
+                        # 从头开始
+                        span = run('search', content, 0)
+                    return span
+                
+                def found(span):
+                    if span:
+                        new_cursor = self.text_edit.textCursor()
+                        new_cursor.setPosition(span[0])
+                        new_cursor.setPosition(span[1], QTextCursor.MoveMode.KeepAnchor)
+                        self.text_edit.setTextCursor(new_cursor)
+                        self.status_label.setText(f"找到匹配项")
+                    else:
+                        self.status_label.setText("未找到匹配项")
+                
+                self._run_regex(search, found)
         else:
             found_cursor = self.text_edit.document().find(find_text, cursor, flags)
             
@@ -264,6 +318,7 @@ class FindReplaceDialog(QDialog):
                 if self.search_down.isChecked():
                     found_cursor = self.text_edit.document().find(find_text, 0, flags)
                 else:
+                    content = self.text_edit.toPlainText()
                     found_cursor = self.text_edit.document().find(find_text, len(content), flags)
             
             if not found_cursor.isNull():
@@ -315,41 +370,37 @@ class FindReplaceDialog(QDialog):
             self.status_label.setText("请输入查找内容")
             return
         
-        content = self.text_edit.toPlainText()
-        
         if self.use_regex.isChecked():
-            import re
-            flags = re.IGNORECASE if not self.case_sensitive.isChecked() else 0
-            try:
-                # 处理替换文本中的转义序列
-                # 支持: \n(换行) \t(制表符) \r(回车) \\(反斜杠)
-                processed_replace = replace_text.replace('\\n', '\n') \
-                                                 .replace('\\t', '\t') \
-                                                 .replace('\\r', '\r') \
-                                                 .replace('\\\\', '\\')
-                
-                new_content, count = re.subn(find_text, processed_replace, content, flags=flags)
+            # 处理替换文本中的转义序列
+            # 支持: \n(换行) \t(制表符) \r(回车) \\(反斜杠)
+            processed_replace = replace_text.replace('\\n', '\n') \
+                                             .replace('\\t', '\t') \
+                                             .replace('\\r', '\r') \
+                                             .replace('\\\\', '\\')
+            
+            def replaced(result):
+                new_content, count = result
                 if count > 0:
-                    self.text_edit.setPlainText(new_content)
+                    apply_text(self.text_edit, new_content)
                     self.status_label.setText(f"已替换 {count} 处")
                     QMessageBox.information(self, "替换完成", f"共替换 {count} 处")
                 else:
                     self.status_label.setText("未找到匹配项")
-            except re.error as e:
-                QMessageBox.warning(self, "正则表达式错误", str(e))
+            
+            self._run_regex(lambda content, run: run('subn', processed_replace, content), replaced)
         else:
+            content = self.text_edit.toPlainText()
             if self.case_sensitive.isChecked():
                 count = content.count(find_text)
                 new_content = content.replace(find_text, replace_text)
             else:
-                import re
                 pattern = re.compile(re.escape(find_text), re.IGNORECASE)
                 matches = pattern.findall(content)
                 count = len(matches)
                 new_content = pattern.sub(replace_text, content)
             
             if count > 0:
-                self.text_edit.setPlainText(new_content)
+                apply_text(self.text_edit, new_content)
                 self.status_label.setText(f"已替换 {count} 处")
                 QMessageBox.information(self, "替换完成", f"共替换 {count} 处")
             else:
@@ -362,26 +413,27 @@ class FindReplaceDialog(QDialog):
             self.status_label.setText("请输入查找内容")
             return
         
-        content = self.text_edit.toPlainText()
-        
         if self.use_regex.isChecked():
-            import re
-            flags = re.IGNORECASE if not self.case_sensitive.isChecked() else 0
-            try:
-                matches = re.findall(find_text, content, flags=flags)
-                count = len(matches)
-            except re.error as e:
-                QMessageBox.warning(self, "正则表达式错误", str(e))
-                return
-        else:
-            if self.case_sensitive.isChecked():
-                count = content.count(find_text)
-            else:
-                count = content.lower().count(find_text.lower())
+            self._run_regex(lambda content, run: run('count', content), self._show_count)
+            return
         
+        content = self.text_edit.toPlainText()
+        if self.case_sensitive.isChecked():
+            count = content.count(find_text)
+        else:
+            count = content.lower().count(find_text.lower())
+        self._show_count(count)
+    
+    def _show_count(self, count):
+        """显示匹配数量"""
         self.status_label.setText(f"找到 {count} 个匹配项")
         QMessageBox.information(self, "计数结果", f"找到 {count} 个匹配项")
     
+    def closeEvent(self, event):
+        """关闭时中止正在执行的正则操作"""
+        self.regex_runner.cancel()
+        super().closeEvent(event)
+    
     def keyPressEvent(self, event):
         """键盘事件"""
         if event.key() == Qt.Key.Key_F3:
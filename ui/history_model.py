@@ -0,0 +1,187 @@
+"""
+历史记录列表模型
+按需分页加载历史记录摘要，新记录以行级插入/移动的方式增量更新
+"""
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+
+class HistoryListModel(QAbstractListModel):
+    """
+    历史记录列表模型
+    
+    只保存已加载行的摘要（不含完整内容）。视图滚动到底部时通过
+    canFetchMore/fetchMore 加载下一页；有新记录时只查询比首行更新的记录，
+    刷新代价与历史总数无关。
+    """
+    
+    def __init__(self, storage, page_size=50, parent=None):
+        """
+        Args:
+            storage: AsyncStorageManager 实例
+            page_size: 每次加载的条数
+        """
+        super().__init__(parent)
+        self.storage = storage
+        self.page_size = page_size
+        
+        self._records = []  # 已加载的记录摘要（按时间倒序）
+        self._has_more = True
+        self._loading = False
+        self._generation = 0  # 每次重置递增，丢弃重置前发出的查询结果
+    
+    # ==================== Qt 模型接口 ====================
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._records)
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._records):
+            return None
+        
+        record = self._records[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            preview = record['preview'] or ''
+            if record['char_count'] > len(preview):
+                preview += "..."
+            return preview
+        if role == Qt.ItemDataRole.UserRole:
+            return record['id']
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{record['timestamp']}  {record['char_count']} 字符"
+        return None
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._has_more and not self._loading
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        
+        self._loading = True
+        generation = self._generation
+        before = self._row_key(self._records[-1]) if self._records else None
+        self.storage.get_history_page(
+            self.page_size, before=before,
+            callback=lambda records: self._on_page_loaded(generation, records)
+        )
+    
+    # ==================== 数据更新 ====================
+    
+    def reload(self):
+        """清空并重新加载第一页"""
+        self.beginResetModel()
+        self._records = []
+        self._has_more = True
+        self._loading = False
+        self._generation += 1
+        self.endResetModel()
+        self.fetchMore()
+    
+    def fetch_newer(self):
+        """查询比首行更新的记录并插入到顶部（已存在的记录移到顶部）"""
+        if not self._records:
+            if not self._loading:
+                self.reload()
+            return
+        
+        generation = self._generation
+        self.storage.get_history_page(
+            self.page_size, after=self._row_key(self._records[0]),
+            callback=lambda records: self._on_newer_loaded(generation, records)
+        )
+    
+    def remove_history(self, history_id):
+        """移除指定记录所在的行"""
+        row = self.row_of(history_id)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._records[row]
+        self.endRemoveRows()
+    
+    def remove_histories(self, history_ids):
+        """移除多条记录所在的行（相邻的行一次移除）"""
+        history_ids = set(history_ids)
+        rows = [row for row, record in enumerate(self._records) if record['id'] in history_ids]
+        
+        # 从后往前移除，前面的行号不受影响
+        while rows:
+            last = first = rows.pop()
+            while rows and rows[-1] == first - 1:
+                first = rows.pop()
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._records[first:last + 1]
+            self.endRemoveRows()
+    
+    def history_id(self, row):
+        """获取指定行的记录ID"""
+        if 0 <= row < len(self._records):
+            return self._records[row]['id']
+        return None
+    
+    def row_of(self, history_id):
+        """获取记录所在行，未加载时返回 -1"""
+        for row, record in enumerate(self._records):
+            if record['id'] == history_id:
+                return row
+        return -1
+    
+    def _row_key(self, record):
+        """分页游标 (timestamp, id)"""
+        return (record['timestamp'], record['id'])
+    
+    def _on_page_loaded(self, generation, records):
+        """下一页加载完成 - 追加到末尾"""
+        if generation != self._generation:
+            return
+        
+        self._loading = False
+        self._has_more = len(records) >= self.page_size
+        
+        # 加载期间可能有记录被移到顶部，跳过已存在的行
+        loaded = {record['id'] for record in self._records}
+        records = [dict(record) for record in records if record['id'] not in loaded]
+        if not records:
+            return
+        
+        first = len(self._records)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        self._records.extend(records)
+        self.endInsertRows()
+    
+    def _on_newer_loaded(self, generation, records):
+        """新记录查询完成 - 按时间从旧到新依次放到顶部"""
+        if generation != self._generation:
+            return
+        
+        # 新记录超过一页时中间可能有遗漏，直接重新加载
+        if len(records) >= self.page_size:
+            self.reload()
+            return
+        
+        for record in reversed(records):
+            self._move_to_top(dict(record))
+    
+    def _move_to_top(self, record):
+        """插入新行，或将已有行移到顶部并更新内容"""
+        row = self.row_of(record['id'])
+        if row < 0:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self._records.insert(0, record)
+            self.endInsertRows()
+            return
+        
+        if row > 0:
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), 0)
+            del self._records[row]
+            self._records.insert(0, record)
+            self.endMoveRows()
+        else:
+            self._records[0] = record
+        
+        index = self.index(0)
+        self.dataChanged.emit(index, index)
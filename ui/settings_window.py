@@ -4,13 +4,14 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QPushButton, QCheckBox, QSpinBox, 
                              QGroupBox, QFormLayout, QLineEdit, QTabWidget,
-                             QListWidget, QMessageBox, QSystemTrayIcon, QMenu, QComboBox,
+                             QListWidget, QListView, QMessageBox, QSystemTrayIcon, QMenu, QComboBox,
                              QDialog)
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QFont, QAction, QIcon, QKeySequence
-from core import StorageManager
-from utils import ConfigManager
+from core import AsyncStorageManager
+from utils import get_config
 from .hotkey_edit import HotkeyEdit
+from .history_model import HistoryListModel
 
 
 class SettingsWindow(QMainWindow):
@@ -23,20 +24,21 @@ class SettingsWindow(QMainWindow):
     create_card_requested = pyqtSignal()  # 请求创建贴卡
     card_style_changed = pyqtSignal(int, int, float)  # 贴卡样式改变 (width, height, opacity)
     card_appearance_changed = pyqtSignal(int, str, str)  # 贴卡外观改变 (font_size, font_color, bg_color)
-    load_to_card_requested = pyqtSignal(str)  # 请求加载内容到贴卡
+    load_to_card_requested = pyqtSignal(object, object)  # 请求加载内容到贴卡 (内容, 历史记录ID)
     menu_config_changed = pyqtSignal()  # 菜单配置改变
+    history_retention_changed = pyqtSignal()  # 历史记录保留策略改变
     
     def __init__(self, config=None, storage=None):
         super().__init__()
         
         # 管理器（使用传入的实例或创建新的）
-        self.config = config if config else ConfigManager()
-        self.storage = storage if storage else StorageManager()
+        self.config = config if config else get_config()
+        self.storage = storage if storage else AsyncStorageManager()
         
         self._init_ui()
         self._load_settings()
         self._init_system_tray()
-        
+    
     def _init_ui(self):
         """初始化UI"""
         self.setWindowTitle("TextPin - 设置")
@@ -93,7 +95,7 @@ class SettingsWindow(QMainWindow):
         button_layout.addWidget(self.cancel_btn)
         
         main_layout.addLayout(button_layout)
-        
+    
     def _create_general_tab(self):
         """创建常规设置标签"""
         widget = QWidget()
@@ -203,11 +205,26 @@ class SettingsWindow(QMainWindow):
         history_layout = QFormLayout()
         
         self.max_history_spin = QSpinBox()
-        self.max_history_spin.setRange(10, 500)
+        self.max_history_spin.setRange(10, 100000)
         self.max_history_spin.setValue(50)
         self.max_history_spin.setSuffix(" 条")
+        self.max_history_spin.setToolTip("超出后自动删除最旧的记录（收藏除外）")
         history_layout.addRow("最大保存数量:", self.max_history_spin)
         
+        self.max_history_mb_spin = QSpinBox()
+        self.max_history_mb_spin.setRange(0, 10240)
+        self.max_history_mb_spin.setSuffix(" MB")
+        self.max_history_mb_spin.setSpecialValueText("不限制")
+        self.max_history_mb_spin.setToolTip("历史内容总大小上限，0 表示不限制")
+        history_layout.addRow("最大占用空间:", self.max_history_mb_spin)
+        
+        self.max_history_days_spin = QSpinBox()
+        self.max_history_days_spin.setRange(0, 3650)
+        self.max_history_days_spin.setSuffix(" 天")
+        self.max_history_days_spin.setSpecialValueText("不限制")
+        self.max_history_days_spin.setToolTip("超过天数的记录自动删除（收藏除外），0 表示不限制")
+        history_layout.addRow("保留天数:", self.max_history_days_spin)
+        
         history_group.setLayout(history_layout)
         layout.addWidget(history_group)
         
@@ -347,8 +364,11 @@ class SettingsWindow(QMainWindow):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         
-        # 历史列表
-        self.history_list = QListWidget()
+        # 历史列表（模型按需分页加载）
+        self.history_model = HistoryListModel(self.storage, parent=self)
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        self.history_list.setUniformItemSizes(True)
         self._load_history()
         layout.addWidget(self.history_list)
         
@@ -566,6 +586,12 @@ class SettingsWindow(QMainWindow):
         self.max_history_spin.setValue(
             self.config.get('clipboard.max_history', 50)
         )
+        self.max_history_mb_spin.setValue(
+            self.config.get('clipboard.max_history_mb', 0)
+        )
+        self.max_history_days_spin.setValue(
+            self.config.get('clipboard.max_history_days', 0)
+        )
         
         # 快捷键
         self.global_hotkey_edit.setText(
@@ -619,65 +645,79 @@ class SettingsWindow(QMainWindow):
         old_height = self.config.get('card.default_height', 200)
         old_opacity = self.config.get('card.opacity', 0.95)
         
-        # 保存常规设置
-        new_auto_monitor = self.auto_monitor_check.isChecked()
-        new_ignore_self = self.ignore_self_check.isChecked()
-        
-        self.config.set('clipboard.auto_monitor', new_auto_monitor)
-        self.config.set('clipboard.ignore_self', new_ignore_self)
-        
-        # 保存贴卡设置
-        new_width = self.card_width_spin.value()
-        new_height = self.card_height_spin.value()
-        new_opacity = self.card_opacity_spin.value() / 100.0
-        new_font_size = self.font_size_spin.value()
-        new_font_color = self.font_color_input.text()
-        new_bg_color = self.bg_color_input.text()
-        
-        old_font_size = self.config.get('card.font_size', 10)
-        old_font_color = self.config.get('card.font_color', '#000000')
-        old_bg_color = self.config.get('card.bg_color', '#FFFFFF')
-        
-        new_font_family = self.font_family_combo.currentText()
-        
-        self.config.set('card.default_width', new_width)
-        self.config.set('card.default_height', new_height)
-        auto_height_value = self.auto_height_check.isChecked()
-        self.config.set('card.auto_height', auto_height_value)
-        print(f"✓ 保存配置: card.auto_height = {auto_height_value}")
-        self.config.set('card.opacity', new_opacity)
-        # 保存置顶设置
-        new_always_on_top = self.always_on_top_check.isChecked()
-        self.config.set('card.always_on_top', new_always_on_top)
-        print(f"✓ 保存配置: card.always_on_top = {new_always_on_top}")
-        self.config.set('card.font_family', new_font_family)
-        self.config.set('card.font_size', new_font_size)
-        self.config.set('card.font_color', new_font_color)
-        self.config.set('card.bg_color', new_bg_color)
-        
-        # 保存历史记录设置
-        self.config.set('clipboard.max_history', self.max_history_spin.value())
-        
-        # 保存快捷键
-        new_hotkey = self.global_hotkey_edit.text().strip()
-        if new_hotkey:
-            self.config.set('hotkey.create_card', new_hotkey)
-        
-        # 保存功能配置
-        enabled_features = []
-        shortcuts = {}
-        
-        for feature_id, checkbox in self.feature_checkboxes.items():
-            if checkbox.isChecked():
-                enabled_features.append(feature_id)
-        
-        for feature_id, shortcut_edit in self.feature_shortcuts.items():
-            shortcut = shortcut_edit.text().strip()
-            if shortcut:
-                shortcuts[feature_id] = shortcut
-        
-        self.config.set('menu.enabled_features', enabled_features)
-        self.config.set('menu.shortcuts', shortcuts)
+        # 所有设置一次写入文件，结束后统一通知
+        with self.config.batch():
+            # 保存常规设置
+            new_auto_monitor = self.auto_monitor_check.isChecked()
+            new_ignore_self = self.ignore_self_check.isChecked()
+            
+            self.config.set('clipboard.auto_monitor', new_auto_monitor)
+            self.config.set('clipboard.ignore_self', new_ignore_self)
+            
+            # 保存贴卡设置
+            new_width = self.card_width_spin.value()
+            new_height = self.card_height_spin.value()
+            new_opacity = self.card_opacity_spin.value() / 100.0
+            new_font_size = self.font_size_spin.value()
+            new_font_color = self.font_color_input.text()
+            new_bg_color = self.bg_color_input.text()
+            
+            old_font_size = self.config.get('card.font_size', 10)
+            old_font_color = self.config.get('card.font_color', '#000000')
+            old_bg_color = self.config.get('card.bg_color', '#FFFFFF')
+            
+            new_font_family = self.font_family_combo.currentText()
+            
+            self.config.set('card.default_width', new_width)
+            self.config.set('card.default_height', new_height)
+            auto_height_value = self.auto_height_check.isChecked()
+            self.config.set('card.auto_height', auto_height_value)
+            print(f"✓ 保存配置: card.auto_height = {auto_height_value}")
+            self.config.set('card.opacity', new_opacity)
+            # 保存置顶设置
+            new_always_on_top = self.always_on_top_check.isChecked()
+            self.config.set('card.always_on_top', new_always_on_top)
+            print(f"✓ 保存配置: card.always_on_top = {new_always_on_top}")
+            self.config.set('card.font_family', new_font_family)
+            self.config.set('card.font_size', new_font_size)
+            self.config.set('card.font_color', new_font_color)
+            self.config.set('card.bg_color', new_bg_color)
+            
+            # 保存历史记录设置
+            old_retention = (
+                self.config.get('clipboard.max_history', 50),
+                self.config.get('clipboard.max_history_mb', 0),
+                self.config.get('clipboard.max_history_days', 0),
+            )
+            new_retention = (
+                self.max_history_spin.value(),
+                self.max_history_mb_spin.value(),
+                self.max_history_days_spin.value(),
+            )
+            self.config.set('clipboard.max_history', new_retention[0])
+            self.config.set('clipboard.max_history_mb', new_retention[1])
+            self.config.set('clipboard.max_history_days', new_retention[2])
+            
+            # 保存快捷键
+            new_hotkey = self.global_hotkey_edit.text().strip()
+            if new_hotkey:
+                self.config.set('hotkey.create_card', new_hotkey)
+            
+            # 保存功能配置
+            enabled_features = []
+            shortcuts = {}
+            
+            for feature_id, checkbox in self.feature_checkboxes.items():
+                if checkbox.isChecked():
+                    enabled_features.append(feature_id)
+            
+            for feature_id, shortcut_edit in self.feature_shortcuts.items():
+                shortcut = shortcut_edit.text().strip()
+                if shortcut:
+                    shortcuts[feature_id] = shortcut
+            
+            self.config.set('menu.enabled_features', enabled_features)
+            self.config.set('menu.shortcuts', shortcuts)
         
         # 发出菜单配置改变信号
         self.menu_config_changed.emit()
@@ -692,6 +732,9 @@ class SettingsWindow(QMainWindow):
         if new_hotkey and new_hotkey != old_hotkey:
             self.hotkey_changed.emit(new_hotkey)
         
+        if new_retention != old_retention:
+            self.history_retention_changed.emit()
+        
         # 贴卡样式改变 - 应用到所有现有贴卡
         if (new_width != old_width or new_height != old_height or new_opacity != old_opacity):
             self.card_style_changed.emit(new_width, new_height, new_opacity)
@@ -712,30 +755,17 @@ class SettingsWindow(QMainWindow):
         self.hide()
     
     def _load_history(self):
-        """加载历史记录"""
-        self.history_list.clear()
-        records = self.storage.get_history(50)
-        
-        for record in records:
-            preview = record['content'][:100]
-            if len(record['content']) > 100:
-                preview += "..."
-            self.history_list.addItem(preview)
-            # 存储完整记录ID
-            item = self.history_list.item(self.history_list.count() - 1)
-            item.setData(Qt.ItemDataRole.UserRole, record['id'])
+        """重新加载历史记录（在存储线程中查询第一页）"""
+        self.history_model.reload()
+    
+    def remove_pruned_history(self, history_ids):
+        """移除已被保留策略删除的记录"""
+        self.history_model.remove_histories(history_ids)
     
     def refresh_history(self):
         """刷新历史记录（实时更新）"""
-        # 保存当前选中项
-        current_row = self.history_list.currentRow()
-        
-        # 重新加载历史
-        self._load_history()
-        
-        # 恢复选中（如果还有效）
-        if current_row >= 0 and current_row < self.history_list.count():
-            self.history_list.setCurrentRow(current_row)
+        # 只查询新增的记录，选中项由视图保持
+        self.history_model.fetch_newer()
     
     def _on_tab_changed(self, index):
         """标签页切换时的处理"""
@@ -754,22 +784,31 @@ class SettingsWindow(QMainWindow):
     
     def _load_history_to_card(self):
         """加载历史到贴卡"""
-        current_item = self.history_list.currentItem()
-        if current_item:
-            history_id = current_item.data(Qt.ItemDataRole.UserRole)
-            record = self.storage.get_history_by_id(history_id)
-            if record:
-                # 发送信号，让主应用创建贴卡
-                self.load_to_card_requested.emit(record['content'])
-                QMessageBox.information(self, "提示", "已加载到新贴卡")
+        history_id = self.history_model.history_id(self.history_list.currentIndex().row())
+        if history_id is not None:
+            self.storage.read_history_text(
+                history_id, lambda content: self._on_history_text_loaded(content, history_id)
+            )
+    
+    def _on_history_text_loaded(self, content, history_id):
+        """历史记录内容读取完成 - 加载到贴卡"""
+        if content is None:
+            # 记录已被删除（如保留策略清理），从列表中移除
+            self.history_model.remove_history(history_id)
+            QMessageBox.information(self, "提示", "该记录已被删除")
+            return
+        
+        # 发送信号，让主应用创建贴卡
+        self.load_to_card_requested.emit(content, history_id)
+        QMessageBox.information(self, "提示", "已加载到新贴卡")
     
     def _delete_history(self):
         """删除历史记录"""
-        current_item = self.history_list.currentItem()
-        if current_item:
-            history_id = current_item.data(Qt.ItemDataRole.UserRole)
-            self.storage.delete_history(history_id)
-            self._load_history()
+        history_id = self.history_model.history_id(self.history_list.currentIndex().row())
+        if history_id is not None:
+            self.storage.delete_history(
+                history_id, callback=lambda _: self.history_model.remove_history(history_id)
+            )
     
     def _clear_history(self):
         """清空历史记录"""
@@ -778,8 +817,9 @@ class SettingsWindow(QMainWindow):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
         if reply == QMessageBox.StandardButton.Yes:
-            self.storage.clear_history(keep_favorites=False)
-            self._load_history()
+            self.storage.clear_history(
+                keep_favorites=False, callback=lambda _: self._load_history()
+            )
     
     def _quit_app(self):
         """退出应用"""
@@ -942,7 +982,9 @@ class SettingsWindow(QMainWindow):
         self.hide()
         
         # 保存窗口位置
-        self.config.set('settings_window.x', self.x())
-        self.config.set('settings_window.y', self.y())
-        self.config.set('settings_window.width', self.width())
-        self.config.set('settings_window.height', self.height())
+        self.config.set_many({
+            'settings_window.x': self.x(),
+            'settings_window.y': self.y(),
+            'settings_window.width': self.width(),
+            'settings_window.height': self.height(),
+        })
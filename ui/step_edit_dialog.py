@@ -3,7 +3,8 @@
 """
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QLineEdit, QComboBox, QCheckBox,
-                             QFormLayout, QGroupBox, QTextEdit)
+                             QFormLayout, QGroupBox, QTextEdit, QWidget,
+                             QTableWidget, QTableWidgetItem, QHeaderView)
 from PyQt6.QtCore import Qt
 from core import TextProcessor
 
@@ -97,6 +98,8 @@ class StepEditDialog(QDialog):
         
         if step_type == 'find_replace':
             self._create_find_replace_params()
+        elif step_type == 'multi_replace':
+            self._create_multi_replace_params()
         elif step_type == 'regex_replace':
             self._create_regex_replace_params()
         elif step_type == 'remove_empty_lines':
@@ -132,6 +135,74 @@ class StepEditDialog(QDialog):
         self.param_widgets['case_sensitive'] = case_check
         self.params_layout.addRow("", case_check)
     
+    def _create_multi_replace_params(self):
+        """批量替换参数"""
+        params = self.step.get('params', {})
+        pairs = params.get('pairs', [])
+        
+        table = QTableWidget(0, 2)
+        table.setHorizontalHeaderLabels(["查找", "替换为"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setMinimumHeight(200)
+        for pair in pairs:
+            self._add_pair_row(table, pair.get('find', ''), pair.get('replace', ''))
+        if not pairs:
+            self._add_pair_row(table)
+        self.param_widgets['pairs'] = table
+        self.params_layout.addRow(table)
+        
+        # 行操作按钮（放在容器中，切换类型时随参数控件一起清除）
+        buttons = QWidget()
+        buttons_layout = QHBoxLayout(buttons)
+        buttons_layout.setContentsMargins(0, 0, 0, 0)
+        
+        add_btn = QPushButton("➕ 添加行")
+        add_btn.clicked.connect(lambda: self._add_pair_row(table))
+        buttons_layout.addWidget(add_btn)
+        
+        remove_btn = QPushButton("➖ 删除行")
+        remove_btn.clicked.connect(lambda: self._remove_pair_row(table))
+        buttons_layout.addWidget(remove_btn)
+        buttons_layout.addStretch()
+        self.params_layout.addRow(buttons)
+        
+        case_check = QCheckBox("区分大小写")
+        case_check.setChecked(params.get('case_sensitive', True))
+        self.param_widgets['case_sensitive'] = case_check
+        self.params_layout.addRow("", case_check)
+        
+        hint = QLabel("💡 所有替换一次完成，替换结果不会被再次替换；\n"
+                      "   同一位置匹配多个查找内容时优先最长的")
+        hint.setStyleSheet("color: #666; font-size: 10px;")
+        self.params_layout.addRow("", hint)
+    
+    def _add_pair_row(self, table, find='', replace=''):
+        """添加一行替换项"""
+        row = table.rowCount()
+        table.insertRow(row)
+        table.setItem(row, 0, QTableWidgetItem(find))
+        table.setItem(row, 1, QTableWidgetItem(replace))
+        if not find:
+            table.setCurrentCell(row, 0)
+    
+    def _remove_pair_row(self, table):
+        """删除当前行"""
+        row = table.currentRow()
+        if row >= 0:
+            table.removeRow(row)
+    
+    def _get_pairs(self, table):
+        """读取替换项（跳过查找内容为空的行）"""
+        pairs = []
+        for row in range(table.rowCount()):
+            find_item = table.item(row, 0)
+            replace_item = table.item(row, 1)
+            find = find_item.text() if find_item else ''
+            if find:
+                pairs.append({'find': find, 'replace': replace_item.text() if replace_item else ''})
+        return pairs
+    
     def _create_regex_replace_params(self):
         """正则替换参数"""
         pattern_edit = QTextEdit()
@@ -256,6 +327,8 @@ class StepEditDialog(QDialog):
                 params[key] = widget.isChecked()
             elif isinstance(widget, QComboBox):
                 params[key] = widget.currentData()
+            elif isinstance(widget, QTableWidget):
+                params[key] = self._get_pairs(widget)
         
         # 特殊处理：正则标志
         if step_type == 'regex_replace':
@@ -0,0 +1,236 @@
+"""
+文本差异更新
+比较新旧文本的变化区域，只修改变化的部分（可撤销，保留光标和滚动位置）
+"""
+from typing import List, Tuple
+from PyQt6.QtGui import QTextCursor
+
+
+# 逐行比较时，查找重新对齐位置的最大行数
+SYNC_WINDOW = 64
+
+# QTextDocument 导入纯文本时作为段落分隔的字符（与 setPlainText 一致，均转换为 \n）
+LINE_SEPARATORS = ('\r\n', '\r', '\u2028', '\u2029')
+
+
+def diff_regions(old: str, new: str) -> List[Tuple[int, int, str]]:
+    """
+    计算将 old 变为 new 需要替换的区域
+    
+    先去掉首尾相同的整行，再对中间部分按行比较：行数相同时逐行对应；行数不同时在
+    SYNC_WINDOW 行内查找重新对齐的位置，识别插入和删除的行。结果不保证最少修改，
+    但按顺序应用后一定得到 new。
+    
+    Returns:
+        [(起始位置, 结束位置, 替换文本), ...]，位置为 old 中的字符下标，按位置升序且互不重叠
+    """
+    if old == new:
+        return []
+    
+    # 首尾相同的部分（在行边界处截断）不参与比较
+    head = _common_prefix(old, new)
+    head = old.rfind('\n', 0, head) + 1
+    tail = _common_suffix(old, new, head)
+    cut = old.find('\n', len(old) - tail)
+    tail = len(old) - cut if cut >= 0 else 0
+    
+    old_lines = old[head:len(old) - tail].split('\n')
+    new_lines = new[head:len(new) - tail].split('\n')
+    line_regions = _diff_lines(old_lines, new_lines)
+    
+    # 每行在 old 中的起始位置
+    starts = [0] * (len(old_lines) + 1)
+    position = head
+    for index, line in enumerate(old_lines):
+        starts[index] = position
+        position += len(line) + 1
+    starts[-1] = position  # 末尾之后（比中间部分的结束位置多 1）
+    
+    regions = []
+    for i0, i1, j0, j1 in line_regions:
+        replacement = '\n'.join(new_lines[j0:j1])
+        if i0 < i1 and j0 < j1:
+            # 替换若干行（不含最后一行的换行）
+            regions.append((starts[i0], starts[i1] - 1, replacement))
+        elif i0 < i1:
+            # 删除若干行：连同其后的换行一起删除，最后几行则删除其前的换行
+            if i1 < len(old_lines):
+                regions.append((starts[i0], starts[i1], ''))
+            else:
+                regions.append((starts[i0] - 1, starts[i1] - 1, ''))
+        elif i0 < len(old_lines):
+            # 在第 i0 行前插入
+            regions.append((starts[i0], starts[i0], replacement + '\n'))
+        else:
+            # 在末尾追加
+            regions.append((starts[i0] - 1, starts[i0] - 1, '\n' + replacement))
+    return regions
+
+
+def _common_prefix(a: str, b: str) -> int:
+    """相同前缀的长度（二分比较切片）"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """相同后缀的长度（不超过 len - limit，二分比较切片）"""
+    low, high = 0, min(len(a), len(b)) - limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _diff_lines(old_lines: List[str], new_lines: List[str]) -> List[Tuple[int, int, int, int]]:
+    """
+    逐行比较
+    
+    Returns:
+        [(旧起始行, 旧结束行, 新起始行, 新结束行), ...]，表示旧文本的 [i0, i1) 行替换为新文本的 [j0, j1) 行
+    """
+    n, m = len(old_lines), len(new_lines)
+    regions = []
+    current = None  # 正在累积的变化区域 [i0, i1, j0, j1]
+    i = j = 0
+    
+    while i < n and j < m:
+        if old_lines[i] == new_lines[j]:
+            if current:
+                regions.append(tuple(current))
+                current = None
+            i += 1
+            j += 1
+            continue
+        
+        if current is None:
+            current = [i, i, j, j]
+        
+        skip_old = skip_new = None
+        if n != m:
+            # 行数不同：检查是否为删除（新行出现在后面的旧行中）或插入（旧行出现在后面的新行中）
+            try:
+                skip_old = old_lines.index(new_lines[j], i + 1, i + 1 + SYNC_WINDOW) - i
+            except ValueError:
+                pass
+            try:
+                skip_new = new_lines.index(old_lines[i], j + 1, j + 1 + SYNC_WINDOW) - j
+            except ValueError:
+                pass
+        
+        if skip_old is not None and (skip_new is None or skip_old <= skip_new):
+            i += skip_old
+        elif skip_new is not None:
+            j += skip_new
+        else:
+            # 该行被修改
+            i += 1
+            j += 1
+        current[1] = i
+        current[3] = j
+    
+    if i < n or j < m:
+        if current is None:
+            current = [i, i, j, j]
+        current[1] = n
+        current[3] = m
+    if current:
+        regions.append(tuple(current))
+    return regions
+
+
+def apply_text(text_edit, new_text: str) -> bool:
+    """
+    将编辑器内容更新为 new_text，只替换变化的区域
+    
+    所有修改在一个编辑块中完成（可一次撤销），只重新排版被修改的段落；
+    光标（含选区）随修改位置移动，滚动位置保持不变。new_text 中的换行符按
+    setPlainText 的方式统一为 \n，结果与 setPlainText(new_text) 相同。
+    
+    Returns:
+        内容是否有变化
+    """
+    new_text = normalize_newlines(new_text)
+    old_text = text_edit.toPlainText()
+    regions = diff_regions(old_text, new_text)
+    if not regions:
+        return False
+    
+    regions = _to_utf16(old_text, regions)
+    
+    cursor = text_edit.textCursor()
+    anchor = _map_position(cursor.anchor(), regions)
+    position = _map_position(cursor.position(), regions)
+    v_scroll = text_edit.verticalScrollBar().value()
+    h_scroll = text_edit.horizontalScrollBar().value()
+    
+    # 从后往前替换，前面区域的位置不受影响
+    edit = QTextCursor(text_edit.document())
+    edit.beginEditBlock()
+    for start, end, replacement, _ in reversed(regions):
+        edit.setPosition(start)
+        edit.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        edit.insertText(replacement)
+    edit.endEditBlock()
+    
+    cursor.setPosition(anchor)
+    cursor.setPosition(position, QTextCursor.MoveMode.KeepAnchor)
+    text_edit.setTextCursor(cursor)
+    text_edit.verticalScrollBar().setValue(v_scroll)
+    text_edit.horizontalScrollBar().setValue(h_scroll)
+    return True
+
+
+def normalize_newlines(text: str) -> str:
+    """将 \r\n、\r 和 Unicode 行/段分隔符转换为 \n（与文档中的段落分隔一致）"""
+    for separator in LINE_SEPARATORS:
+        if separator in text:
+            text = text.replace(separator, '\n')
+    return text
+
+
+def _to_utf16(text: str, regions: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str, int]]:
+    """
+    将区域位置转换为文档位置（QTextDocument 按 UTF-16 编码单元计数）
+    
+    Returns:
+        [(起始位置, 结束位置, 替换文本, 替换文本的 UTF-16 长度), ...]
+    """
+    def utf16_len(s):
+        return len(s.encode('utf-16-le')) // 2
+    
+    if utf16_len(text) == len(text):
+        return [(start, end, replacement, utf16_len(replacement)) for start, end, replacement in regions]
+    
+    # 含 BMP 以外的字符（如 emoji），逐段累加偏移
+    converted = []
+    offset = 0  # 已处理部分的 UTF-16 长度
+    last = 0
+    for start, end, replacement in regions:
+        offset += utf16_len(text[last:start])
+        start16 = offset
+        offset += utf16_len(text[start:end])
+        converted.append((start16, offset, replacement, utf16_len(replacement)))
+        last = end
+    return converted
+
+
+def _map_position(position: int, regions: List[Tuple[int, int, str, int]]) -> int:
+    """将旧文档中的位置映射到替换后的文档（位于被替换区域内时保持相对偏移，不超出替换文本）"""
+    delta = 0
+    for start, end, _, length in regions:
+        if position <= start:
+            break
+        if position < end:
+            return start + min(position - start, length) + delta
+        delta += length - (end - start)
+    return position + delta
@@ -1,5 +1,5 @@
 """工具模块"""
-from .config import ConfigManager
+from .config import ConfigManager, ConfigSection, get_config
 from .path_manager import PathManager, get_path_manager
 
-__all__ = ['ConfigManager', 'PathManager', 'get_path_manager']
+__all__ = ['ConfigManager', 'ConfigSection', 'get_config', 'PathManager', 'get_path_manager']
@@ -2,23 +2,68 @@
 配置管理模块
 负责读取、保存和管理应用配置
 """
+import copy
 import json
 import os
+from contextlib import contextmanager
 from pathlib import Path
+from PyQt6.QtCore import QObject, QTimer, QCoreApplication, pyqtSignal
 
 
-class ConfigManager:
-    """配置管理器"""
+class ConfigSection(QObject):
+    """配置分组（键名前缀）的变化通知"""
     
-    def __init__(self, config_file='config.json'):
+    # 分组内的配置项被设置 (完整键名, 新值)
+    changed = pyqtSignal(str, object)
+
+
+class ConfigManager(QObject):
+    """
+    配置管理器
+    
+    程序内通过 get_config() 共享同一个实例（只读取一次文件）；每次 set 后发出
+    changed 信号，并通知键名前缀匹配的分组，界面可直接响应而无需重新读取文件。
+    
+    set 立即修改内存中的配置，写入文件延迟 SAVE_DELAY 执行，期间的多次修改合并为
+    一次写入（先写临时文件再替换，中途崩溃不会损坏原文件）。退出前调用 flush。
+    """
+    
+    # 配置项被设置 (完整键名, 新值)
+    changed = pyqtSignal(str, object)
+    
+    # 修改后延迟写入文件的时间（毫秒）
+    SAVE_DELAY = 500
+    
+    def __init__(self, config_file='config.json', fallback_file=None):
+        """
+        Args:
+            config_file: 配置文件路径
+            fallback_file: 配置文件不存在时读取的旧配置文件（保存时写入 config_file）
+        """
+        super().__init__()
         self.config_file = config_file
-        self.config = self._load_config()
+        self.config = self._load_config(fallback_file)
+        self._sections = {}  # 键名前缀 -> ConfigSection
+        
+        self._dirty = False  # 是否有未写入文件的修改
+        self._batches = []  # 嵌套的批量修改 [(开始时的配置, 开始时的待通知数, 开始时是否有未写入的修改)]
+        self._pending_notify = []  # 批量修改期间待发出的通知 [(键名, 值)]
+        
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(self.SAVE_DELAY)
+        self._save_timer.timeout.connect(self.flush)
     
-    def _load_config(self):
+    def _load_config(self, fallback_file=None):
         """加载配置文件"""
-        if os.path.exists(self.config_file):
+        config_file = self.config_file
+        if not os.path.exists(config_file) and fallback_file and os.path.exists(fallback_file):
+            print(f"使用旧配置文件: {fallback_file}")
+            config_file = fallback_file
+        
+        if os.path.exists(config_file):
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
+                with open(config_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
                 print(f"加载配置文件失败: {e}")
@@ -51,13 +96,26 @@ class ConfigManager:
         }
     
     def save_config(self):
-        """保存配置到文件"""
+        """立即保存配置到文件（写入临时文件后替换）"""
+        self._save_timer.stop()
+        temp_file = f"{self.config_file}.tmp"
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
+            data = json.dumps(self.config, indent=4, ensure_ascii=False)
+            os.makedirs(os.path.dirname(os.path.abspath(self.config_file)), exist_ok=True)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.config_file)
+            self._dirty = False
         except Exception as e:
             print(f"保存配置文件失败: {e}")
     
+    def flush(self):
+        """写入尚未保存的修改"""
+        if self._dirty:
+            self.save_config()
+    
     def get(self, key, default=None):
         """获取配置项"""
         keys = key.split('.')
@@ -78,4 +136,82 @@ class ConfigManager:
                 config[k] = {}
             config = config[k]
         config[keys[-1]] = value
-        self.save_config()
+        self._dirty = True
+        
+        if self._batches:
+            # 批量修改结束时统一通知和写入
+            self._pending_notify.append((key, value))
+            return
+        self._schedule_save()
+        self._notify(key, value)
+    
+    def set_many(self, values):
+        """一次设置多个配置项 {键名: 值}（只写入一次文件）"""
+        with self.batch():
+            for key, value in values.items():
+                self.set(key, value)
+    
+    @contextmanager
+    def batch(self):
+        """
+        批量修改
+        
+        期间的 set 只修改内存中的配置；最外层结束时按顺序发出变化信号并安排一次写入。
+        块内抛出异常时恢复到该层开始前的配置，丢弃期间的通知。可嵌套。
+        """
+        self._batches.append((copy.deepcopy(self.config), len(self._pending_notify), self._dirty))
+        try:
+            yield self
+        except BaseException:
+            self.config, pending_count, self._dirty = self._batches.pop()
+            del self._pending_notify[pending_count:]
+            raise
+        self._batches.pop()
+        
+        if not self._batches and self._pending_notify:
+            pending, self._pending_notify = self._pending_notify, []
+            self._schedule_save()
+            for key, value in pending:
+                self._notify(key, value)
+    
+    def _schedule_save(self):
+        """安排延迟写入（没有 Qt 事件循环时立即写入）"""
+        if QCoreApplication.instance() is None:
+            self.save_config()
+        else:
+            self._save_timer.start()
+    
+    def section(self, prefix):
+        """
+        获取配置分组的变化通知
+        
+        键名等于 prefix 或以 "prefix." 开头的配置项被设置时，分组发出 changed 信号。
+        """
+        section = self._sections.get(prefix)
+        if section is None:
+            section = ConfigSection(self)
+            self._sections[prefix] = section
+        return section
+    
+    def _notify(self, key, value):
+        """发出配置项的变化信号"""
+        self.changed.emit(key, value)
+        for prefix, section in list(self._sections.items()):
+            if key == prefix or key.startswith(prefix + '.'):
+                section.changed.emit(key, value)
+
+
+# 全局实例
+_config_manager = None
+
+def get_config():
+    """获取共享的配置管理器（单例，配置文件位于数据目录）"""
+    global _config_manager
+    if _config_manager is None:
+        from .path_manager import get_path_manager
+        _config_manager = ConfigManager(
+            str(get_path_manager().config_path),
+            # 早期版本将配置保存在当前目录
+            fallback_file='config.json'
+        )
+    return _config_manager
@@ -18,6 +18,9 @@ class PathManager:
             # 开发环境
             self.app_dir = Path(__file__).parent.parent
         
+        # 数据库连接参数（由存储模块在连接后报告）
+        self.database_info = {}
+        
         # 读取或创建数据目录配置
         self._load_data_dir()
     
@@ -80,15 +83,24 @@ class PathManager:
         log_dir.mkdir(exist_ok=True)
         return log_dir
     
+    def set_database_info(self, info):
+        """记录数据库实际生效的连接参数"""
+        self.database_info = dict(info)
+    
     def get_info(self):
         """获取路径信息"""
-        return {
+        info = {
             '应用程序目录': str(self.app_dir),
             '数据目录': str(self.data_dir),
             '配置文件': str(self.config_path),
             '数据库': str(self.database_path),
             '日志目录': str(self.log_dir),
         }
+        if self.database_info:
+            info['数据库配置'] = ', '.join(
+                f'{key}={value}' for key, value in self.database_info.items()
+            )
+        return info
 
 
 # 全局实例